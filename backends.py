@@ -0,0 +1,289 @@
+import abc
+import datetime
+import decimal
+import functools
+import os
+import sqlite3
+
+import mysql.connector
+
+# Storage backends for Database. Each backend knows how to open a raw
+# connection and carries a Dialect for the few statements that differ between
+# engines; the rest of the SQL in database.py is written once, in the shared
+# subset (%s placeholders, multi-row VALUES, CASE, row comparisons).
+#
+# Pick one at startup with POS_DB_BACKEND=mysql|sqlite (and POS_SQLITE_PATH).
+
+DB_ERRORS = (mysql.connector.Error, sqlite3.Error)
+
+# Lock conflicts: the transaction lost a race and can simply be run again.
+MYSQL_LOCK_ERRORS = {1213: "deadlock", 1205: "lock_wait_timeout"}
+
+
+def lock_conflict(err):
+    # "deadlock", "lock_wait_timeout" or "busy" (SQLite's write lock stayed taken past
+    # busy_timeout) for errors worth retrying; None for everything else.
+    if isinstance(err, mysql.connector.Error):
+        return MYSQL_LOCK_ERRORS.get(err.errno)
+    if isinstance(err, sqlite3.OperationalError) and "locked" in str(err):
+        return "busy"
+    return None
+
+
+class Dialect(abc.ABC):
+    name = None
+    autoincrement_pk = None
+    now_default = None
+    insert_ignore = None
+    nocase = ""
+    for_update = ""
+
+    @abc.abstractmethod
+    def enum(self, values):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def upsert(self, key, columns, increment=False):
+        # Suffix for a multi-row INSERT that updates `columns` when `key` (the primary key
+        # columns, comma separated) already exists; increment=True adds instead of replacing.
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def index_exists(self, cursor, table, index):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def column_exists(self, cursor, table, column):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def table_names(self, cursor):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def foreign_keys(self, enabled):
+        raise NotImplementedError
+
+
+class MySQLDialect(Dialect):
+    name = "mysql"
+    autoincrement_pk = "INT AUTO_INCREMENT PRIMARY KEY"
+    now_default = "CURRENT_TIMESTAMP"
+    insert_ignore = "INSERT IGNORE"
+    for_update = " FOR UPDATE"
+
+    def enum(self, values):
+        return "ENUM(" + ", ".join(f"'{v}'" for v in values) + ")"
+
+    def upsert(self, key, columns, increment=False):
+        add = "{0} + " if increment else ""
+        return "ON DUPLICATE KEY UPDATE " + ", ".join(f"{c} = {add.format(c)}VALUES({c})" for c in columns)
+
+    def index_exists(self, cursor, table, index):
+        cursor.execute("SELECT COUNT(*) FROM information_schema.statistics "
+                       "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s", (table, index))
+        return cursor.fetchone()[0] > 0
+
+    def column_exists(self, cursor, table, column):
+        cursor.execute("SELECT COUNT(*) FROM information_schema.columns "
+                       "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s", (table, column))
+        return cursor.fetchone()[0] > 0
+
+    def table_names(self, cursor):
+        cursor.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = DATABASE()")
+        return [row[0] for row in cursor.fetchall()]
+
+    def foreign_keys(self, enabled):
+        return f"SET FOREIGN_KEY_CHECKS = {1 if enabled else 0}"
+
+
+class SQLiteDialect(Dialect):
+    name = "sqlite"
+    autoincrement_pk = "INTEGER PRIMARY KEY AUTOINCREMENT"
+    now_default = "(datetime('now', 'localtime'))"
+    insert_ignore = "INSERT OR IGNORE"
+    # MySQL's default collation is case-insensitive; match it for names, emails and usernames.
+    nocase = " COLLATE NOCASE"
+    # No row locks: IMMEDIATE transactions already hold the database write lock.
+    for_update = ""
+
+    def enum(self, values):
+        return "TEXT"
+
+    def upsert(self, key, columns, increment=False):
+        add = "{0} + " if increment else ""
+        return f"ON CONFLICT({key}) DO UPDATE SET " + ", ".join(f"{c} = {add.format(c)}excluded.{c}" for c in columns)
+
+    def index_exists(self, cursor, table, index):
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND name = %s",
+                       (table, index))
+        return cursor.fetchone()[0] > 0
+
+    def column_exists(self, cursor, table, column):
+        cursor.execute("SELECT COUNT(*) FROM pragma_table_info(%s) WHERE name = %s", (table, column))
+        return cursor.fetchone()[0] > 0
+
+    def table_names(self, cursor):
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")
+        return [row[0] for row in cursor.fetchall()]
+
+    def foreign_keys(self, enabled):
+        return f"PRAGMA foreign_keys = {'ON' if enabled else 'OFF'}"
+
+
+MYSQL = MySQLDialect()
+SQLITE = SQLiteDialect()
+
+
+def dialect_of(conn_or_cursor):
+    # mysql.connector objects carry no dialect; our SQLite wrappers do.
+    return getattr(conn_or_cursor, "dialect", MYSQL)
+
+
+class MySQLBackend:
+    name = "mysql"
+    dialect = MYSQL
+
+    def __init__(self, config):
+        self.config = dict(config)
+
+    def connect(self):
+        return mysql.connector.connect(**self.config)
+
+    def describe(self):
+        return f"mysql://{self.config.get('host')}/{self.config.get('database')}"
+
+
+# --- SQLite -----------------------------------------------------------------
+
+# Same Python types back as mysql.connector gives: Decimal money, datetime timestamps.
+sqlite3.register_adapter(datetime.datetime, lambda d: d.isoformat(" "))
+sqlite3.register_adapter(decimal.Decimal, str)
+sqlite3.register_adapter(datetime.date, lambda d: d.isoformat())
+sqlite3.register_converter("DATE", lambda b: datetime.date.fromisoformat(b.decode()))
+sqlite3.register_converter("TIMESTAMP", lambda b: datetime.datetime.fromisoformat(b.decode()))
+# Every DECIMAL column in the schema is DECIMAL(10, 2); SQLite stores 1200.00 as 1200.
+sqlite3.register_converter("DECIMAL", lambda b: decimal.Decimal(b.decode()).quantize(decimal.Decimal("0.01")))
+
+
+@functools.lru_cache(maxsize=512)
+def _to_qmark(sql):
+    # database.py is written with mysql's %s placeholders; none of its SQL has a literal %.
+    return sql.replace("%s", "?")
+
+
+class SQLiteCursor:
+    # The slice of the mysql.connector cursor API that database.py uses.
+    dialect = SQLITE
+
+    def __init__(self, conn, dictionary=False):
+        self._cursor = conn.cursor()
+        self._dictionary = dictionary
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(_to_qmark(sql), tuple(params))
+        return self
+
+    def executemany(self, sql, seq_params):
+        self._cursor.executemany(_to_qmark(sql), (tuple(p) for p in seq_params))
+        return self
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {d[0]: value for d, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        if not self._dictionary:
+            return rows
+        names = [d[0] for d in self._cursor.description]
+        return [dict(zip(names, row)) for row in rows]
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    # Wraps sqlite3.Connection so it can sit in ConnectionPool and be used
+    # exactly like a mysql.connector connection.
+    dialect = SQLITE
+    unread_result = False
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def cursor(self, dictionary=False, buffered=False):
+        # Every sqlite3 cursor is effectively buffered; the flag is accepted for compatibility.
+        return SQLiteCursor(self.raw, dictionary)
+
+    def start_transaction(self):
+        if not self.raw.in_transaction:
+            self.raw.execute("BEGIN IMMEDIATE")
+
+    @property
+    def in_transaction(self):
+        return self.raw.in_transaction
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def ping(self, reconnect=False):
+        self.raw.execute("SELECT 1").fetchone()
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        self.raw.close()
+
+
+class SQLiteBackend:
+    name = "sqlite"
+    dialect = SQLITE
+
+    def __init__(self, path, busy_timeout=5.0, cached_statements=256):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+
+    def connect(self):
+        # Connections are leased by one thread at a time from the pool, so they may
+        # move between the worker threads. Implicit transactions start IMMEDIATE, which
+        # takes the write lock up front instead of failing a read->write upgrade.
+        raw = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level="IMMEDIATE",
+                              detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False,
+                              cached_statements=self.cached_statements)
+        raw.execute("PRAGMA journal_mode = WAL")
+        raw.execute("PRAGMA synchronous = NORMAL")
+        raw.execute("PRAGMA foreign_keys = ON")
+        return SQLiteConnection(raw)
+
+    def describe(self):
+        return f"sqlite:///{os.path.abspath(self.path)}"
+
+
+def from_env(config):
+    # POS_DB_BACKEND=sqlite runs the till on an embedded database file
+    # (POS_SQLITE_PATH, default bijuli_pos.db); anything else is the MySQL server.
+    if os.environ.get("POS_DB_BACKEND", "mysql").lower() == "sqlite":
+        return SQLiteBackend(os.environ.get("POS_SQLITE_PATH", "bijuli_pos.db"))
+    return MySQLBackend(config)
@@ -0,0 +1,323 @@
+import argparse
+import datetime
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import migrations
+from backends import dialect_of
+from database import Database
+
+# Benchmarks for the Database layer against a throwaway MySQL database.
+#
+#   python bench.py --products 100000 --customers 1000000 --order-lines 10000000
+#   python bench.py --iterations 50 --json results.json --compare baseline.json
+#
+# The first run seeds synthetic data (deterministic for a given --seed); later runs
+# reuse it unless --reseed is passed. The database must not be the live one.
+
+BENCH_DB = "soft605_pos_bench"
+LIVE_DB = "soft605_pos"
+SEED_BATCH = 5000
+REGRESSION_THRESHOLD = 0.10
+
+FIRST_NAMES = ["John", "Jane", "Aayush", "Nibesh", "Zimone", "Priya", "Liam", "Mei", "Omar", "Sofia", "Tane", "Ana"]
+LAST_NAMES = ["Doe", "Smith", "Shrestha", "Thapa", "Ngata", "Chen", "Kumar", "Brown", "Wilson", "Singh", "Lee", "Park"]
+ADJECTIVES = ["Pro", "Mini", "Ultra", "Gaming", "Wireless", "Smart", "Compact", "Studio", "Max", "Lite"]
+NOUNS = ["Laptop", "Monitor", "Keyboard", "Mouse", "Headphone", "Speaker", "Phone", "Tablet", "Router", "Camera"]
+CUSTOMER_TYPES = ["Standard"] * 7 + ["Student"] * 2 + ["VIP"]
+
+
+# --- synthetic data ---------------------------------------------------------
+
+def product_rows(count, rng):
+    for i in range(1, count + 1):
+        name = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i:06d}"
+        yield (i, name, round(rng.uniform(5, 3000), 2), "", 1_000_000)
+
+
+def customer_rows(count, rng):
+    for i in range(1, count + 1):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        yield (i, f"{first} {last} {i}", f"02{rng.randrange(10**7, 10**8)}",
+               f"{first.lower()}.{last.lower()}{i}@bench.test", rng.choice(CUSTOMER_TYPES), rng.randrange(500))
+
+
+def order_rows(order_count, lines_per_order, products, customers, user_ids, rng):
+    # Yields (order, [lines]) with order dates spread evenly over the last two years.
+    start = datetime.datetime.now() - datetime.timedelta(days=730)
+    step = datetime.timedelta(days=730) / max(order_count, 1)
+    line_id = 1
+    for oid in range(1, order_count + 1):
+        lines = []
+        total = 0.0
+        for pid in rng.sample(range(1, products + 1), min(lines_per_order, products)):
+            qty, price = rng.randint(1, 3), round(rng.uniform(5, 3000), 2)
+            lines.append((line_id, oid, pid, qty, price))
+            total += qty * price
+            line_id += 1
+        customer_id = rng.randint(1, customers) if customers and rng.random() < 0.8 else None
+        yield (oid, customer_id, rng.choice(user_ids), round(total, 2), start + step * oid), lines
+
+
+def _insert_batches(conn, sql, rows, label, total):
+    cursor = conn.cursor()
+    batch, done, started = [], 0, time.perf_counter()
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= SEED_BATCH:
+            cursor.executemany(sql, batch)
+            conn.commit()
+            done += len(batch)
+            batch = []
+            print(f"\r  {label}: {done:,}/{total:,}", end="", flush=True)
+    if batch:
+        cursor.executemany(sql, batch)
+        conn.commit()
+        done += len(batch)
+    cursor.close()
+    print(f"\r  {label}: {done:,} rows in {time.perf_counter() - started:.1f}s")
+
+
+# Reference rows the migrations seed; everything else is emptied before a reseed
+KEEP_ON_RESEED = ("schema_migrations", "catalog_version", "vouchers")
+
+
+def reseed_tables(cursor):
+    # Every table the migrations created, so rollups, change_log rows and stock holds of
+    # the previous data set cannot outlive it.
+    return sorted(t for t in dialect_of(cursor).table_names(cursor) if t not in KEEP_ON_RESEED)
+
+
+def seed(conn, products, customers, order_lines, lines_per_order, seed_value):
+    rng = random.Random(seed_value)
+    cursor = conn.cursor()
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+    for table in reseed_tables(cursor):
+        cursor.execute(f"TRUNCATE TABLE {table}")
+    cursor.executemany("INSERT INTO users (id, username, password, role) VALUES (%s, %s, %s, %s)",
+                       [(1, "bench_admin", "bench", "admin"), (2, "bench_staff", "bench", "staff")])
+    conn.commit()
+    print(f"Seeding {products:,} products, {customers:,} customers, {order_lines:,} order lines (seed {seed_value})")
+
+    _insert_batches(conn, "INSERT INTO products (id, name, price, image_path, stock_level) VALUES (%s, %s, %s, %s, %s)",
+                    product_rows(products, rng), "products", products)
+    _insert_batches(conn, "INSERT INTO customers (id, name, phone, email, customer_type, loyalty_points) "
+                          "VALUES (%s, %s, %s, %s, %s, %s)",
+                    customer_rows(customers, rng), "customers", customers)
+
+    order_count = -(-order_lines // lines_per_order) if products else 0
+    orders, lines = [], []
+    order_cursor = conn.cursor()
+    started = time.perf_counter()
+    for order, order_lines_ in order_rows(order_count, lines_per_order, products, customers, [1, 2], rng):
+        orders.append(order)
+        lines.extend(order_lines_)
+        if len(lines) >= SEED_BATCH:
+            _flush_orders(conn, order_cursor, orders, lines)
+            print(f"\r  orders: {order[0]:,}/{order_count:,}", end="", flush=True)
+            orders, lines = [], []
+    _flush_orders(conn, order_cursor, orders, lines)
+    order_cursor.close()
+    print(f"\r  orders: {order_count:,} orders in {time.perf_counter() - started:.1f}s")
+
+    cursor.execute("UPDATE catalog_version SET version = version + 1 WHERE id = 1")
+    conn.commit()
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+    cursor.execute("ANALYZE TABLE products, customers, orders, order_items")
+    cursor.fetchall()
+    cursor.close()
+
+
+def _flush_orders(conn, cursor, orders, lines):
+    if orders:
+        cursor.executemany("INSERT INTO orders (id, customer_id, user_id, total_amount, order_date) "
+                           "VALUES (%s, %s, %s, %s, %s)", orders)
+    if lines:
+        cursor.executemany("INSERT INTO order_items (id, order_id, product_id, quantity, price_at_time) "
+                           "VALUES (%s, %s, %s, %s, %s)", lines)
+    conn.commit()
+
+
+def table_counts(conn):
+    cursor = conn.cursor()
+    counts = {}
+    for table in ("products", "customers", "orders", "order_items"):
+        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        counts[table] = cursor.fetchone()[0]
+    cursor.close()
+    return counts
+
+
+# --- timing -----------------------------------------------------------------
+
+def percentile(samples, pct):
+    # Nearest-rank percentile of an unsorted list.
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def _row_count(result):
+    if isinstance(result, tuple):
+        result = result[0]
+    if isinstance(result, list):
+        return len(result)
+    return 1 if result not in (None, False) else 0
+
+
+def measure(fn, iterations, warmup=1):
+    # Calls fn() iterations times; fn returns whatever the Database method returns.
+    for _ in range(warmup):
+        fn()
+    timings, rows = [], 0
+    for _ in range(iterations):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+        rows += _row_count(result)
+    total = sum(timings)
+    return {
+        "iterations": iterations,
+        "p50_ms": percentile(timings, 50) * 1000,
+        "p95_ms": percentile(timings, 95) * 1000,
+        "p99_ms": percentile(timings, 99) * 1000,
+        "mean_ms": total / iterations * 1000,
+        "rows": rows,
+        "rows_per_sec": rows / total if total else 0.0,
+    }
+
+
+def benchmarks(db, counts, rng):
+    # name -> (callable, default iteration divisor). Full-table reads are much
+    # heavier than point lookups, so they run fewer times.
+    products = max(counts["products"], 1)
+    customers = max(counts["customers"], 1)
+    orders = max(counts["orders"], 1)
+
+    def cart():
+        return {rng.randint(1, products): rng.randint(1, 3) for _ in range(3)}
+
+    def import_chunk():
+        return db.upsert_products([{"id": rng.randint(1, products), "name": f"Bench Import {i}",
+                                    "price": 10.0, "image_path": "", "stock_level": 1_000_000}
+                                   for i in range(1000)])
+
+    return {
+        "get_catalog_version": (db.get_catalog_version, 1),
+        "get_all_products": (db.get_all_products, 10),
+        "get_all_customers": (db.get_all_customers, 10),
+        "search_customers": (lambda: db.search_customers(rng.choice(FIRST_NAMES)[:3]), 1),
+        "process_transaction": (lambda: db.process_transaction(rng.randint(1, customers), 2, cart(), 100.0), 1),
+        "get_order_items": (lambda: db.get_order_items(rng.randint(1, orders)), 1),
+        "get_order_total": (lambda: db.get_order_total(rng.randint(1, orders)), 1),
+        "get_receipt": (lambda: db.get_receipt(rng.randint(1, orders)), 1),
+        "get_orders_page": (lambda: db.get_orders_page(100), 1),
+        "get_orders_page_filtered": (lambda: db.get_orders_page(100, min_amount=1000, customer_name="Jane"), 1),
+        "get_all_orders": (db.get_all_orders, 10),
+        "upsert_products_1000": (import_chunk, 5),
+    }
+
+
+def compare(current, baseline_path, threshold=REGRESSION_THRESHOLD):
+    # Prints p50/p95 deltas against an earlier run; returns the names that regressed.
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    regressed = []
+    print(f"\nCompared with {baseline_path}:")
+    for name, result in current.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        deltas = {k: (result[k] - old[k]) / old[k] if old[k] else 0.0 for k in ("p50_ms", "p95_ms")}
+        flag = ""
+        if deltas["p95_ms"] > threshold:
+            regressed.append(name)
+            flag = "  <-- regression"
+        print(f"  {name:<26} p50 {deltas['p50_ms']:+7.1%}  p95 {deltas['p95_ms']:+7.1%}{flag}")
+    return regressed
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Database layer on synthetic data.")
+    parser.add_argument("--database", default=BENCH_DB)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--customers", type=int, default=50_000)
+    parser.add_argument("--order-lines", type=int, default=200_000)
+    parser.add_argument("--lines-per-order", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=605)
+    parser.add_argument("--reseed", action="store_true", help="truncate and regenerate the data")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--only", nargs="*", help="run just these benchmarks")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    args = parser.parse_args(argv)
+
+    if args.database == LIVE_DB:
+        parser.error("refusing to benchmark against the live database; pick another --database")
+
+    import db_setup
+    db_setup.create_database(args.database)
+    conn = db_setup.connect_db(args.database)
+    migrations.migrate(conn, out=lambda *_: None)
+    counts = table_counts(conn)
+    seeded = args.reseed or counts["products"] == 0
+    if seeded:
+        seed(conn, args.products, args.customers, args.order_lines, args.lines_per_order, args.seed)
+        counts = table_counts(conn)
+    conn.close()
+    print("Data: " + ", ".join(f"{k} {v:,}" for k, v in counts.items()))
+
+    db = Database(database=args.database)
+    if seeded:
+        # The daily rollups were emptied with the rest; rebuild them from the new orders
+        db.rebuild_rollups()
+    rng = random.Random(args.seed)
+    results = {}
+    for name, (fn, divisor) in benchmarks(db, counts, rng).items():
+        if args.only and name not in args.only:
+            continue
+        results[name] = r = measure(fn, max(1, args.iterations // divisor))
+        print(f"  {name:<26} p50 {r['p50_ms']:9.2f}ms  p95 {r['p95_ms']:9.2f}ms  p99 {r['p99_ms']:9.2f}ms  "
+              f"{r['rows_per_sec']:12,.0f} rows/s  (n={r['iterations']})")
+    # Per-statement breakdown of the same run (instrumentation.py), for finding what a regression is made of.
+    statements = db.metrics_snapshot()
+    db.close()
+
+    output = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "database": args.database,
+            "counts": counts,
+            "seed": args.seed,
+            "iterations": args.iterations,
+        },
+        "results": results,
+        "metrics": statements,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(output, f, indent=2)
+        print(f"Wrote {args.json}")
+    if args.compare:
+        return 1 if compare(results, args.compare) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+from collections.abc import MutableMapping
+
+
+class CartModel(MutableMapping):
+    # The till's {product_id: qty}, plus change notification so views can patch
+    # the one line that changed instead of redrawing. Listeners are called as
+    # listener(pid, qty): qty 0 means the line was removed, pid None means the
+    # whole cart was cleared.
+    def __init__(self, items=None):
+        self._items = {}
+        self._listeners = []
+        for pid, qty in (items or {}).items():
+            if qty > 0:
+                self._items[pid] = int(qty)
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, pid, qty):
+        for listener in list(self._listeners):
+            listener(pid, qty)
+
+    def __getitem__(self, pid):
+        return self._items[pid]
+
+    def __setitem__(self, pid, qty):
+        qty = int(qty)
+        if qty <= 0:
+            if pid in self._items:
+                del self[pid]
+            return
+        if self._items.get(pid) == qty:
+            return
+        self._items[pid] = qty
+        self._notify(pid, qty)
+
+    def __delitem__(self, pid):
+        del self._items[pid]
+        self._notify(pid, 0)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def clear(self):
+        # One event, not one per line
+        if self._items:
+            self._items.clear()
+            self._notify(None, 0)
+
+    @property
+    def units(self):
+        return sum(self._items.values())
+
+    def __repr__(self):
+        return f"CartModel({self._items!r})"
@@ -0,0 +1,141 @@
+import threading
+import time
+
+from search_index import ProductSearchIndex
+
+
+class ProductRow:
+    # One compact row per SKU; supports row['price'] / row.get() so pages
+    # written against the old dict rows keep working.
+    __slots__ = ("id", "name", "price", "stock_level", "image_path")
+
+    def __init__(self, id, name, price, stock_level, image_path=""):
+        self.id = id
+        self.name = name
+        self.price = price
+        self.stock_level = stock_level
+        self.image_path = image_path
+
+    @classmethod
+    def from_record(cls, rec):
+        return cls(int(rec['id']), rec['name'], rec['price'], int(rec['stock_level']), rec.get('image_path') or "")
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __repr__(self):
+        return f"ProductRow(id={self.id}, name={self.name!r}, price={self.price}, stock_level={self.stock_level})"
+
+
+class ProductCatalog:
+    # In-process snapshot of the products table shared by every page.
+    # The full table is only re-read when catalog_version moves.
+    def __init__(self, db, max_age=0.5):
+        self.db = db
+        self.max_age = max_age
+        self.version = None
+        # Bumped by every change to the snapshot (version only tracks the server's counter)
+        self.generation = 0
+        self._rows = None
+        self._by_id = {}
+        self._by_name = {}
+        self.search_index = ProductSearchIndex()
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._rows is not None
+
+    def products(self):
+        self.refresh_if_stale()
+        return self._rows or []
+
+    # Snapshot reads below never touch the database; UI pages call
+    # refresh_if_stale() on the DB worker and re-read when it reports a change.
+    def snapshot(self):
+        return self._rows or []
+
+    def get(self, pid):
+        return self._by_id.get(int(pid))
+
+    def find_by_name(self, name):
+        return [self._by_id[pid] for pid in self._by_name.get(name.strip().lower(), ())]
+
+    def search(self, query, limit=None):
+        index = self.search_index
+        return [self._by_id[pid] for pid in index.search(query, limit) if pid in self._by_id]
+
+    def refresh_if_stale(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._rows is not None and now - self._checked_at < self.max_age:
+                return False
+            self._checked_at = now
+
+            version = self.db.get_catalog_version()
+            if self._rows is not None and (version is None or version == self.version):
+                return False
+            self.load(self.db.get_all_products(), version)
+            return True
+
+    def load(self, records, version=None):
+        rows = [ProductRow.from_record(r) for r in records]
+        by_id = {}
+        by_name = {}
+        for row in rows:
+            by_id[row.id] = row
+            by_name.setdefault(row.name.lower(), []).append(row.id)
+        index = ProductSearchIndex()
+        index.rebuild(rows)
+        self._rows, self._by_id, self._by_name, self.search_index = rows, by_id, by_name, index
+        self.version = version
+        self.generation += 1
+
+    def apply_changes(self, ids, records, version=None):
+        # Patches the rows a change feed named into the snapshot (records from
+        # Database.get_products_by_ids; an id without one was deleted). Runs on the UI
+        # thread, the snapshot's only reader; load() on the worker swaps in whole new
+        # structures instead of mutating these. Returns False, and leaves the next read
+        # to reload, if there is no snapshot yet or a reload is already running.
+        if self._rows is None or not self._lock.acquire(blocking=False):
+            self.invalidate()
+            return False
+        try:
+            if version is not None and self.version is not None and version < self.version:
+                # A reload since these were read already has them
+                return True
+            fresh = {}
+            for rec in records:
+                row = ProductRow.from_record(rec)
+                fresh[row.id] = row
+            for pid in {int(i) for i in ids}:
+                old = self._by_id.pop(pid, None) if pid not in fresh else self._by_id.get(pid)
+                row = fresh.get(pid)
+                if old is not None and (row is None or row.name != old.name):
+                    self._by_name[old.name.lower()].remove(pid)
+                    if not self._by_name[old.name.lower()]:
+                        del self._by_name[old.name.lower()]
+                    self.search_index.remove(pid)
+                if row is not None:
+                    self._by_id[pid] = row
+                    if old is None or row.name != old.name:
+                        self._by_name.setdefault(row.name.lower(), []).append(pid)
+                        self.search_index.add(row)
+            self._rows = list(self._by_id.values())
+            self.generation += 1
+            if version is not None:
+                self.version = version
+            return True
+        finally:
+            self._lock.release()
+
+    def invalidate(self):
+        # Forces the next read to probe the version instead of trusting max_age.
+        self._checked_at = 0.0
@@ -0,0 +1,182 @@
+import csv
+import json
+import os
+import sys
+import time
+
+# Streaming bulk import/export for products and customers (CSV or JSONL, picked
+# by file extension). Rows are validated one by one and written in chunks, each
+# chunk an upsert in its own transaction, so a 20k-line price list is a few
+# dozen round trips instead of 20k dialogs.
+#
+#   python catalog_io.py import products supplier.csv
+#   python catalog_io.py export customers customers.jsonl
+
+CHUNK_SIZE = 1000
+
+PRODUCT_FIELDS = ["id", "name", "price", "image_path", "stock_level"]
+CUSTOMER_FIELDS = ["id", "name", "phone", "email", "customer_type", "loyalty_points"]
+CUSTOMER_TYPES = {"Standard", "Student", "VIP", "Corporate"}
+
+
+def _optional_id(raw):
+    value = str(raw.get("id") or "").strip()
+    if not value:
+        return None
+    pid = int(value)
+    if pid <= 0:
+        raise ValueError("id must be positive")
+    return pid
+
+
+def validate_product(raw):
+    name = str(raw.get("name") or "").strip()
+    if not name:
+        raise ValueError("name is required")
+    if len(name) > 100:
+        raise ValueError("name is longer than 100 characters")
+    price = round(float(raw.get("price")), 2)
+    if price < 0:
+        raise ValueError("price must not be negative")
+    stock = int(raw.get("stock_level", raw.get("stock", 0)) or 0)
+    if stock < 0:
+        raise ValueError("stock_level must not be negative")
+    return {"id": _optional_id(raw), "name": name, "price": price,
+            "image_path": str(raw.get("image_path") or "").strip(), "stock_level": stock}
+
+
+def validate_customer(raw):
+    name = str(raw.get("name") or "").strip()
+    if not name:
+        raise ValueError("name is required")
+    email = str(raw.get("email") or "").strip()
+    if email and "@" not in email:
+        raise ValueError(f"invalid email '{email}'")
+    c_type = str(raw.get("customer_type") or "Standard").strip()
+    if c_type not in CUSTOMER_TYPES:
+        raise ValueError(f"unknown customer_type '{c_type}'")
+    return {"id": _optional_id(raw), "name": name, "phone": str(raw.get("phone") or "").strip(),
+            "email": email, "customer_type": c_type, "loyalty_points": int(raw.get("loyalty_points") or 0)}
+
+
+ENTITIES = {
+    "products": (PRODUCT_FIELDS, validate_product, "upsert_products"),
+    "customers": (CUSTOMER_FIELDS, validate_customer, "upsert_customers"),
+}
+
+
+def _is_jsonl(path):
+    return os.path.splitext(path)[1].lower() in (".jsonl", ".ndjson")
+
+
+def read_rows(path):
+    # Yields (line_number, dict) without loading the file into memory.
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if _is_jsonl(path):
+            for line_no, line in enumerate(f, start=1):
+                if line.strip():
+                    yield line_no, json.loads(line)
+        else:
+            for line_no, row in enumerate(csv.DictReader(f), start=2):
+                yield line_no, row
+
+
+class TransferReport:
+    def __init__(self, entity, path):
+        self.entity = entity
+        self.path = path
+        self.read = 0
+        self.written = 0
+        self.rejected = []
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    @property
+    def rows_per_sec(self):
+        return self.written / self.seconds if self.seconds > 0 else 0.0
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.started
+        return self
+
+    def summary(self):
+        return (f"{self.entity}: {self.written} written, {len(self.rejected)} rejected of {self.read} read "
+                f"in {self.seconds:.2f}s ({self.rows_per_sec:,.0f} rows/s)")
+
+
+def import_file(db, entity, path, chunk_size=CHUNK_SIZE, progress=None):
+    # progress(report) is called after every chunk (from whatever thread runs the import).
+    _, validate, upsert_name = ENTITIES[entity]
+    upsert = getattr(db, upsert_name)
+    report = TransferReport(entity, path)
+    chunk, chunk_lines = [], []
+
+    def flush():
+        if not chunk:
+            return
+        if upsert(chunk) is False:
+            report.rejected.extend((line_no, "database error; chunk rolled back") for line_no in chunk_lines)
+        else:
+            report.written += len(chunk)
+        chunk.clear()
+        chunk_lines.clear()
+        if progress:
+            progress(report)
+
+    try:
+        for line_no, raw in read_rows(path):
+            report.read += 1
+            try:
+                chunk.append(validate(raw))
+                chunk_lines.append(line_no)
+            except (ValueError, TypeError) as e:
+                report.rejected.append((line_no, str(e)))
+            if len(chunk) >= chunk_size:
+                flush()
+        flush()
+    except (OSError, csv.Error, json.JSONDecodeError) as e:
+        report.rejected.append((None, f"could not read file: {e}"))
+    return report.finish()
+
+
+def export_file(db, entity, path, chunk_size=CHUNK_SIZE, progress=None):
+    fields = ENTITIES[entity][0]
+    report = TransferReport(entity, path)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = None if _is_jsonl(path) else csv.DictWriter(f, fieldnames=fields)
+        if writer:
+            writer.writeheader()
+        for rows in db.iter_table(entity, fields, chunk_size):
+            for row in rows:
+                row = {k: (float(v) if k == "price" else v) for k, v in row.items()}
+                if writer:
+                    writer.writerow(row)
+                else:
+                    f.write(json.dumps(row, default=str) + "\n")
+            report.read += len(rows)
+            report.written += len(rows)
+            if progress:
+                progress(report)
+    return report.finish()
+
+
+def main(argv):
+    if len(argv) != 4 or argv[1] not in ("import", "export") or argv[2] not in ENTITIES:
+        print("usage: python catalog_io.py import|export products|customers FILE.csv|FILE.jsonl")
+        return 2
+    from database import Database
+    db = Database()
+    action, entity, path = argv[1], argv[2], argv[3]
+    show = lambda r: print(f"\r{r.written} rows...", end="", flush=True)
+    report = (import_file if action == "import" else export_file)(db, entity, path, progress=show)
+    print("\r" + report.summary())
+    for line_no, error in report.rejected[:20]:
+        print(f"  line {line_no}: {error}")
+    if len(report.rejected) > 20:
+        print(f"  ... {len(report.rejected) - 20} more")
+    db.close()
+    return 0 if not report.rejected else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
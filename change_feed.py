@@ -0,0 +1,79 @@
+import time
+
+# Cross-till change notifications. Every write that touches a product or customer
+# logs its ids to change_log (Database._log_changes) in the same transaction; each
+# till polls for entries after the last sequence number it saw, a primary key range
+# read that is empty almost every time, and patches only those rows into its views.
+
+BATCH = 500
+# A missing sequence number is usually a writer that has not committed yet; after
+# this long it is taken to be a rolled-back one and skipped.
+GAP_WAIT = 10.0
+# Feeds behind by more than this may have lost entries to Database.prune_change_log.
+RESYNC_AFTER = 3600.0
+
+
+class ChangeFeed:
+    def __init__(self, db, batch=BATCH, gap_wait=GAP_WAIT, resync_after=RESYNC_AFTER):
+        self.db = db
+        self.batch = batch
+        self.gap_wait = gap_wait
+        self.resync_after = resync_after
+        self.seq = None          # everything up to here has been delivered
+        self._seen = set()       # delivered sequence numbers above a gap
+        self._gap_since = None
+        self._polled_at = None
+
+    def poll(self):
+        # Runs on the DB worker. Returns {entity: set of ids}, where None instead of a set
+        # means "reload them all"; {} if nothing changed or the server is unreachable.
+        now = time.monotonic()
+        if self.seq is None or now - self._polled_at > self.resync_after:
+            first = self.seq is None
+            seq = self.db.get_change_seq()
+            if seq is None:
+                return {}
+            self.seq, self._seen, self._gap_since, self._polled_at = seq, set(), None, now
+            # The first poll only finds the starting point; the till has just loaded everything.
+            return {} if first else {"product": None, "customer": None}
+
+        rows = self.db.get_changes(self.seq, self.batch)
+        if rows is None:
+            return {}
+        self._polled_at = now
+        changes = {}
+        for seq, entity, entity_id in rows:
+            if seq in self._seen:
+                continue
+            self._seen.add(seq)
+            if entity_id is None:
+                changes[entity] = None
+            elif changes.get(entity, ()) is not None:
+                changes.setdefault(entity, set()).add(entity_id)
+        self._advance(now)
+        return changes
+
+    def _advance(self, now):
+        while self.seq + 1 in self._seen:
+            self.seq += 1
+            self._seen.discard(self.seq)
+        if not self._seen:
+            self._gap_since = None
+        elif self._gap_since is None:
+            self._gap_since = now
+        elif now - self._gap_since > self.gap_wait:
+            self.seq = min(self._seen) - 1
+            self._gap_since = None
+            self._advance(now)
+
+    def fetch(self, entity, ids):
+        # Runs on the DB worker: the current rows for changed ids, for views to patch in.
+        # Returns (entity, ids, records, catalog_version); records None means reload in full.
+        if ids is None:
+            return entity, None, None, None
+        if entity == "product":
+            version = self.db.get_catalog_version()
+            return entity, ids, self.db.get_products_by_ids(ids), version
+        if entity == "customer":
+            return entity, ids, self.db.get_customers_by_ids(ids), None
+        return entity, ids, [], None
@@ -1,16 +1,24 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
-import datetime
+from tkinter import ttk, messagebox
 import webbrowser
 import os
+from decimal import Decimal, InvalidOperation
+from db_worker import WorkerBusyError, BUSY_RETRY_MS
+
+CUSTOMER_SEARCH_DEBOUNCE_MS = 250
 
 class CheckoutPage(tk.Frame):
     def __init__(self, parent, controller):
         super().__init__(parent)
         self.controller = controller
-        self.discount_percent = 0.0
-        self.vip_discount = 0.0
-        self.final_total = 0.0
+        self.customer_type = "Standard"
+        self.voucher_code = None
+        self.quote = None
+        self.final_total = Decimal(0)
+        self.customers_data = []
+        self.selected_customer = None
+        self.customer_search_id = None
+        self.last_customer_term = None
         
         tk.Label(self, text="Checkout & Payment", font=("Helvetica", 18, "bold")).pack(pady=20)
         main_frame = tk.Frame(self)
@@ -18,11 +26,14 @@ class CheckoutPage(tk.Frame):
         
         left_col = tk.LabelFrame(main_frame, text="1. Customer Details", font=("bold"), padx=20, pady=20)
         left_col.pack(side="left", fill="both", expand=True, padx=(0, 10))
-        tk.Label(left_col, text="Select Existing Customer:").pack(anchor="w")
+        tk.Label(left_col, text="Find Customer (name, phone or email):").pack(anchor="w")
         self.customer_var = tk.StringVar()
-        self.customer_combo = ttk.Combobox(left_col, textvariable=self.customer_var, state="readonly")
-        self.customer_combo.pack(fill="x", pady=(5, 20))
-        self.customer_combo.bind("<<ComboboxSelected>>", self.on_customer_select)
+        self.customer_entry = tk.Entry(left_col, textvariable=self.customer_var)
+        self.customer_entry.pack(fill="x", pady=(5, 0))
+        self.customer_entry.bind("<KeyRelease>", self.on_customer_typed)
+        self.customer_list = tk.Listbox(left_col, height=5, exportselection=False)
+        self.customer_list.pack(fill="x", pady=(0, 20))
+        self.customer_list.bind("<<ListboxSelect>>", self.on_customer_select)
         self.lbl_loyalty = tk.Label(left_col, text="Points: 0 | Type: Standard", fg="blue", font=("Helvetica", 10))
         self.lbl_loyalty.pack(anchor="w", pady=5)
         tk.Label(left_col, text="-- OR --", fg="#666").pack(pady=5)
@@ -54,43 +65,99 @@ class CheckoutPage(tk.Frame):
 
         self.lbl_subtotal = tk.Label(right_col, text="Subtotal: $0.00", font=("Helvetica", 11), anchor="e")
         self.lbl_subtotal.pack(fill="x", pady=2)
+        self.lbl_breaks = tk.Label(right_col, text="Multi-buy: -$0.00", font=("Helvetica", 10), fg="blue", anchor="e")
         self.lbl_vip_disc = tk.Label(right_col, text="VIP Discount (5%): -$0.00", font=("Helvetica", 10), fg="blue", anchor="e")
         self.lbl_discount = tk.Label(right_col, text="Voucher: -$0.00 (0%)", font=("Helvetica", 11), fg="green", anchor="e")
         self.lbl_discount.pack(fill="x", pady=2)
         tk.Frame(right_col, height=2, bg="#333").pack(fill="x", pady=10)
         self.lbl_total = tk.Label(right_col, text="Total: $0.00", font=("Helvetica", 16, "bold"), anchor="e")
         self.lbl_total.pack(fill="x", pady=10)
-        tk.Button(right_col, text="Confirm & Pay", command=self.process_payment, bg="#4CAF50", fg="white", font=("Helvetica", 12, "bold"), height=2).pack(fill="x", pady=20)
+        self.pay_btn = tk.Button(right_col, text="Confirm & Pay", command=self.process_payment, bg="#4CAF50", fg="white", font=("Helvetica", 12, "bold"), height=2)
+        self.pay_btn.pack(fill="x", pady=20)
         tk.Button(self, text="Back to Cart", command=lambda: controller.show_frame("CartPage")).pack(pady=10)
 
     def refresh(self):
-        self.discount_percent = 0.0 
-        self.vip_discount = 0.0
+        self.customer_type = "Standard"
+        self.voucher_code = None
         self.voucher_entry.delete(0, tk.END)
+        self.selected_customer = None
+        self.customer_var.set("")
+        self.lbl_loyalty.config(text="Points: 0 | Type: Standard")
+        self.lbl_vip_disc.pack_forget()
         self.load_customers()
         self.update_totals()
+        self.probe_catalog()
+        self.load_vouchers()
+
+    def probe_catalog(self):
+        try:
+            self.controller.worker.submit(self.controller.catalog.refresh_if_stale, key="checkout.catalog",
+                                          on_done=lambda changed: changed and self.update_totals())
+        except WorkerBusyError:
+            self.after(BUSY_RETRY_MS, self.probe_catalog)
+
+    def load_vouchers(self):
+        # Voucher codes are checked in memory by the pricing engine; refreshed once per checkout
+        try:
+            self.controller.worker.submit(self.controller.pricing.load_vouchers, self.controller.db, key="checkout.vouchers",
+                                          on_error=lambda e: print(f"Could not load vouchers: {e}"))
+        except WorkerBusyError:
+            self.after(BUSY_RETRY_MS, self.load_vouchers)
+
+    def load_customers(self, term=""):
+        # Server-side typeahead: only the top matches are fetched, never the whole table.
+        self.last_customer_term = term
+        try:
+            self.controller.worker.submit(self.controller.db.search_customers, term, key="checkout.customers",
+                                          on_done=self.on_customers_loaded,
+                                          on_error=lambda e: self.show_customer_matches([], "Could not load customers"))
+        except WorkerBusyError:
+            # Typing again retries; an untouched box retries on its own
+            self.show_customer_matches([], "Till is busy, retrying...")
+            self.after(BUSY_RETRY_MS, lambda: term == self.last_customer_term and self.load_customers(term))
+
+    def on_customer_typed(self, event):
+        if self.customer_search_id:
+            self.after_cancel(self.customer_search_id)
+        self.customer_search_id = self.after(CUSTOMER_SEARCH_DEBOUNCE_MS, self.run_customer_search)
+
+    def run_customer_search(self):
+        self.customer_search_id = None
+        term = self.customer_var.get().strip()
+        if self.selected_customer and term == self.customer_label(self.selected_customer):
+            return
+        if term != self.last_customer_term:
+            self.load_customers(term)
+
+    def on_customers_loaded(self, customers):
+        self.show_customer_matches(customers, "No matching customers")
+        if self.selected_customer is None and customers and not self.last_customer_term:
+            self.select_customer(customers[0])
+
+    def show_customer_matches(self, customers, empty_text):
+        self.customers_data = customers
+        self.customer_list.delete(0, tk.END)
+        for c in customers:
+            self.customer_list.insert(tk.END, self.customer_label(c))
+        if not customers:
+            self.customer_list.insert(tk.END, empty_text)
 
-    def load_customers(self):
-        self.customers_data = self.controller.db.get_all_customers()
-        self.customer_combo['values'] = [f"{c['id']} - {c['name']}" for c in self.customers_data]
-        if self.customer_combo['values']:
-            self.customer_combo.current(0)
-            self.on_customer_select(None)
+    def customer_label(self, cust):
+        contact = cust.get('phone') or cust.get('email') or ""
+        return f"{cust['id']} - {cust['name']}" + (f" ({contact})" if contact else "")
 
     def on_customer_select(self, event):
-        idx = self.customer_combo.current()
-        if idx >= 0:
-            cust = self.customers_data[idx]
-            c_type = cust.get('customer_type', 'Standard')
-            points = cust.get('loyalty_points', 0)
-            self.lbl_loyalty.config(text=f"Points: {points} | Type: {c_type}")
-            if c_type == 'VIP':
-                self.vip_discount = 0.05
-                self.lbl_vip_disc.pack(fill="x", after=self.lbl_subtotal)
-            else:
-                self.vip_discount = 0.0
-                self.lbl_vip_disc.pack_forget()
-            self.update_totals()
+        selection = self.customer_list.curselection()
+        if selection and selection[0] < len(self.customers_data):
+            self.select_customer(self.customers_data[selection[0]])
+
+    def select_customer(self, cust):
+        self.selected_customer = cust
+        self.customer_var.set(self.customer_label(cust))
+        self.customer_type = cust.get('customer_type') or 'Standard'
+        points = cust.get('loyalty_points', 0)
+        self.lbl_loyalty.config(text=f"Points: {points} | Type: {self.customer_type}")
+        self.update_totals()
 
     def on_payment_change(self, event):
         if self.payment_method_combo.get() == "Cash":
@@ -100,37 +167,42 @@ class CheckoutPage(tk.Frame):
 
     def calculate_change(self, event):
         try:
-            given = float(self.cash_entry.get())
+            given = Decimal(self.cash_entry.get().strip())
             change = given - self.final_total
             if change < 0:
                 self.lbl_change.config(text="Insufficient", fg="red")
             else:
                 self.lbl_change.config(text=f"Change: ${change:.2f}", fg="green")
-        except ValueError:
+        except InvalidOperation:
             self.lbl_change.config(text="Invalid", fg="red")
 
     def update_totals(self):
-        products = self.controller.db.get_all_products()
-        subtotal = 0.0 
-        for pid, qty in self.controller.cart.items():
-            prod = next((p for p in products if p['id'] == int(pid)), None)
-            if prod: subtotal += float(prod['price']) * qty
-        vip_amt = subtotal * self.vip_discount
-        temp_total = subtotal - vip_amt
-        voucher_amt = temp_total * self.discount_percent
-        self.final_total = temp_total - voucher_amt
-        self.lbl_subtotal.config(text=f"Subtotal: ${subtotal:.2f}")
-        self.lbl_vip_disc.config(text=f"VIP Discount (5%): -${vip_amt:.2f}")
-        self.lbl_discount.config(text=f"Voucher: -${voucher_amt:.2f} ({int(self.discount_percent*100)}%)")
+        # Memoized in the pricing engine: re-running this on every UI event is cheap
+        quote = self.controller.pricing.price(self.controller.cart, self.customer_type, self.voucher_code)
+        self.quote = quote
+        self.final_total = quote.total
+        self.lbl_subtotal.config(text=f"Subtotal: ${quote.subtotal:.2f}")
+        after = self.lbl_subtotal
+        for kind, label in (("breaks", self.lbl_breaks), ("tier", self.lbl_vip_disc)):
+            found = [d for d in quote.discounts if d[0] == kind]
+            if found:
+                label.config(text=f"{found[0][1]}: -${found[0][2]:.2f}")
+                label.pack(fill="x", after=after)
+                after = label
+            else:
+                label.pack_forget()
+        voucher = quote.voucher
+        rate = f"{voucher.rate * 100:.0f}%" if voucher else "0%"
+        self.lbl_discount.config(text=f"Voucher: -${quote.discount('voucher'):.2f} ({rate})")
         self.lbl_total.config(text=f"Total: ${self.final_total:.2f}")
 
     def apply_voucher(self):
-        code = self.voucher_entry.get().strip()
-        if code == "ais10":
-            self.discount_percent = 0.10
-            messagebox.showinfo("Voucher", "10% Applied!")
+        voucher = self.controller.pricing.voucher(self.voucher_entry.get())
+        if voucher:
+            self.voucher_code = voucher.code
+            messagebox.showinfo("Voucher", f"{voucher.rate * 100:.0f}% Applied!")
         else:
-            self.discount_percent = 0.0
+            self.voucher_code = None
             messagebox.showerror("Error", "Invalid Code")
         self.update_totals()
 
@@ -154,9 +226,14 @@ class CheckoutPage(tk.Frame):
         e_type.pack(fill="x", padx=20)
         def save_quick():
             if not e_name.get(): return
-            self.controller.db.add_customer(e_name.get(), e_phone.get(), e_email.get(), e_type.get())
+            cust = {'name': e_name.get(), 'phone': e_phone.get(), 'email': e_email.get(),
+                    'customer_type': e_type.get(), 'loyalty_points': 0}
+            cust['id'] = self.controller.db.add_customer(cust['name'], cust['phone'], cust['email'], cust['customer_type'])
+            if not cust['id']:
+                messagebox.showerror("Error", "Could not create customer")
+                return
             popup.destroy()
-            self.load_customers() 
+            self.select_customer(cust)
             messagebox.showinfo("Success", "Customer Created")
         tk.Button(popup, text="Save", command=save_quick, bg="#4CAF50", fg="white").pack(pady=20)
 
@@ -166,29 +243,50 @@ class CheckoutPage(tk.Frame):
             return
         if self.payment_method_combo.get() == "Cash":
             try:
-                given = float(self.cash_entry.get())
+                given = Decimal(self.cash_entry.get().strip())
                 if given < self.final_total:
                     messagebox.showerror("Payment Error", "Insufficient Cash")
                     return
-            except ValueError:
+            except InvalidOperation:
                 messagebox.showerror("Payment Error", "Invalid Cash Amount")
                 return
-        cust_str = self.customer_var.get()
-        if not cust_str:
+        if not self.selected_customer or self.customer_var.get().strip() != self.customer_label(self.selected_customer):
             messagebox.showerror("Error", "Select customer")
             return
-        cust_id = int(cust_str.split(" - ")[0])
+        cust_id = self.selected_customer['id']
         user_id = self.controller.current_user['id'] 
-        self.controller.last_payment_method = self.payment_method_combo.get()
-        self.controller.last_discount_amt = (self.final_total / (1 - self.discount_percent)) * self.discount_percent
-        order_id = self.controller.db.process_transaction(cust_id, user_id, self.controller.cart, self.final_total)
-        if order_id:
-            self.controller.current_order_id = order_id
-            self.controller.cart = {} 
+        # Shelf prices and names the customer saw; only used if the sale has to be journaled offline
+        self.update_totals()
+        prices, names = self.quote.prices, {}
+        for pid in prices:
+            names[pid] = self.controller.catalog.get(pid)['name']
+        self.pay_btn.config(state="disabled", text="Processing...")
+        try:
+            self.controller.worker.submit(self.controller.db.checkout, cust_id, user_id,
+                                          dict(self.controller.cart), self.final_total, prices, names,
+                                          self.payment_method_combo.get(), reservation=self.controller.reservations.token,
+                                          on_done=self.on_payment_result, on_error=self.on_payment_error)
+        except WorkerBusyError:
+            # Nothing was charged; the cashier simply presses Pay again
+            self.pay_btn.config(state="normal", text="Confirm & Pay")
+            messagebox.showwarning("Till Busy", "The till is still busy with earlier requests. Please try again.")
+
+    def on_payment_result(self, receipt):
+        self.pay_btn.config(state="normal", text="Confirm & Pay")
+        if receipt:
+            # The receipt page renders straight from this record; no queries needed
+            self.controller.last_receipt = receipt
+            self.controller.current_order_id = receipt['order_id']
+            self.controller.cart.clear()
+            self.controller.catalog.invalidate()
             self.controller.show_frame("ReceiptPage")
         else:
             messagebox.showerror("Error", "Transaction failed.")
 
+    def on_payment_error(self, error):
+        self.pay_btn.config(state="normal", text="Confirm & Pay")
+        messagebox.showerror("Error", f"Transaction failed: {error}")
+
 class ReceiptPage(tk.Frame):
     def __init__(self, parent, controller):
         super().__init__(parent)
@@ -212,23 +310,22 @@ class ReceiptPage(tk.Frame):
                   bg="#2196F3", fg="white", font=("Helvetica", 12, "bold"), padx=20, pady=5).pack(side="left", padx=20)
 
     def refresh(self):
-        oid = self.controller.current_order_id
-        if not oid: return
-        items = self.controller.db.get_order_items(oid)
+        receipt = getattr(self.controller, 'last_receipt', None)
+        if receipt:
+            self.render(receipt)
+
+    def render(self, receipt):
+        # receipt: the record Database.checkout() / get_receipt() returns
         cashier = self.controller.current_user['username'].capitalize() if self.controller.current_user else "Unknown"
-        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        pay_method = getattr(self.controller, 'last_payment_method', 'Cash')
-        subtotal = sum(float(i['price_at_time']) * i['quantity'] for i in items)
-        try:
-            conn = self.controller.db.get_connection()
-            c = conn.cursor()
-            c.execute("SELECT total_amount FROM orders WHERE id=%s", (oid,))
-            final_total = float(c.fetchone()[0])
-            conn.close()
-        except:
-            final_total = subtotal
+        oid = receipt['order_id']
+        items = receipt['lines']
+        date = receipt['date']
+        now = date.strftime("%Y-%m-%d %H:%M:%S") if hasattr(date, 'strftime') else str(date)
+        pay_method = receipt['payment_method']
+        subtotal = receipt['subtotal']
+        final_total = receipt['total']
         gst_val = final_total * 3 / 23 
-        discount_val = subtotal - final_total
+        discount_val = receipt['discount']
         preview_lines = [
             f"{'BIJULI TECH POS':^58}",
             f"{'123 University Road, Auckland':^58}",
@@ -254,6 +351,8 @@ class ReceiptPage(tk.Frame):
         preview_lines.append(f"{'TOTAL (Inc. GST):':<45} ${final_total:>10.2f}")
         preview_lines.append(f"{'GST (15%):':<45} ${gst_val:>10.2f}")
         preview_lines.append("-" * 58)
+        if receipt['offline']:
+            preview_lines.append(f"{'OFFLINE SALE - will sync when the server is back':^58}")
         self.txt_preview.config(state="normal")
         self.txt_preview.delete("1.0", tk.END)
         self.txt_preview.insert("1.0", "\n".join(preview_lines))
@@ -0,0 +1,206 @@
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+from mysql.connector.errors import PoolError
+
+
+class PooledConnection:
+    # Thin proxy handed out by the pool. close() gives the connection back
+    # instead of tearing down the socket, so existing callers keep working.
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._entry.raw, name)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._entry.raw.cursor(*args, **kwargs)
+        hook = self._pool.cursor_hook
+        return hook(cursor) if hook else cursor
+
+    def is_connected(self):
+        # A lease reports connected until it is handed back, so the usual
+        # "if conn.is_connected(): conn.close()" always returns it to the pool.
+        return not self._released
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        self._pool.release(self._entry)
+
+
+class _PoolEntry:
+    __slots__ = ("raw", "created_at", "last_used")
+
+    def __init__(self, raw):
+        now = time.monotonic()
+        self.raw = raw
+        self.created_at = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    def __init__(self, config, size=5, timeout=10.0, health_check_after=30.0,
+                 max_lifetime=3600.0, reconnect_on_stale=True, connect=None, cursor_hook=None):
+        self.config = dict(config)
+        self.size = size
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self.max_lifetime = max_lifetime
+        self.reconnect_on_stale = reconnect_on_stale
+        self._connect = connect or (lambda: mysql.connector.connect(**self.config))
+        # Optional wrapper applied to every cursor handed out (e.g. instrumentation)
+        self.cursor_hook = cursor_hook
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._open = 0
+        self._closed = False
+
+        self._acquired = 0
+        self._created = 0
+        self._reconnects = 0
+        self._health_checks = 0
+        self._discarded = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def acquire(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        waited = False
+        entry = None
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolError("Connection pool is closed")
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolError(f"No connection available after {timeout:.1f}s (pool size {self.size})")
+                if not waited:
+                    waited = True
+                    self._waits += 1
+                self._cond.wait(remaining)
+
+            wait = time.monotonic() - start
+            self._acquired += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+
+        try:
+            entry = self._checkout(entry)
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        return PooledConnection(self, entry)
+
+    def _checkout(self, entry):
+        if entry is None:
+            return self._dial()
+
+        now = time.monotonic()
+        if now - entry.created_at > self.max_lifetime:
+            self._close_quietly(entry.raw)
+            with self._cond:
+                self._reconnects += 1
+            return self._dial()
+
+        if now - entry.last_used > self.health_check_after:
+            with self._cond:
+                self._health_checks += 1
+            if not self._is_healthy(entry.raw):
+                self._close_quietly(entry.raw)
+                if not self.reconnect_on_stale:
+                    raise PoolError("Pooled connection went stale")
+                with self._cond:
+                    self._reconnects += 1
+                return self._dial()
+        return entry
+
+    def _dial(self):
+        raw = self._connect()
+        with self._cond:
+            self._created += 1
+        return _PoolEntry(raw)
+
+    def _is_healthy(self, raw):
+        try:
+            raw.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def release(self, entry):
+        raw = entry.raw
+        healthy = True
+        try:
+            if getattr(raw, "unread_result", False):
+                raw.consume_results()
+            if raw.in_transaction:
+                raw.rollback()
+        except Exception:
+            healthy = False
+
+        with self._cond:
+            if healthy and not self._closed:
+                entry.last_used = time.monotonic()
+                self._idle.append(entry)
+            else:
+                self._open -= 1
+                self._discarded += 1
+            self._cond.notify()
+
+        if not healthy or self._closed:
+            self._close_quietly(raw)
+
+    def close_all(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for entry in idle:
+            self._close_quietly(entry.raw)
+
+    def _close_quietly(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._open - len(self._idle),
+                'acquired': self._acquired,
+                'created': self._created,
+                'reconnects': self._reconnects,
+                'health_checks': self._health_checks,
+                'discarded': self._discarded,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'wait_time_total': round(self._wait_total, 6),
+                'wait_time_max': round(self._wait_max, 6),
+                'wait_time_avg': round(self._wait_total / self._acquired, 6) if self._acquired else 0.0,
+            }
@@ -1,5 +1,8 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
+from tree_sync import TreeviewSync
+from db_worker import WorkerBusyError, BUSY_RETRY_MS
+import catalog_io
 
 class CustomerManager(tk.Frame):
     def __init__(self, parent, controller):
@@ -33,6 +36,12 @@ class CustomerManager(tk.Frame):
         
         tk.Button(toolbar, text="↻ Refresh List", command=self.load_data,
                   bg="white", fg="#333").pack(side="right", padx=5)
+        tk.Button(toolbar, text="Export...", command=self.export_customers,
+                  bg="white", fg="#333").pack(side="right", padx=5)
+        tk.Button(toolbar, text="Import...", command=self.import_customers,
+                  bg="white", fg="#333").pack(side="right", padx=5)
+        self.lbl_transfer = tk.Label(toolbar, text="", bg="#f0f0f0", fg="#666")
+        self.lbl_transfer.pack(side="right", padx=10)
 
         # Table
         table_frame = tk.Frame(self)
@@ -56,22 +65,81 @@ class CustomerManager(tk.Frame):
                 self.tree.column(col, width=50, anchor="center")
             else:
                 self.tree.column(col, width=120)
-        
-        self.load_data()
+        self.table = TreeviewSync(self.tree)
+        # Rows are loaded by refresh() when the page is first shown
 
     def refresh(self):
         self.load_data()
 
+    def import_customers(self):
+        path = filedialog.askopenfilename(filetypes=[("CSV or JSONL", "*.csv *.jsonl"), ("All files", "*.*")])
+        if path:
+            self.run_transfer(catalog_io.import_file, path, "Imported")
+
+    def export_customers(self):
+        path = filedialog.asksaveasfilename(defaultextension=".csv", initialfile="customers.csv",
+                                            filetypes=[("CSV", "*.csv"), ("JSONL", "*.jsonl")])
+        if path:
+            self.run_transfer(catalog_io.export_file, path, "Exported")
+
+    def run_transfer(self, fn, path, verb):
+        # Runs on the worker; the progress callback only stores the count, the Tk side polls it.
+        self.transfer_rows = 0
+        def progress(report):
+            self.transfer_rows = report.written
+        try:
+            self.controller.worker.submit(fn, self.db, "customers", path, progress=progress, key="customers.transfer",
+                                          on_done=lambda r: self.on_transfer_done(r, verb),
+                                          on_error=self.on_transfer_error)
+        except WorkerBusyError as e:
+            self.on_transfer_error(e)
+            return
+        self.poll_transfer()
+
+    def poll_transfer(self):
+        if not self.controller.worker.is_pending("customers.transfer"):
+            return
+        self.lbl_transfer.config(text=f"{self.transfer_rows:,} rows...")
+        self.after(200, self.poll_transfer)
+
+    def on_transfer_done(self, report, verb):
+        self.lbl_transfer.config(text=f"{verb} {report.written:,} rows ({report.rows_per_sec:,.0f}/s)")
+        if verb == "Imported":
+            self.load_data()
+        if report.rejected:
+            lines = "\n".join(f"line {n}: {err}" for n, err in report.rejected[:10])
+            more = f"\n... and {len(report.rejected) - 10} more" if len(report.rejected) > 10 else ""
+            messagebox.showwarning("Customer Import/Export", f"{report.summary()}\n\nRejected rows:\n{lines}{more}")
+
+    def on_transfer_error(self, error):
+        self.lbl_transfer.config(text="")
+        messagebox.showerror("Customer Import/Export", f"Transfer failed: {error}")
+
     def load_data(self):
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-            
-        customers = self.db.get_all_customers()
-        for c in customers:
-            c_type = c.get('customer_type', 'Standard') 
-            points = c.get('loyalty_points', 0)
-            # Insert Points into the view
-            self.tree.insert("", "end", values=(c['id'], c['name'], c['phone'], c['email'], c_type, points))
+        try:
+            self.controller.worker.submit(self.db.get_all_customers, key="customers.load", on_done=self.populate,
+                                          on_error=lambda e: messagebox.showerror("Error", f"Could not load customers: {e}"))
+        except WorkerBusyError:
+            self.after(BUSY_RETRY_MS, self.load_data)
+
+    def populate(self, customers):
+        self.table.sync(self.customer_row(c['id'], c['name'], c['phone'], c['email'],
+                                          c.get('customer_type', 'Standard'), c.get('loyalty_points', 0))
+                        for c in customers)
+
+    def on_data_changed(self, entity, ids, records):
+        # Edits and loyalty points from any till (POSApp.poll_changes): patch just those rows
+        if entity != "customer":
+            return
+        if ids is None:
+            self.load_data()
+        else:
+            self.table.patch(ids, (self.customer_row(c['id'], c['name'], c['phone'], c['email'],
+                                                     c.get('customer_type', 'Standard'), c.get('loyalty_points', 0))
+                                   for c in records))
+
+    def customer_row(self, cid, name, phone, email, c_type, points):
+        return str(cid), (cid, name, phone or "", email or "", c_type, points), ()
 
     def open_add_popup(self):
         self.popup_form("Add Customer")
@@ -131,12 +199,20 @@ class CustomerManager(tk.Frame):
                 return
 
             if data:
-                self.db.update_customer(data[0], name, phone, email, c_type)
+                cid = data[0] if self.db.update_customer(data[0], name, phone, email, c_type) else None
+                points = data[5] if len(data) > 5 else 0
             else:
-                self.db.add_customer(name, phone, email, c_type)
+                cid = self.db.add_customer(name, phone, email, c_type)
+                points = 0
+            if not cid:
+                messagebox.showerror("Error", "Could not save customer.")
+                return
             
             popup.destroy()
-            self.load_data()
+            # Patch just this row instead of reloading the table
+            self.table.upsert(*self.customer_row(cid, name, phone, email, c_type, points))
+            self.tree.selection_set(str(cid))
+            self.tree.see(str(cid))
             messagebox.showinfo("Success", "Customer Saved")
 
         tk.Button(popup, text="Save Customer", command=save, 
@@ -151,5 +227,5 @@ class CustomerManager(tk.Frame):
         name = item['values'][1]
         
         if messagebox.askyesno("Confirm", f"Delete customer '{name}'?"):
-            self.db.delete_customer(cid)
-            self.load_data()
\ No newline at end of file
+            if self.db.delete_customer(cid):
+                self.table.remove(cid)
\ No newline at end of file
@@ -1,20 +1,150 @@
-import mysql.connector
+import collections
+import datetime
+import functools
+import random
+import threading
+import time
+import backends
+import instrumentation
+from connection_pool import ConnectionPool
 
+def _placeholders(n):
+    return ", ".join(["%s"] * n)
+
+def _like_prefix(term):
+    # Pair with LIKE %s ESCAPE '!'; an explicit escape char reads the same in MySQL and SQLite.
+    escaped = term.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+    return escaped + "%"
+
+def make_receipt(order_id, order_date, customer_id, user_id, lines, total, payment_method, subtotal=None, offline=False):
+    # The record checkout hands to the receipt page. lines: dicts with name, quantity,
+    # price_at_time (the same shape get_order_items returns).
+    lines = [dict(line) for line in lines]
+    if subtotal is None:
+        subtotal = sum(float(line['price_at_time']) * line['quantity'] for line in lines)
+    subtotal, total = round(float(subtotal), 2), round(float(total), 2)
+    return {
+        'order_id': order_id,
+        'date': order_date,
+        'customer_id': customer_id,
+        'user_id': user_id,
+        'lines': lines,
+        'subtotal': subtotal,
+        'discount': round(max(subtotal - total, 0), 2),
+        'total': total,
+        'payment_method': payment_method or "Cash",
+        'offline': offline,
+    }
+
+def journal_receipt(entry):
+    lines = [{'product_id': int(pid), 'name': (entry.get('names') or {}).get(pid) or f"Product #{pid}",
+              'quantity': qty, 'price_at_time': entry['prices'][pid]} for pid, qty in entry['items'].items()]
+    return make_receipt(entry['journal_id'], datetime.datetime.fromisoformat(entry['ts']), entry['customer_id'],
+                        entry['user_id'], lines, entry['total'], entry.get('payment_method'), offline=True)
+
+# How long a cart's stock holds last without activity (see Database.reserve_stock).
+RESERVATION_TTL = datetime.timedelta(minutes=15)
+
+class LockConflict(Exception):
+    # Raised inside a write transaction that lost a lock race (see backends.lock_conflict);
+    # retry_lock_conflicts rolls it into a bounded retry.
+    def __init__(self, kind, error):
+        super().__init__(f"{kind}: {error}")
+        self.kind = kind
+        self.error = error
+
+def retry_lock_conflicts(method=None, *, gave_up=False):
+    # Re-runs a whole write transaction after a deadlock or lock wait timeout, with
+    # exponential backoff and jitter, up to self.lock_retries times; then reports failure
+    # (`gave_up`, False like any other failed transaction unless the method asks for a
+    # different value). Counts end up in Database.lock_retry_stats().
+    if method is None:
+        return functools.partial(retry_lock_conflicts, gave_up=gave_up)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                result = method(self, *args, **kwargs)
+                if attempt:
+                    self._count_lock_retry(method.__name__, "recovered")
+                return result
+            except LockConflict as conflict:
+                self._count_lock_retry(method.__name__, conflict.kind)
+                if attempt >= self.lock_retries:
+                    self._count_lock_retry(method.__name__, "gave_up")
+                    print(f"Transaction Failed after {attempt + 1} attempts: {conflict}")
+                    return gave_up
+                delay = min(self.lock_backoff * 2 ** attempt, 2.0)
+                time.sleep(delay * random.uniform(0.5, 1.0))
+                attempt += 1
+    return wrapper
+
+@instrumentation.instrument_methods
 class Database:
-    def __init__(self):
+    def __init__(self, pool_size=5, pool_timeout=10.0, health_check_after=30.0, database='soft605_pos', backend=None,
+                 journal=None, lock_retries=3, lock_backoff=0.05):
         self.config = {
             'user': 'root',
             'password': '',
             'host': 'localhost',
-            'database': 'soft605_pos'
+            'database': database
         }
+        # MySQL unless POS_DB_BACKEND says otherwise; see backends.py.
+        self.backend = backend or backends.from_env(self.config)
+        self.dialect = self.backend.dialect
+        # Optional sales_journal.SalesJournal: sales are kept there while the server is unreachable.
+        self.journal = journal
+        # Per-method, per-statement and pool-wait timings; see instrumentation.py.
+        self.metrics = instrumentation.metrics
+        # Deadlocks and lock wait timeouts in sale transactions are retried this many times.
+        self.lock_retries = lock_retries
+        self.lock_backoff = lock_backoff
+        self._lock_retries = collections.Counter()
+        self._lock_retries_lock = threading.Lock()
+        # Connections are dialed lazily and kept warm; conn.close() hands them back.
+        self.pool = ConnectionPool(self.config, size=pool_size, timeout=pool_timeout,
+                                   health_check_after=health_check_after, connect=self.backend.connect,
+                                   cursor_hook=lambda cursor: instrumentation.InstrumentedCursor(cursor, self.metrics))
 
+    @instrumentation.untimed
     def get_connection(self):
+        # Timed as "connect": pool wait plus dialing when no idle connection is warm.
+        start = time.perf_counter()
         try:
-            return mysql.connector.connect(**self.config)
-        except mysql.connector.Error as err:
+            conn = self.pool.acquire()
+        except backends.DB_ERRORS as err:
+            self.metrics.error("connect", "pool")
             print(f"DB Connection Error: {err}")
             return None
+        self.metrics.observe("connect", "pool", time.perf_counter() - start)
+        return conn
+
+    @instrumentation.untimed
+    def pool_stats(self):
+        return self.pool.stats()
+
+    @instrumentation.untimed
+    def metrics_snapshot(self):
+        return dict(self.metrics.snapshot(), pool=self.pool.stats(), lock_retries=self.lock_retry_stats())
+
+    def _count_lock_retry(self, method, outcome):
+        with self._lock_retries_lock:
+            self._lock_retries[(method, outcome)] += 1
+
+    @instrumentation.untimed
+    def lock_retry_stats(self):
+        # {"checkout": {"deadlock": 3, "recovered": 2, "gave_up": 0, ...}, ...}
+        with self._lock_retries_lock:
+            stats = {}
+            for (method, outcome), n in self._lock_retries.items():
+                stats.setdefault(method, {"recovered": 0, "gave_up": 0})[outcome] = n
+            return stats
+
+    @instrumentation.untimed
+    def close(self):
+        self.pool.close_all()
 
     def login(self, username, password):
         conn = self.get_connection()
@@ -36,6 +166,110 @@ class Database:
         finally:
             if conn.is_connected(): cursor.close(); conn.close()
 
+    def get_catalog_version(self):
+        conn = self.get_connection()
+        if not conn: return None
+        try:
+            cursor = conn.cursor(buffered=True)
+            cursor.execute("SELECT version FROM catalog_version WHERE id = 1")
+            row = cursor.fetchone()
+            return int(row[0]) if row else None
+        except backends.DB_ERRORS as err:
+            print(f"Catalog version probe failed: {err}")
+            return None
+        finally:
+            if conn.is_connected(): cursor.close(); conn.close()
+
+    def get_vouchers(self):
+        # Active, unexpired codes; pricing.PricingEngine keeps them in memory between checkouts.
+        conn = self.get_connection()
+        if not conn: return None
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT code, percent FROM vouchers WHERE active = %s AND (expires_on IS NULL OR expires_on >= %s)",
+                           (True, datetime.date.today()))
+            return cursor.fetchall()
+        except backends.DB_ERRORS as err:
+            print(f"Error loading vouchers: {err}")
+            return None
+        finally:
+            if conn.is_connected(): cursor.close(); conn.close()
+
+    def _bump_catalog_version(self, cursor):
+        cursor.execute("UPDATE catalog_version SET version = version + 1 WHERE id = 1")
+
+    def _log_changes(self, cursor, entity, ids):
+        # Records the rows a write touched for other tills' change feeds, inside the write's own
+        # transaction. ids None logs one "reload everything" entry.
+        ids = [None] if ids is None else sorted({int(i) for i in ids})
+        if ids:
+            cursor.execute(f"INSERT INTO change_log (entity, entity_id) VALUES {', '.join(['(%s, %s)'] * len(ids))}",
+                           [v for i in ids for v in (entity, i)])
+
+    def get_change_seq(self):
+        # Newest change_log sequence number; a change feed starts reading after it.
+        conn = self.get_connection()
+        if not conn: return None
+        try:
+            cursor = conn.cursor(buffered=True)
+            cursor.execute("SELECT MAX(seq) FROM change_log")
+            row = cursor.fetchone()
+            return int(row[0] or 0)
+        except backends.DB_ERRORS as err:
+            print(f"Change log probe failed: {err}")
+            return None
+        finally:
+            if conn.is_connected(): cursor.close(); conn.close()
+
+    def get_changes(self, after, limit=500):
+        # [(seq, entity, entity_id)] logged after sequence number `after`, oldest first
+        # (a primary key range read); None if the server is unreachable.
+        conn = self.get_connection()
+        if not conn: return None
+        try:
+            cursor = conn.cursor(buffered=True)
+            cursor.execute("SELECT seq, entity, entity_id FROM change_log WHERE seq > %s ORDER BY seq LIMIT %s",
+                           (int(after), int(limit)))
+            return [(int(seq), entity, None if eid is None else int(eid)) for seq, entity, eid in cursor.fetchall()]
+        except backends.DB_ERRORS as err:
+            print(f"Error reading change log: {err}")
+            return None
+        finally:
+            if conn.is_connected(): cursor.close(); conn.close()
+
+    def prune_change_log(self, older_than=datetime.timedelta(days=1), now=None):
+        # Change feeds that fall further behind than this reload in full (see ChangeFeed.resync_after).
+        conn = self.get_connection()
+        if not conn: return None
+        try:
+            cursor = conn.cursor()
+            cutoff = (now or datetime.datetime.now()).replace(microsecond=0) - older_than
+            cursor.execute("DELETE FROM change_log WHERE changed_at < %s", (cutoff,))
+            conn.commit()
+            return cursor.rowcount
+        except backends.DB_ERRORS as err:
+            print(f"Pruning change log failed: {err}")
+            return None
+        finally:
+            if conn.is_connected(): cursor.close(); conn.close()
+
+    def get_products_by_ids(self, ids):
+        # Same columns as get_all_products, for just the rows a change feed named; a missing id
+        # was deleted. None if the server is unreachable.
+        ids = sorted({int(i) for i in ids})
+        if not ids: return []
+        conn = self.get_connection()
+        if not conn: return None
+        try:
+            cursor = conn.cursor(dictionary=True, buffered=True)
+            cursor.execute(f"SELECT id, name, price, image_path, stock_level FROM products WHERE id IN ({_placeholders(len(ids))})", ids)
+            return cursor.fetchall()
+        except backends.DB_ERRORS as err:
+            print(f"Error loading changed products: {err}")
+            return None
+        finally:
+            if conn.is_connected(): cursor.close(); conn.close()
+
     def add_product(self, name, price, image_path, stock):
         conn = self.get_connection()
         if not conn: return False
@@ -43,8 +277,11 @@ class Database:
             cursor = conn.cursor()
             cursor.execute("INSERT INTO products (name, price, image_path, stock_level) VALUES (%s, %s, %s, %s)", 
                            (name, round(float(price), 2), image_path, int(stock)))
+            product_id = cursor.lastrowid
+            self._log_changes(cursor, "product", [product_id])
+            self._bump_catalog_version(cursor)
             conn.commit()
-            return True
+            return product_id
         finally:
             if conn.is_connected(): cursor.close(); conn.close()
 
@@ -55,6 +292,8 @@ class Database:
             cursor = conn.cursor()
             cursor.execute("UPDATE products SET name=%s, price=%s, image_path=%s, stock_level=%s WHERE id=%s",
                            (name, round(float(price), 2), image_path, int(stock), int(pid)))
+            self._log_changes(cursor, "product", [pid])
+            self._bump_catalog_version(cursor)
             conn.commit()
             return True
         finally:
@@ -66,6 +305,8 @@ class Database:
         try:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM products WHERE id = %s", (int(pid),))
+            self._log_changes(cursor, "product", [pid])
+            self._bump_catalog_version(cursor)
             conn.commit()
             return True
         finally:
@@ -81,6 +322,44 @@ class Database:
         finally:
             if conn.is_connected(): cursor.close(); conn.close()
 
+    def get_customers_by_ids(self, ids):
+        # Like get_all_customers, for the rows a change feed named; None if unreachable.
+        ids = sorted({int(i) for i in ids})
+        if not ids: return []
+        conn = self.get_connection()
+        if not conn: return None
+        try:
+            cursor = conn.cursor(dictionary=True, buffered=True)
+            cursor.execute(f"SELECT * FROM customers WHERE id IN ({_placeholders(len(ids))})", ids)
+            return cursor.fetchall()
+        except backends.DB_ERRORS as err:
+            print(f"Error loading changed customers: {err}")
+            return None
+        finally:
+            if conn.is_connected(): cursor.close(); conn.close()
+
+    def search_customers(self, term, limit=10):
+        # Typeahead lookup: picks the column from the shape of the term and does an
+        # index-friendly prefix match (idx_customers_name / _phone / _email).
+        conn = self.get_connection()
+        if not conn: return []
+        term = (term or "").strip()
+        if not term:
+            where, params = "", []
+        elif "@" in term:
+            where, params = "WHERE email LIKE %s ESCAPE '!'", [_like_prefix(term)]
+        elif set(term) <= set("0123456789+-() "):
+            where, params = "WHERE phone LIKE %s ESCAPE '!'", [_like_prefix(term)]
+        else:
+            where, params = "WHERE name LIKE %s ESCAPE '!'", [_like_prefix(term)]
+        try:
+            cursor = conn.cursor(dictionary=True, buffered=True)
+            cursor.execute(f"SELECT id, name, phone, email, customer_type, loyalty_points FROM customers "
+                           f"{where} ORDER BY name LIMIT %s", params + [int(limit)])
+            return cursor.fetchall()
+        finally:
+            if conn.is_connected(): cursor.close(); conn.close()
+
     def add_customer(self, name, phone, email, c_type="Standard"):
         conn = self.get_connection()
         if not conn: return False
@@ -88,8 +367,10 @@ class Database:
             cursor = conn.cursor()
             cursor.execute("INSERT INTO customers (name, phone, email, customer_type, loyalty_points) VALUES (%s, %s, %s, %s, 0)",
                            (name, phone, email, c_type))
+            customer_id = cursor.lastrowid
+            self._log_changes(cursor, "customer", [customer_id])
             conn.commit()
-            return True
+            return customer_id
         finally:
             if conn.is_connected(): cursor.close(); conn.close()
 
@@ -100,6 +381,7 @@ class Database:
             cursor = conn.cursor()
             cursor.execute("UPDATE customers SET name=%s, phone=%s, email=%s, customer_type=%s WHERE id=%s",
                            (name, phone, email, c_type, int(cid)))
+            self._log_changes(cursor, "customer", [cid])
             conn.commit()
             return True
         finally:
@@ -111,62 +393,507 @@ class Database:
         try:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM customers WHERE id = %s", (int(cid),))
+            self._log_changes(cursor, "customer", [cid])
             conn.commit()
             return True
         finally:
             if conn.is_connected(): cursor.close(); conn.close()
 
-    def process_transaction(self, customer_id, user_id, cart_items, total_cost):
+    def process_transaction(self, customer_id, user_id, cart_items, total_cost, prices=None):
+        # Returns the new order id (or the journal id of an offline sale); see checkout().
+        receipt = self.checkout(customer_id, user_id, cart_items, total_cost, prices)
+        return receipt['order_id'] if receipt else False
+
+    @retry_lock_conflicts
+    def checkout(self, customer_id, user_id, cart_items, total_cost, prices=None, names=None, payment_method="Cash",
+                 reservation=None):
+        # Books the sale and returns its full receipt record (see make_receipt), so the
+        # receipt page never has to query the order back. If the server is unreachable and a
+        # journal is configured, the sale is journaled at `prices`/`names` (what the till showed).
+        # Product rows are locked in id order, so overlapping carts on two tills queue
+        # instead of deadlocking; a deadlock that still happens is retried.
+        # `reservation` is the cart's reserve_stock() token: its holds are consumed here, and
+        # any quantity not held must still be unreserved stock, so a sale never oversells.
         conn = self.get_connection()
-        if not conn: return False
+        if not conn: return self._journal_sale(customer_id, user_id, cart_items, total_cost, prices, names, payment_method)
         try:
             cursor = conn.cursor()
             conn.start_transaction()
 
-            cursor.execute("INSERT INTO orders (customer_id, user_id, total_amount) VALUES (%s, %s, %s)",
-                           (customer_id, user_id, round(float(total_cost), 2)))
+            held = {}
+            if reservation:
+                cursor.execute("SELECT product_id, quantity FROM stock_reservations WHERE token = %s "
+                               f"ORDER BY product_id{self.dialect.for_update}", (reservation,))
+                held = {int(row[0]): int(row[1]) for row in cursor.fetchall()}
+
+            # One statement per step regardless of cart size: price lookup, order lines, stock.
+            quantities = {int(p_id): int(qty) for p_id, qty in cart_items.items()}
+            ids = sorted(quantities)
+            use = {pid: min(held.get(pid, 0), quantities[pid]) for pid in ids}
+            products = {}
+            if ids:
+                cursor.execute(f"SELECT id, price, name, stock_level - reserved FROM products "
+                               f"WHERE id IN ({_placeholders(len(ids))}) ORDER BY id{self.dialect.for_update}", ids)
+                products = {int(row[0]): (float(row[1]), row[2], int(row[3])) for row in cursor.fetchall()}
+                missing = [pid for pid in ids if pid not in products]
+                if missing:
+                    raise ValueError(f"Unknown product id(s): {missing}")
+
+            # Receipt lines stay in the order they were rung up
+            lines = [{'product_id': pid, 'name': products[pid][1], 'quantity': quantities[pid],
+                      'price_at_time': products[pid][0]} for pid in quantities]
+            subtotal = round(sum(line['price_at_time'] * line['quantity'] for line in lines), 2)
+            total = round(float(total_cost), 2)
+            order_date = datetime.datetime.now().replace(microsecond=0)
+            cursor.execute("INSERT INTO orders (customer_id, user_id, total_amount, subtotal, discount_amount, "
+                           "payment_method, order_date) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                           (customer_id, user_id, total, subtotal, round(max(subtotal - total, 0), 2),
+                            payment_method, order_date))
             order_id = cursor.lastrowid
 
-            for p_id, qty in cart_items.items():
-                p_id_int = int(p_id)
-                cursor.execute("SELECT price FROM products WHERE id = %s", (p_id_int,))
-                price_res = cursor.fetchone()
-                current_price = float(price_res[0] if isinstance(price_res, tuple) else price_res['price'])
+            if ids:
+                line_values = ", ".join(["(%s, %s, %s, %s, %s)"] * len(ids))
+                cursor.execute("INSERT INTO order_items (order_id, product_id, product_name, quantity, price_at_time) "
+                               f"VALUES {line_values}",
+                               [v for line in lines for v in (order_id, line['product_id'], line['name'],
+                                                              line['quantity'], line['price_at_time'])])
 
-                cursor.execute("INSERT INTO order_items (order_id, product_id, quantity, price_at_time) VALUES (%s, %s, %s, %s)",
-                               (order_id, p_id_int, qty, current_price))
-                cursor.execute("UPDATE products SET stock_level = stock_level - %s WHERE id = %s", (qty, p_id_int))
+                # Conditional decrement: each line's own holds plus unreserved stock must cover it.
+                cases = " ".join(["WHEN %s THEN %s"] * len(ids))
+                cursor.execute(f"UPDATE products SET stock_level = stock_level - CASE id {cases} END, "
+                               f"reserved = reserved - CASE id {cases} END "
+                               f"WHERE id IN ({_placeholders(len(ids))}) AND stock_level - reserved >= CASE id {cases} END",
+                               [v for pid in ids for v in (pid, quantities[pid])]
+                               + [v for pid in ids for v in (pid, use[pid])] + ids
+                               + [v for pid in ids for v in (pid, quantities[pid] - use[pid])])
+                if cursor.rowcount != len(ids):
+                    short = [pid for pid in ids if products[pid][2] + use[pid] < quantities[pid]]
+                    raise ValueError(f"Insufficient stock for product id(s): {short or ids}")
+            if held:
+                # Whatever was held but not bought (lines dropped or cut down) goes back to the shelf
+                self._release_holds(cursor, {pid: qty - use.get(pid, 0) for pid, qty in held.items()})
+                cursor.execute("DELETE FROM stock_reservations WHERE token = %s", (reservation,))
 
             if customer_id:
                 points = int(total_cost / 10)
                 if points > 0:
                     cursor.execute("UPDATE customers SET loyalty_points = loyalty_points + %s WHERE id = %s", (points, customer_id))
+                    self._log_changes(cursor, "customer", [customer_id])
 
+            receipt = make_receipt(order_id, order_date, customer_id, user_id, lines, total, payment_method, subtotal)
+            # Stock-only change: other tills patch these rows from the change feed, so the
+            # catalog version (a full reload everywhere) is left alone.
+            self._log_changes(cursor, "product", ids)
             conn.commit()
-            return order_id
+            self._roll_up(conn, cursor, [receipt])
+            return receipt
         except Exception as e:
+            conn.rollback()
+            kind = backends.lock_conflict(e)
+            if kind:
+                raise LockConflict(kind, e) from e
             print(f"Transaction Failed: {e}")
+            return False
+        finally:
+            if conn.is_connected(): cursor.close(); conn.close()
+
+    @retry_lock_conflicts
+    def reserve_stock(self, token, product_id, quantity, ttl=RESERVATION_TTL):
+        # Sets the hold of cart `token` on a product to `quantity` (0 drops it). A hold only
+        # grows if that much stock is unreserved right now -- one conditional UPDATE, with no
+        # lock kept once this returns. Any call renews every hold of the cart for `ttl`.
+        # Returns {'ok', 'held', 'available'}, or None if the server could not be asked.
+        conn = self.get_connection()
+        if not conn: return None
+        try:
+            cursor = conn.cursor()
+            conn.start_transaction()
+            pid, quantity = int(product_id), max(int(quantity), 0)
+            expires = (datetime.datetime.now() + ttl).replace(microsecond=0)
+            cursor.execute("SELECT quantity FROM stock_reservations WHERE token = %s AND product_id = %s"
+                           f"{self.dialect.for_update}", (token, pid))
+            row = cursor.fetchone()
+            held = int(row[0]) if row else 0
+            ok = True
+            if quantity > held:
+                cursor.execute("UPDATE products SET reserved = reserved + %s WHERE id = %s AND stock_level - reserved >= %s",
+                               (quantity - held, pid, quantity - held))
+                ok = cursor.rowcount == 1
+            elif quantity < held:
+                self._release_holds(cursor, {pid: held - quantity})
+            if ok:
+                held = quantity
+                if quantity:
+                    cursor.execute("INSERT INTO stock_reservations (token, product_id, quantity, expires_at) "
+                                   "VALUES (%s, %s, %s, %s) " + self.dialect.upsert("token, product_id", ("quantity", "expires_at")),
+                                   (token, pid, quantity, expires))
+                elif row:
+                    cursor.execute("DELETE FROM stock_reservations WHERE token = %s AND product_id = %s", (token, pid))
+            cursor.execute("UPDATE stock_reservations SET expires_at = %s WHERE token = %s", (expires, token))
+            cursor.execute("SELECT stock_level - reserved FROM products WHERE id = %s", (pid,))
+            row = cursor.fetchone()
+            conn.commit()
+            return {'ok': ok, 'held': held, 'available': int(row[0]) if row else 0}
+        except Exception as e:
+            conn.rollback()
+            kind = backends.lock_conflict(e)
+            if kind:
+                raise LockConflict(kind, e) from e
+            print(f"Reservation failed: {e}")
+            return None
+        finally:
+            if conn.is_connected(): cursor.close(); conn.close()
+
+    def _release_holds(self, cursor, quantities):
+        # quantities: {product_id: units to hand back}
+        ids = sorted(pid for pid, qty in quantities.items() if qty)
+        if ids:
+            cases = " ".join(["WHEN %s THEN %s"] * len(ids))
+            cursor.execute(f"UPDATE products SET reserved = reserved - CASE id {cases} END "
+                           f"WHERE id IN ({_placeholders(len(ids))})",
+                           [v for pid in ids for v in (pid, quantities[pid])] + ids)
+
+    def _release_reservations(self, where, params):
+        conn = self.get_connection()
+        if not conn: return None
+        try:
+            cursor = conn.cursor()
+            conn.start_transaction()
+            cursor.execute(f"SELECT product_id, quantity FROM stock_reservations WHERE {where} "
+                           f"ORDER BY product_id{self.dialect.for_update}", params)
+            released = {}
+            for pid, qty in cursor.fetchall():
+                released[int(pid)] = released.get(int(pid), 0) + int(qty)
+            if released:
+                self._release_holds(cursor, released)
+                cursor.execute(f"DELETE FROM stock_reservations WHERE {where}", params)
+            conn.commit()
+            return released
+        except Exception as e:
+            conn.rollback()
+            kind = backends.lock_conflict(e)
+            if kind:
+                raise LockConflict(kind, e) from e
+            print(f"Releasing reservations failed: {e}")
+            return None
+        finally:
+            if conn.is_connected(): cursor.close(); conn.close()
+
+    @retry_lock_conflicts
+    def release_reservations(self, token):
+        # Drops every hold of one cart (emptied, abandoned or logged out). Returns {pid: units}.
+        return self._release_reservations("token = %s", (token,))
+
+    @retry_lock_conflicts
+    def release_expired_reservations(self, now=None):
+        # Sweeps holds whose cart went quiet for longer than their TTL (crashed or idle tills).
+        now = (now or datetime.datetime.now()).replace(microsecond=0)
+        return self._release_reservations("expires_at < %s", (now,))
+
+    def _journal_sale(self, customer_id, user_id, cart_items, total_cost, prices, names, payment_method):
+        if self.journal is None or not prices or any(pid not in prices for pid in cart_items):
+            return False
+        try:
+            entry = self.journal.append(customer_id, user_id, cart_items, prices, total_cost, names, payment_method)
+        except OSError as e:
+            print(f"Could not journal offline sale: {e}")
+            return False
+        return journal_receipt(entry)
+
+    def _add_to_rollups(self, cursor, sales):
+        # sales: receipt records of committed sales (see _roll_up). Folded into one upsert per
+        # rollup table, so a batch costs three statements however many sales it holds. Rows go
+        # in key order so concurrent sales take the rollup row locks in the same order.
+        daily, by_product, by_staff = {}, {}, {}
+        for sale in sales:
+            day = sale['date'].date() if isinstance(sale['date'], datetime.datetime) else sale['date']
+            totals = daily.setdefault(day, [0, 0, 0.0, 0.0])
+            totals[0] += 1
+            totals[2] += float(sale['total'])
+            totals[3] += float(sale['discount'])
+            staff = by_staff.setdefault((day, sale['user_id'] or 0), [0, 0.0])
+            staff[0] += 1
+            staff[1] += float(sale['total'])
+            for line in sale['lines']:
+                qty = int(line['quantity'])
+                totals[1] += qty
+                product = by_product.setdefault((day, line['product_id'] or 0), [0, 0.0])
+                product[0] += qty
+                product[1] += float(line['price_at_time']) * qty
+        if not daily:
+            return
+        cursor.execute(f"INSERT INTO sales_daily (day, orders, units, revenue, discounts) "
+                       f"VALUES {', '.join(['(%s, %s, %s, %s, %s)'] * len(daily))} "
+                       + self.dialect.upsert("day", ("orders", "units", "revenue", "discounts"), increment=True),
+                       [v for day, (n, units, revenue, disc) in sorted(daily.items())
+                        for v in (day, n, units, round(revenue, 2), round(disc, 2))])
+        if by_product:
+            cursor.execute(f"INSERT INTO sales_daily_product (day, product_id, units, revenue) "
+                           f"VALUES {', '.join(['(%s, %s, %s, %s)'] * len(by_product))} "
+                           + self.dialect.upsert("day, product_id", ("units", "revenue"), increment=True),
+                           [v for (day, pid), (units, revenue) in sorted(by_product.items())
+                            for v in (day, pid, units, round(revenue, 2))])
+        cursor.execute(f"INSERT INTO sales_daily_staff (day, user_id, orders, revenue) "
+                       f"VALUES {', '.join(['(%s, %s, %s, %s)'] * len(by_staff))} "
+                       + self.dialect.upsert("day, user_id", ("orders", "revenue"), increment=True),
+                       [v for (day, uid), (n, revenue) in sorted(by_staff.items()) for v in (day, uid, n, round(revenue, 2))])
+
+    def _roll_up(self, conn, cursor, sales):
+        # Folds committed sales into the rollups in a second, short transaction: today's
+        # sales_daily row is written by every till, so it is not held locked for the length
+        # of a checkout. If this fails the sales stand; the dashboard misses them until
+        # rebuild_rollups() runs.
+        try:
+            conn.start_transaction()
+            self._add_to_rollups(cursor, sales)
+            conn.commit()
+            return True
+        except Exception as e:
+            conn.rollback()
+            print(f"Rollup update failed: {e}")
+            return False
+
+    def rebuild_rollups(self, since=None):
+        # Backfill: recomputes the rollups from orders/order_items (from `since`, a date, or
+        # for all history). Scans the order tables once, so run it outside trading hours.
+        conn = self.get_connection()
+        if not conn: return False
+        start = datetime.datetime.combine(since, datetime.time()) if since else None
+        order_filter, day_filter = ("WHERE o.order_date >= %s", "WHERE day >= %s") if since else ("", "")
+        params = [start] if since else []
+        try:
+            cursor = conn.cursor()
+            conn.start_transaction()
+            for table in ("sales_daily", "sales_daily_product", "sales_daily_staff"):
+                cursor.execute(f"DELETE FROM {table} {day_filter}", [since] if since else [])
+            cursor.execute(f"""
+                INSERT INTO sales_daily_product (day, product_id, units, revenue)
+                SELECT DATE(o.order_date), COALESCE(oi.product_id, 0), SUM(oi.quantity), SUM(oi.quantity * oi.price_at_time)
+                FROM order_items oi JOIN orders o ON o.id = oi.order_id
+                {order_filter}
+                GROUP BY DATE(o.order_date), COALESCE(oi.product_id, 0)
+            """, params)
+            cursor.execute(f"""
+                INSERT INTO sales_daily_staff (day, user_id, orders, revenue)
+                SELECT DATE(o.order_date), COALESCE(o.user_id, 0), COUNT(*), COALESCE(SUM(o.total_amount), 0)
+                FROM orders o
+                {order_filter}
+                GROUP BY DATE(o.order_date), COALESCE(o.user_id, 0)
+            """, params)
+            cursor.execute(f"""
+                INSERT INTO sales_daily (day, orders, units, revenue, discounts)
+                SELECT DATE(o.order_date), COUNT(*), 0, COALESCE(SUM(o.total_amount), 0), COALESCE(SUM(o.discount_amount), 0)
+                FROM orders o
+                {order_filter}
+                GROUP BY DATE(o.order_date)
+            """, params)
+            cursor.execute(f"UPDATE sales_daily SET units = COALESCE((SELECT SUM(p.units) FROM sales_daily_product p "
+                           f"WHERE p.day = sales_daily.day), 0) {day_filter}", [since] if since else [])
+            cursor.execute("SELECT COUNT(*) FROM sales_daily")
+            days = cursor.fetchone()[0]
+            conn.commit()
+            return days
+        except Exception as e:
+            print(f"Rollup backfill failed: {e}")
             conn.rollback()
             return False
         finally:
             if conn.is_connected(): cursor.close(); conn.close()
 
+    def get_daily_summary(self, day=None, top=5):
+        # Dashboard / end-of-day figures for one day, read from the rollups only.
+        day = day or datetime.date.today()
+        conn = self.get_connection()
+        if not conn: return None
+        try:
+            cursor = conn.cursor(dictionary=True, buffered=True)
+            cursor.execute("SELECT orders, units, revenue, discounts FROM sales_daily WHERE day = %s", (day,))
+            summary = cursor.fetchone() or {'orders': 0, 'units': 0, 'revenue': 0, 'discounts': 0}
+            summary['day'] = day
+            cursor.execute("SELECT r.product_id, COALESCE(p.name, 'Deleted product') AS name, r.units, r.revenue "
+                           "FROM sales_daily_product r LEFT JOIN products p ON p.id = r.product_id "
+                           "WHERE r.day = %s ORDER BY r.revenue DESC LIMIT %s", (day, int(top)))
+            summary['top_products'] = cursor.fetchall()
+            cursor.execute("SELECT r.user_id, COALESCE(u.username, 'Unknown') AS staff, r.orders, r.revenue "
+                           "FROM sales_daily_staff r LEFT JOIN users u ON u.id = r.user_id "
+                           "WHERE r.day = %s ORDER BY r.revenue DESC", (day,))
+            summary['staff'] = cursor.fetchall()
+            return summary
+        finally:
+            if conn.is_connected(): cursor.close(); conn.close()
+
+    def get_sales_trend(self, days=30):
+        # One row per trading day over the last `days` days, oldest first.
+        conn = self.get_connection()
+        if not conn: return []
+        try:
+            cursor = conn.cursor(dictionary=True, buffered=True)
+            cursor.execute("SELECT day, orders, units, revenue, discounts FROM sales_daily WHERE day > %s ORDER BY day",
+                           (datetime.date.today() - datetime.timedelta(days=int(days)),))
+            return cursor.fetchall()
+        finally:
+            if conn.is_connected(): cursor.close(); conn.close()
+
+    def get_receipt(self, order_id):
+        # Reprint: the order header and its snapshot lines over one connection, no products join.
+        conn = self.get_connection()
+        if not conn: return None
+        try:
+            cursor = conn.cursor(dictionary=True, buffered=True)
+            cursor.execute("SELECT id, order_date, customer_id, user_id, total_amount, subtotal, payment_method "
+                           "FROM orders WHERE id = %s", (int(order_id),))
+            order = cursor.fetchone()
+            if not order:
+                return None
+            cursor.execute("SELECT product_id, COALESCE(product_name, 'Deleted product') AS name, quantity, price_at_time "
+                           "FROM order_items WHERE order_id = %s ORDER BY id", (int(order_id),))
+            lines = cursor.fetchall()
+            return make_receipt(order['id'], order['order_date'], order['customer_id'], order['user_id'], lines,
+                                order['total_amount'], order['payment_method'], order['subtotal'])
+        finally:
+            if conn.is_connected(): cursor.close(); conn.close()
+
+    @retry_lock_conflicts(gave_up=None)
+    def replay_sales(self, entries):
+        # Books journaled sales (oldest first) in one transaction. Deterministic conflict rules:
+        #   * a sale already on the server (same journal_id) is skipped, never booked twice;
+        #   * lines keep the price charged at the till, not today's price;
+        #   * stock is consumed in journal order and never below what other carts hold
+        #     (products.reserved), so stock_level - reserved stays >= 0; the part of a
+        #     line that was not free is recorded in stock_conflicts;
+        #   * a product, customer or user deleted meanwhile is booked as NULL.
+        # Returns {"applied": {journal_id: order_id}, "duplicates": [...], "shortfalls": [...]},
+        # None if the server is still unreachable or kept losing lock races (try again later),
+        # or False if the batch itself was rejected and rolled back.
+        conn = self.get_connection()
+        if not conn: return None
+        try:
+            cursor = conn.cursor()
+            conn.start_transaction()
+            jids = [e['journal_id'] for e in entries]
+            cursor.execute(f"SELECT journal_id FROM orders WHERE journal_id IN ({_placeholders(len(jids))})", jids)
+            done = {row[0] for row in cursor.fetchall()}
+            todo = [e for e in entries if e['journal_id'] not in done]
+            result = {"applied": {}, "duplicates": [j for j in jids if j in done], "shortfalls": []}
+            if not todo:
+                conn.commit()
+                return result
+
+            def existing(table, ids, column="id", lock=""):
+                ids = sorted({int(i) for i in ids if i})
+                if not ids:
+                    return {}
+                cursor.execute(f"SELECT id, {column} FROM {table} "
+                               f"WHERE id IN ({_placeholders(len(ids))}) ORDER BY id{lock}", ids)
+                return {int(r[0]): r[1:] for r in cursor.fetchall()}
+
+            # Only the stock rows are written from what is read here, so only they are locked.
+            products = existing("products", (pid for e in todo for pid in e['items']),
+                                "stock_level - reserved, name, stock_level", self.dialect.for_update)
+            stock = {pid: max(row[0], 0) for pid, row in products.items()}
+            customers = existing("customers", (e['customer_id'] for e in todo))
+            users = existing("users", (e['user_id'] for e in todo))
+
+            values = ", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s)"] * len(todo))
+            receipts = {e['journal_id']: journal_receipt(e) for e in todo}
+            cursor.execute("INSERT INTO orders (customer_id, user_id, total_amount, subtotal, discount_amount, payment_method, "
+                           f"order_date, journal_id) VALUES {values}",
+                           [v for e in todo for v in (e['customer_id'] if e['customer_id'] in customers else None,
+                                                      e['user_id'] if e['user_id'] in users else None,
+                                                      e['total'], receipts[e['journal_id']]['subtotal'],
+                                                      receipts[e['journal_id']]['discount'],
+                                                      receipts[e['journal_id']]['payment_method'],
+                                                      e['ts'], e['journal_id'])])
+            todo_ids = [e['journal_id'] for e in todo]
+            cursor.execute(f"SELECT journal_id, id FROM orders WHERE journal_id IN ({_placeholders(len(todo_ids))})", todo_ids)
+            order_ids = dict(cursor.fetchall())
+
+            lines, conflicts, points, booked = [], [], {}, []
+            remaining = dict(stock)
+            for e in todo:
+                oid = order_ids[e['journal_id']]
+                result["applied"][e['journal_id']] = oid
+                for key, qty in sorted(e['items'].items(), key=lambda kv: int(kv[0])):
+                    pid = int(key)
+                    name = (e.get('names') or {}).get(key) or (products[pid][1] if pid in products else None)
+                    if pid in remaining:
+                        short = max(qty - max(remaining[pid], 0), 0)
+                        remaining[pid] = max(remaining[pid] - qty, 0)
+                        lines.append((oid, pid, name, qty, e['prices'][key]))
+                    else:
+                        short = qty
+                        lines.append((oid, None, name, qty, e['prices'][key]))
+                    if short:
+                        conflicts.append((oid, pid, qty, short))
+                        result["shortfalls"].append((e['journal_id'], pid, short))
+                booked.append(dict(receipts[e['journal_id']], user_id=e['user_id'] if e['user_id'] in users else None,
+                                   lines=[{'product_id': l[1], 'quantity': l[3], 'price_at_time': l[4]}
+                                          for l in lines if l[0] == oid]))
+                if e['customer_id'] in customers and int(e['total'] / 10) > 0:
+                    points[e['customer_id']] = points.get(e['customer_id'], 0) + int(e['total'] / 10)
+
+            if lines:
+                values = ", ".join(["(%s, %s, %s, %s, %s)"] * len(lines))
+                cursor.execute(f"INSERT INTO order_items (order_id, product_id, product_name, quantity, price_at_time) VALUES {values}",
+                               [v for line in lines for v in line])
+            changed = [pid for pid in remaining if remaining[pid] != stock[pid]]
+            if changed:
+                cases = " ".join(["WHEN %s THEN %s"] * len(changed))
+                cursor.execute(f"UPDATE products SET stock_level = CASE id {cases} END WHERE id IN ({_placeholders(len(changed))})",
+                               [v for pid in changed for v in (pid, products[pid][2] - (stock[pid] - remaining[pid]))] + changed)
+                self._log_changes(cursor, "product", changed)
+            if points:
+                cases = " ".join(["WHEN %s THEN %s"] * len(points))
+                cursor.execute(f"UPDATE customers SET loyalty_points = loyalty_points + CASE id {cases} END "
+                               f"WHERE id IN ({_placeholders(len(points))})",
+                               [v for cid in points for v in (cid, points[cid])] + list(points))
+                self._log_changes(cursor, "customer", points)
+            if conflicts:
+                values = ", ".join(["(%s, %s, %s, %s)"] * len(conflicts))
+                cursor.execute(f"INSERT INTO stock_conflicts (order_id, product_id, quantity, shortfall) VALUES {values}",
+                               [v for c in conflicts for v in c])
+
+            conn.commit()
+            self._roll_up(conn, cursor, booked)
+            return result
+        except Exception as e:
+            conn.rollback()
+            kind = backends.lock_conflict(e)
+            if kind:
+                raise LockConflict(kind, e) from e
+            print(f"Journal replay failed: {e}")
+            return False
+        finally:
+            if conn.is_connected(): cursor.close(); conn.close()
+
     def get_order_items(self, order_id):
         conn = self.get_connection()
         if not conn: return []
         try:
             cursor = conn.cursor(dictionary=True)
+            # Names are snapshotted at sale time, so deleted products still show up
             query = """
-                SELECT p.name, oi.quantity, oi.price_at_time 
+                SELECT COALESCE(oi.product_name, 'Deleted product') AS name, oi.quantity, oi.price_at_time
                 FROM order_items oi
-                JOIN products p ON oi.product_id = p.id
                 WHERE oi.order_id = %s
+                ORDER BY oi.id
             """
             cursor.execute(query, (order_id,))
             return cursor.fetchall()
         finally:
             if conn.is_connected(): cursor.close(); conn.close()
 
+    def get_order_total(self, order_id):
+        conn = self.get_connection()
+        if not conn: return None
+        try:
+            cursor = conn.cursor(buffered=True)
+            cursor.execute("SELECT total_amount FROM orders WHERE id = %s", (order_id,))
+            row = cursor.fetchone()
+            return float(row[0]) if row else None
+        finally:
+            if conn.is_connected(): cursor.close(); conn.close()
+
     def get_all_orders(self):
         conn = self.get_connection()
         if not conn: return []
@@ -182,4 +909,156 @@ class Database:
             cursor.execute(query)
             return cursor.fetchall()
         finally:
-            if conn.is_connected(): cursor.close(); conn.close()
\ No newline at end of file
+            if conn.is_connected(): cursor.close(); conn.close()
+
+    def get_orders_page(self, limit=100, after=None, date_from=None, date_to=None, customer_id=None,
+                        customer_name=None, user_id=None, staff_name=None, min_amount=None, max_amount=None):
+        # Keyset pagination on (order_date, id): pass the returned cursor as `after` to get the
+        # next (older) page. date_to is exclusive. Returns (rows, next_cursor); next_cursor is None
+        # on the last page.
+        conn = self.get_connection()
+        if not conn: return [], None
+        where, params = [], []
+        if after:
+            last_date, last_id = after
+            where.append("(o.order_date < %s OR (o.order_date = %s AND o.id < %s))")
+            params += [last_date, last_date, int(last_id)]
+        if date_from:
+            where.append("o.order_date >= %s"); params.append(date_from)
+        if date_to:
+            where.append("o.order_date < %s"); params.append(date_to)
+        if customer_id:
+            where.append("o.customer_id = %s"); params.append(int(customer_id))
+        if customer_name:
+            where.append("c.name LIKE %s ESCAPE '!'"); params.append(_like_prefix(customer_name))
+        if user_id:
+            where.append("o.user_id = %s"); params.append(int(user_id))
+        if staff_name:
+            where.append("u.username LIKE %s ESCAPE '!'"); params.append(_like_prefix(staff_name))
+        if min_amount is not None:
+            where.append("o.total_amount >= %s"); params.append(min_amount)
+        if max_amount is not None:
+            where.append("o.total_amount <= %s"); params.append(max_amount)
+        try:
+            cursor = conn.cursor(dictionary=True)
+            query = f"""
+                SELECT o.id, c.name as customer, u.username as staff, o.total_amount, o.order_date 
+                FROM orders o
+                LEFT JOIN customers c ON o.customer_id = c.id
+                LEFT JOIN users u ON o.user_id = u.id
+                {"WHERE " + " AND ".join(where) if where else ""}
+                ORDER BY o.order_date DESC, o.id DESC
+                LIMIT %s
+            """
+            cursor.execute(query, params + [int(limit) + 1])
+            rows = cursor.fetchall()
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = (rows[-1]['order_date'], rows[-1]['id'])
+            return rows, next_cursor
+        finally:
+            if conn.is_connected(): cursor.close(); conn.close()
+
+    # Bulk import/export (see catalog_io.py). Each upsert call is one chunk in one transaction.
+    def upsert_products(self, rows):
+        # rows: dicts with name, price, image_path, stock_level and an optional id. Rows without
+        # an id update the existing product with the same name (idx_products_name), else insert.
+        # Returns the number of rows written, or False if the chunk was rolled back.
+        conn = self.get_connection()
+        if not conn: return False
+        try:
+            cursor = conn.cursor()
+            conn.start_transaction()
+            rows = [dict(r) for r in rows]
+            names = list({r['name'] for r in rows if not r.get('id')})
+            if names:
+                cursor.execute(f"SELECT name, MIN(id) FROM products WHERE name IN ({_placeholders(len(names))}) GROUP BY name", names)
+                # Both backends compare names case-insensitively, so match the same way here
+                existing = {name.lower(): pid for name, pid in cursor.fetchall()}
+                for r in rows:
+                    if not r.get('id') and r['name'].lower() in existing:
+                        r['id'] = existing[r['name'].lower()]
+
+            keyed = [r for r in rows if r.get('id')]
+            fresh = [r for r in rows if not r.get('id')]
+            if keyed:
+                values = ", ".join(["(%s, %s, %s, %s, %s)"] * len(keyed))
+                cursor.execute(f"INSERT INTO products (id, name, price, image_path, stock_level) VALUES {values} "
+                               + self.dialect.upsert("id", ("name", "price", "image_path", "stock_level")),
+                               [v for r in keyed for v in (int(r['id']), r['name'], r['price'], r['image_path'], r['stock_level'])])
+            if fresh:
+                values = ", ".join(["(%s, %s, %s, %s)"] * len(fresh))
+                cursor.execute(f"INSERT INTO products (name, price, image_path, stock_level) VALUES {values}",
+                               [v for r in fresh for v in (r['name'], r['price'], r['image_path'], r['stock_level'])])
+
+            # A whole chunk is cheaper to reload than to list
+            self._log_changes(cursor, "product", None)
+            self._bump_catalog_version(cursor)
+            conn.commit()
+            return len(rows)
+        except Exception as e:
+            print(f"Product upsert failed: {e}")
+            conn.rollback()
+            return False
+        finally:
+            if conn.is_connected(): cursor.close(); conn.close()
+
+    def upsert_customers(self, rows):
+        # rows: dicts with name, phone, email, customer_type, loyalty_points and an optional id.
+        # Rows without an id update the customer with the same email (idx_customers_email), else insert.
+        conn = self.get_connection()
+        if not conn: return False
+        try:
+            cursor = conn.cursor()
+            conn.start_transaction()
+            rows = [dict(r) for r in rows]
+            emails = list({r['email'] for r in rows if not r.get('id') and r.get('email')})
+            if emails:
+                cursor.execute(f"SELECT email, MIN(id) FROM customers WHERE email IN ({_placeholders(len(emails))}) GROUP BY email", emails)
+                existing = {email.lower(): cid for email, cid in cursor.fetchall()}
+                for r in rows:
+                    if not r.get('id') and (r.get('email') or '').lower() in existing:
+                        r['id'] = existing[r['email'].lower()]
+
+            keyed = [r for r in rows if r.get('id')]
+            fresh = [r for r in rows if not r.get('id')]
+            if keyed:
+                values = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(keyed))
+                cursor.execute(f"INSERT INTO customers (id, name, phone, email, customer_type, loyalty_points) VALUES {values} "
+                               + self.dialect.upsert("id", ("name", "phone", "email", "customer_type", "loyalty_points")),
+                               [v for r in keyed for v in (int(r['id']), r['name'], r['phone'], r['email'],
+                                                           r['customer_type'], r['loyalty_points'])])
+            if fresh:
+                values = ", ".join(["(%s, %s, %s, %s, %s)"] * len(fresh))
+                cursor.execute(f"INSERT INTO customers (name, phone, email, customer_type, loyalty_points) VALUES {values}",
+                               [v for r in fresh for v in (r['name'], r['phone'], r['email'], r['customer_type'], r['loyalty_points'])])
+
+            self._log_changes(cursor, "customer", None)
+            conn.commit()
+            return len(rows)
+        except Exception as e:
+            print(f"Customer upsert failed: {e}")
+            conn.rollback()
+            return False
+        finally:
+            if conn.is_connected(): cursor.close(); conn.close()
+
+    def iter_table(self, table, columns, batch_size=1000):
+        # Streams a whole table in id order, one keyset page per pooled connection borrow,
+        # so exports never hold a cursor (or all rows) open.
+        last_id = 0
+        while True:
+            conn = self.get_connection()
+            if not conn: return
+            try:
+                cursor = conn.cursor(dictionary=True, buffered=True)
+                cursor.execute(f"SELECT {', '.join(columns)} FROM {table} WHERE id > %s ORDER BY id LIMIT %s",
+                               (last_id, int(batch_size)))
+                rows = cursor.fetchall()
+            finally:
+                if conn.is_connected(): cursor.close(); conn.close()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1]['id']
@@ -1,5 +1,8 @@
 import mysql.connector
 from mysql.connector import errorcode
+import sys
+import backends
+import migrations
 
 DB_CONFIG = {
     'user': 'root',
@@ -8,16 +11,16 @@ DB_CONFIG = {
 }
 DB_NAME = 'soft605_pos'
 
-def create_database():
+def create_database(name=DB_NAME):
     try:
         conn = mysql.connector.connect(**DB_CONFIG)
         cursor = conn.cursor()
         try:
-            cursor.execute(f"CREATE DATABASE {DB_NAME} DEFAULT CHARACTER SET 'utf8'")
-            print(f"Database '{DB_NAME}' checked/created.")
+            cursor.execute(f"CREATE DATABASE {name} DEFAULT CHARACTER SET 'utf8'")
+            print(f"Database '{name}' checked/created.")
         except mysql.connector.Error as err:
             if err.errno == errorcode.ER_DB_CREATE_EXISTS:
-                print(f"Database '{DB_NAME}' already exists.")
+                print(f"Database '{name}' already exists.")
             else:
                 print(f"Failed creating database: {err}")
                 exit(1)
@@ -26,112 +29,102 @@ def create_database():
         print(f"Connection failed: {err}")
         exit(1)
 
-def create_tables():
+def connect_db(name=DB_NAME):
     config = DB_CONFIG.copy()
-    config['database'] = DB_NAME
-    
+    config['database'] = name
+    return mysql.connector.connect(**config)
+
+def create_tables(connect=connect_db):
+    # Upgrades the schema in place via versioned migrations; seeds only an empty database.
+    # connect may be any backend's connect (e.g. Database.get_connection for SQLite).
     try:
-        conn = mysql.connector.connect(**config)
+        conn = connect()
+        migrations.migrate(conn)
         cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM users")
+        if cursor.fetchone()[0] == 0:
+            seed_data(cursor)
+            conn.commit()
+            print("Database initialized with Loyalty, Staff ID, and Assets.")
+        cursor.close()
+        conn.close()
 
-        # Clean Slate
-        cursor.execute("DROP TABLE IF EXISTS order_items")
-        cursor.execute("DROP TABLE IF EXISTS orders")
-        cursor.execute("DROP TABLE IF EXISTS users")
-        cursor.execute("DROP TABLE IF EXISTS products")
-        cursor.execute("DROP TABLE IF EXISTS customers")
-
-        # Create Tables
-        cursor.execute("""
-            CREATE TABLE users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                username VARCHAR(50) UNIQUE NOT NULL,
-                password VARCHAR(50) NOT NULL,
-                role ENUM('admin', 'staff') NOT NULL
-            )
-        """)
-
-        cursor.execute("""
-            CREATE TABLE products (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                name VARCHAR(100) NOT NULL,
-                price DECIMAL(10, 2) NOT NULL,
-                image_path VARCHAR(255),
-                stock_level INT NOT NULL
-            )
-        """)
-
-        cursor.execute("""
-            CREATE TABLE customers (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                name VARCHAR(100) NOT NULL,
-                phone VARCHAR(20),
-                email VARCHAR(100),
-                customer_type VARCHAR(50) DEFAULT 'Standard',
-                loyalty_points INT DEFAULT 0
-            )
-        """)
-
-        cursor.execute("""
-            CREATE TABLE orders (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                customer_id INT,
-                user_id INT, 
-                total_amount DECIMAL(10, 2),
-                order_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (customer_id) REFERENCES customers(id) ON DELETE SET NULL,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL
-            )
-        """)
+    except backends.DB_ERRORS as err:
+        print(f"Error creating tables: {err}")
 
-        cursor.execute("""
-            CREATE TABLE order_items (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                order_id INT,
-                product_id INT,
-                quantity INT,
-                price_at_time DECIMAL(10, 2),
-                FOREIGN KEY (order_id) REFERENCES orders(id) ON DELETE CASCADE,
-                FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE SET NULL
-            )
-        """)
+def reset_tables(connect=connect_db):
+    # Old clean-slate behaviour, for development only: drops everything and rebuilds.
+    try:
+        conn = connect()
+        cursor = conn.cursor()
+        dialect = backends.dialect_of(conn)
+        cursor.execute(dialect.foreign_keys(False))
+        for table in dialect.table_names(cursor):
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(dialect.foreign_keys(True))
+        cursor.close()
+        conn.close()
+    except backends.DB_ERRORS as err:
+        print(f"Error resetting tables: {err}")
+        return
+    create_tables(connect)
 
-        # Seed Data
-        users_data = [
-            ('nibesh', 'nibesh123', 'admin'),
-            ('aayush', 'aayush123', 'admin'),
-            ('zimone', 'zimone123', 'staff')
-        ]
-        cursor.executemany("INSERT INTO users (username, password, role) VALUES (%s, %s, %s)", users_data)
+def seed_data(cursor):
+    users_data = [
+        ('nibesh', 'nibesh123', 'admin'),
+        ('aayush', 'aayush123', 'admin'),
+        ('zimone', 'zimone123', 'staff')
+    ]
+    cursor.executemany("INSERT INTO users (username, password, role) VALUES (%s, %s, %s)", users_data)
 
-        products_data = [
-            ('Gaming PC Mid', 1200.00, 'assets/gpc-mid.png', 10),
-            ('High End PC', 2500.00, 'assets/highendpc.png', 5),
-            ('JBL Headphone', 150.00, 'assets/jbl headphone.png', 20),
-            ('JBL Speaker', 120.00, 'assets/jbl speaker.png', 25),
-            ('LG Monitor 27"', 300.00, 'assets/lgmonitor.png', 4),
-            ('MacBook Pro', 2100.00, 'assets/macbook pro.png', 8),
-            ('Mechanical Keyboard', 110.00, 'assets/mech-key.png', 30),
-            ('Samsung S24 Ultra', 1300.00, 'assets/phone-s24.png', 12),
-            ('Raspberry Pi 5', 85.00, 'assets/rpi-5.png', 50),
-            ('Xiaomi Scooter', 550.00, 'assets/xiaomi.png', 3)
-        ]
-        cursor.executemany("INSERT INTO products (name, price, image_path, stock_level) VALUES (%s, %s, %s, %s)", products_data)
+    products_data = [
+        ('Gaming PC Mid', 1200.00, 'assets/gpc-mid.png', 10),
+        ('High End PC', 2500.00, 'assets/highendpc.png', 5),
+        ('JBL Headphone', 150.00, 'assets/jbl headphone.png', 20),
+        ('JBL Speaker', 120.00, 'assets/jbl speaker.png', 25),
+        ('LG Monitor 27"', 300.00, 'assets/lgmonitor.png', 4),
+        ('MacBook Pro', 2100.00, 'assets/macbook pro.png', 8),
+        ('Mechanical Keyboard', 110.00, 'assets/mech-key.png', 30),
+        ('Samsung S24 Ultra', 1300.00, 'assets/phone-s24.png', 12),
+        ('Raspberry Pi 5', 85.00, 'assets/rpi-5.png', 50),
+        ('Xiaomi Scooter', 550.00, 'assets/xiaomi.png', 3)
+    ]
+    cursor.executemany("INSERT INTO products (name, price, image_path, stock_level) VALUES (%s, %s, %s, %s)", products_data)
 
-        customers_data = [
-            ('John Doe', '021123456', 'john@example.com', 'Standard', 10),
-            ('Jane Smith', '022987654', 'jane@test.com', 'VIP', 150)
-        ]
-        cursor.executemany("INSERT INTO customers (name, phone, email, customer_type, loyalty_points) VALUES (%s, %s, %s, %s, %s)", customers_data)
+    customers_data = [
+        ('John Doe', '021123456', 'john@example.com', 'Standard', 10),
+        ('Jane Smith', '022987654', 'jane@test.com', 'VIP', 150)
+    ]
+    cursor.executemany("INSERT INTO customers (name, phone, email, customer_type, loyalty_points) VALUES (%s, %s, %s, %s, %s)", customers_data)
 
-        conn.commit()
-        print("Database initialized with Loyalty, Staff ID, and Assets.")
-        cursor.close()
+def report(connect=connect_db):
+    try:
+        conn = connect()
+        migrations.report(conn)
         conn.close()
-
-    except mysql.connector.Error as err:
-        print(f"Error creating tables: {err}")
+    except backends.DB_ERRORS:
+        migrations.report()
 
 if __name__ == "__main__":
-    create_database()
-    create_tables()
\ No newline at end of file
+    # Same backend choice as the app: POS_DB_BACKEND=sqlite sets up the embedded database file.
+    backend = backends.from_env(dict(DB_CONFIG, database=DB_NAME))
+    if "--report" in sys.argv:
+        report(backend.connect)
+    elif "--backfill-rollups" in sys.argv:
+        # python db_setup.py --backfill-rollups [YYYY-MM-DD]: rebuild the daily sales rollups
+        from database import Database
+        import datetime
+        args = sys.argv[sys.argv.index("--backfill-rollups") + 1:]
+        since = datetime.date.fromisoformat(args[0]) if args else None
+        db = Database(backend=backend)
+        days = db.rebuild_rollups(since)
+        if days is not False:
+            print(f"Rollups rebuilt{' from ' + str(since) if since else ''}: {days} trading days.")
+        db.close()
+    else:
+        if backend.name == "mysql":
+            create_database()
+        if "--reset" in sys.argv:
+            reset_tables(backend.connect)
+        else:
+            create_tables(backend.connect)
\ No newline at end of file
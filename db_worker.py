@@ -0,0 +1,103 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import metrics
+
+
+class WorkerBusyError(RuntimeError):
+    pass
+
+
+# How long a page waits before retrying a background read the worker turned away
+BUSY_RETRY_MS = 500
+
+
+class DatabaseWorker:
+    # Runs Database calls off the Tk main thread. Results are handed back on the
+    # main thread through root.after(), so callbacks may touch widgets freely.
+    #
+    # Requests submitted with the same key supersede each other: the older one is
+    # cancelled if it has not started, and its result is dropped if it has.
+    def __init__(self, root, max_workers=2, max_pending=32, poll_ms=20):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db-worker")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._done = queue.SimpleQueue()
+        self._latest = {}
+        self._closed = False
+        self._poll_id = self.root.after(self.poll_ms, self._poll)
+
+    def submit(self, fn, *args, key=None, on_done=None, on_error=None, **kwargs):
+        if self._closed:
+            raise WorkerBusyError("Database worker is shut down")
+        if key is not None:
+            self.cancel(key)
+        if not self._slots.acquire(blocking=False):
+            raise WorkerBusyError("Too many database requests are already queued")
+
+        submitted = time.perf_counter()
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except RuntimeError:
+            self._slots.release()
+            raise
+        if key is not None:
+            self._latest[key] = future
+        future.add_done_callback(lambda f: self._finished(f, key, on_done, on_error, submitted))
+        return future
+
+    def cancel(self, key):
+        future = self._latest.pop(key, None)
+        if future is not None:
+            future.cancel()
+
+    def is_pending(self, key):
+        future = self._latest.get(key)
+        return future is not None and not future.done()
+
+    def _finished(self, future, key, on_done, on_error, submitted):
+        self._slots.release()
+        if key is not None and not future.cancelled():
+            # Queue wait + run time per screen request, e.g. "store.catalog"
+            metrics.observe("screen", key, time.perf_counter() - submitted)
+        self._done.put((future, key, on_done, on_error))
+
+    def _poll(self):
+        while True:
+            try:
+                future, key, on_done, on_error = self._done.get_nowait()
+            except queue.Empty:
+                break
+            self._deliver(future, key, on_done, on_error)
+        if not self._closed:
+            self._poll_id = self.root.after(self.poll_ms, self._poll)
+
+    def _deliver(self, future, key, on_done, on_error):
+        if future.cancelled():
+            return
+        if key is not None:
+            if self._latest.get(key) is not future:
+                return
+            del self._latest[key]
+        try:
+            error = future.exception()
+            if error is not None:
+                if on_error:
+                    on_error(error)
+                else:
+                    print(f"Background DB call failed: {error}")
+            elif on_done:
+                on_done(future.result())
+        except Exception as e:
+            print(f"DB callback error: {e}")
+
+    def shutdown(self):
+        self._closed = True
+        try:
+            self.root.after_cancel(self._poll_id)
+        except Exception:
+            pass
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,259 @@
+import bisect
+import collections
+import datetime
+import functools
+import inspect
+import json
+import os
+import re
+import threading
+import time
+
+# In-process timing for the Database layer.
+#
+#   * every public Database method    -> "method" histograms (instrument_methods)
+#   * every pool checkout              -> "connect" histogram (Database.get_connection)
+#   * every SQL statement              -> "execute"/"fetch" histograms + rows (InstrumentedCursor)
+#   * every DatabaseWorker job by key  -> "screen" histograms, e.g. "store.catalog"
+#
+# Statements slower than POS_SLOW_QUERY_MS (default 200) go to an in-memory slow
+# log, and to POS_SLOW_QUERY_LOG (JSON lines) when set. metrics.snapshot() /
+# to_json() / to_prometheus() export everything.
+
+# Upper bounds in milliseconds; the last bucket is +Inf.
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+SLOW_LOG_SIZE = 200
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation (what Prometheus would estimate).
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "sum_ms": round(self.total, 3),
+            "max_ms": round(self.max, 3),
+            "p50_ms": self.quantile(0.50),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "buckets": dict(zip([str(b) for b in BUCKETS_MS] + ["+Inf"], self.counts)),
+        }
+
+
+_IN_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+_REPEATS = re.compile(r"(\(\?\)|WHEN %s THEN %s)(?:[\s,]*\1)+")
+
+
+@functools.lru_cache(maxsize=1024)
+def statement_name(sql):
+    # Groups statements by shape: "IN (%s, %s, %s)" and multi-row VALUES collapse,
+    # so a 3-item and a 30-item cart share one histogram.
+    text = " ".join(sql.split())
+    text = _IN_LIST.sub("(?)", text)
+    text = _REPEATS.sub(r"\1...", text)
+    return text[:160]
+
+
+class Metrics:
+    def __init__(self, slow_query_ms=None, slow_log_path=None):
+        self.slow_query_ms = float(os.environ.get("POS_SLOW_QUERY_MS", 200) if slow_query_ms is None else slow_query_ms)
+        self.slow_log_path = slow_log_path if slow_log_path is not None else os.environ.get("POS_SLOW_QUERY_LOG")
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.histograms = collections.defaultdict(Histogram)
+            self.rows = collections.Counter()
+            self.errors = collections.Counter()
+            self.slow_log = collections.deque(maxlen=SLOW_LOG_SIZE)
+            self.started = time.time()
+
+    def observe(self, kind, name, seconds, rows=None):
+        ms = seconds * 1000
+        with self._lock:
+            self.histograms[(kind, name)].observe(ms)
+            if rows:
+                self.rows[(kind, name)] += rows
+
+    def error(self, kind, name):
+        with self._lock:
+            self.errors[(kind, name)] += 1
+
+    @property
+    def current_method(self):
+        return getattr(self._local, "method", None)
+
+    def statement(self, sql, seconds):
+        name = statement_name(sql)
+        self.observe("execute", name, seconds)
+        ms = seconds * 1000
+        if ms >= self.slow_query_ms:
+            entry = {"at": datetime.datetime.now().isoformat(timespec="milliseconds"), "ms": round(ms, 3),
+                     "method": self.current_method, "statement": name}
+            with self._lock:
+                self.slow_log.append(entry)
+            if self.slow_log_path:
+                try:
+                    with open(self.slow_log_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(entry) + "\n")
+                except OSError:
+                    pass
+        return name
+
+    def snapshot(self):
+        with self._lock:
+            out = {"since": datetime.datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+                   "slow_query_ms": self.slow_query_ms}
+            for (kind, name), hist in sorted(self.histograms.items()):
+                entry = hist.as_dict()
+                if (kind, name) in self.rows:
+                    entry["rows"] = self.rows[(kind, name)]
+                if (kind, name) in self.errors:
+                    entry["errors"] = self.errors[(kind, name)]
+                out.setdefault(kind, {})[name] = entry
+            out["slow_queries"] = list(self.slow_log)
+            return out
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def to_prometheus(self, prefix="pos_db"):
+        # Text exposition format: one histogram family per kind, labelled by name.
+        lines = []
+        with self._lock:
+            items = sorted(self.histograms.items())
+            rows = dict(self.rows)
+            errors = dict(self.errors)
+        for kind in sorted({k for (k, _), _ in items}):
+            family = f"{prefix}_{kind}_duration_ms"
+            lines.append(f"# TYPE {family} histogram")
+            for (k, name), hist in items:
+                if k != kind:
+                    continue
+                label = name.replace("\\", "\\\\").replace('"', '\\"')
+                cumulative = 0
+                for bound, n in zip([str(b) for b in BUCKETS_MS] + ["+Inf"], hist.counts):
+                    cumulative += n
+                    lines.append(f'{family}_bucket{{name="{label}",le="{bound}"}} {cumulative}')
+                lines.append(f'{family}_sum{{name="{label}"}} {hist.total:.3f}')
+                lines.append(f'{family}_count{{name="{label}"}} {hist.count}')
+        for metric, counter in (("rows_total", rows), ("errors_total", errors)):
+            if counter:
+                lines.append(f"# TYPE {prefix}_{metric} counter")
+                for (kind, name), n in sorted(counter.items()):
+                    label = name.replace("\\", "\\\\").replace('"', '\\"')
+                    lines.append(f'{prefix}_{metric}{{kind="{kind}",name="{label}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class InstrumentedCursor:
+    # Wraps a driver cursor (mysql.connector or backends.SQLiteCursor): times execute and
+    # fetch, counts rows, and feeds the slow-query log. Everything else passes through.
+    def __init__(self, cursor, registry):
+        self._cursor = cursor
+        self._metrics = registry
+        self._statement = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, sql, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(sql, *args, **kwargs)
+        except Exception:
+            self._metrics.error("execute", statement_name(sql))
+            raise
+        finally:
+            self._statement = self._metrics.statement(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(sql, *args, **kwargs)
+        finally:
+            self._statement = self._metrics.statement(sql, time.perf_counter() - start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._metrics.observe("fetch", self._statement, time.perf_counter() - start, 1 if row is not None else 0)
+        return row
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._metrics.observe("fetch", self._statement, time.perf_counter() - start, len(rows))
+        return rows
+
+
+def untimed(fn):
+    # Marks a method instrument_methods() should leave alone.
+    fn.untimed = True
+    return fn
+
+
+def instrument_methods(cls, registry=None):
+    # Class decorator: times every public method (generators excluded: they return
+    # before doing any work). The method name is kept in a thread-local so the
+    # statements it issues show up against it in the slow-query log.
+    registry = registry or metrics
+
+    def wrap(name, fn):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            local = registry._local
+            outer = getattr(local, "method", None)
+            local.method = name
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                registry.error("method", name)
+                raise
+            finally:
+                local.method = outer
+            rows = len(result) if isinstance(result, list) else None
+            registry.observe("method", name, time.perf_counter() - start, rows)
+            return result
+        return timed
+
+    for name, fn in list(vars(cls).items()):
+        if (name.startswith("_") or not inspect.isfunction(fn) or inspect.isgeneratorfunction(fn)
+                or getattr(fn, "untimed", False)):
+            continue
+        setattr(cls, name, wrap(name, fn))
+    return cls
@@ -1,5 +1,6 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
+from db_worker import WorkerBusyError
 
 class LoginPage(tk.Frame):
     def __init__(self, parent, controller):
@@ -20,19 +21,33 @@ class LoginPage(tk.Frame):
         self.password_entry = ttk.Entry(box, show="*", width=30, font=("Helvetica", 11))
         self.password_entry.pack(pady=(0, 20))
         
-        tk.Button(box, text="Login", command=self.attempt_login, 
-                  bg="#4CAF50", fg="white", font=("Helvetica", 12, "bold"), 
-                  width=20, cursor="hand2").pack()
+        self.login_btn = tk.Button(box, text="Login", command=self.attempt_login, 
+                                   bg="#4CAF50", fg="white", font=("Helvetica", 12, "bold"), 
+                                   width=20, cursor="hand2")
+        self.login_btn.pack()
 
         self.password_entry.bind("<Return>", lambda e: self.attempt_login())
 
     def attempt_login(self):
+        if self.controller.worker.is_pending("login"):
+            return
         u = self.username_entry.get().strip()
         p = self.password_entry.get().strip()
-        user = self.controller.db.login(u, p)
-        
+        self.login_btn.config(text="Signing in...", state="disabled")
+        try:
+            self.controller.worker.submit(self.controller.db.login, u, p, key="login",
+                                          on_done=self.on_login_result, on_error=self.on_login_error)
+        except WorkerBusyError as e:
+            self.on_login_error(e)
+
+    def on_login_result(self, user):
+        self.login_btn.config(text="Login", state="normal")
         if user:
             self.controller.on_login_success(user)
         else:
             messagebox.showerror("Login Failed", "Invalid username or password")
-            self.password_entry.delete(0, tk.END)
\ No newline at end of file
+            self.password_entry.delete(0, tk.END)
+
+    def on_login_error(self, error):
+        self.login_btn.config(text="Login", state="normal")
+        messagebox.showerror("Login Failed", f"Database error: {error}")
\ No newline at end of file
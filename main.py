@@ -1,15 +1,37 @@
+import importlib
+import os
 import tkinter as tk
 from tkinter import ttk, messagebox
 from database import Database
+import db_setup
+from catalog import ProductCatalog
+from cart_model import CartModel
+from pricing import PricingEngine
+from reservations import CartReservations
+from change_feed import ChangeFeed
+from db_worker import DatabaseWorker, WorkerBusyError, BUSY_RETRY_MS
+from sales_journal import SalesJournal, replay_pending
+
+JOURNAL_REPLAY_MS = 15000
+RESERVATION_SWEEP_MS = 60000
+CHANGE_POLL_MS = 2000
+CHANGE_PRUNE_MS = 3600000
+
+# Page name -> module it lives in. Pages (and their imports, e.g. PIL for the
+# store grid) are only loaded and built the first time they are shown.
+PAGE_MODULES = {
+    "StorePage": "sales_portal",
+    "CartPage": "shopping_cart",
+    "CheckoutPage": "checkout_process",
+    "ReceiptPage": "checkout_process",
+    "AdminMenu": None,
+    "ProductManager": "product_manager",
+    "CustomerManager": "customer_manager",
+    "OrderManager": "order_manager",
+}
 
 try:
     from login_system import LoginPage
-    from sales_portal import StorePage
-    from shopping_cart import CartPage
-    from checkout_process import CheckoutPage, ReceiptPage
-    from product_manager import ProductManager
-    from customer_manager import CustomerManager
-    from order_manager import OrderManager 
 except ImportError as e:
     print(f"Warning: {e}. Ensure all application files are present.")
 
@@ -19,10 +41,22 @@ class POSApp(tk.Tk):
         self.title("Bijuli Tech POS System (SOFT605)")
         self.geometry("1024x768")
         
-        self.db = Database()
+        self.db = Database(journal=SalesJournal())
+        if self.db.backend.name == "sqlite":
+            # Embedded single-till store: create or upgrade the schema on startup
+            db_setup.create_tables(self.db.get_connection)
+        self.catalog = ProductCatalog(self.db)
+        self.pricing = PricingEngine(self.catalog)
+        self.worker = DatabaseWorker(self)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
         self.current_user = None 
-        self.cart = {} 
+        self.cart = CartModel()
+        # Every cart change is mirrored into stock holds on the server
+        self.reservations = CartReservations(self.cart, self.db, self.worker, on_short=self.on_stock_short)
         self.current_order_id = None 
+        self.last_receipt = None
+        # Other tills' product and customer edits and sales, see poll_changes
+        self.changes = ChangeFeed(self.db)
 
         self.configure_styles()
         
@@ -33,6 +67,12 @@ class POSApp(tk.Tk):
 
         self.frames = {}
         self.show_login()
+        # Load the catalog while the cashier is typing their password
+        self.after_idle(self.warm_catalog)
+        self.after(1000, self.replay_journal)
+        self.after(RESERVATION_SWEEP_MS, self.sweep_reservations)
+        self.after(CHANGE_POLL_MS, self.poll_changes)
+        self.after(CHANGE_PRUNE_MS, self.prune_changes)
 
     def configure_styles(self):
         style = ttk.Style()
@@ -51,29 +91,37 @@ class POSApp(tk.Tk):
         frame.grid(row=0, column=0, sticky="nsew")
         frame.tkraise()
 
+    def warm_catalog(self):
+        try:
+            self.worker.submit(self.catalog.refresh_if_stale, key="catalog.warm",
+                               on_error=lambda e: print(f"Catalog preload failed: {e}"))
+        except WorkerBusyError:
+            pass  # pages load the catalog on entry anyway
+
     def on_login_success(self, user):
         self.current_user = user
-        self.load_app_frames()
         if user['role'] == 'staff':
             self.show_frame("StorePage")
         elif user['role'] == 'admin':
             self.show_frame("AdminMenu")
 
-    def load_app_frames(self):
-        try:
-            pages = (StorePage, CartPage, CheckoutPage, ReceiptPage, 
-                     AdminMenu, ProductManager, CustomerManager, OrderManager)
-            for F in pages:
-                page_name = F.__name__
-                frame = F(parent=self.container, controller=self)
-                self.frames[page_name] = frame
-                frame.grid(row=0, column=0, sticky="nsew")
-        except NameError as e:
-            print(f"Error loading frames: {e}")
+    def get_frame(self, page_name):
+        frame = self.frames.get(page_name)
+        if frame is None and page_name in PAGE_MODULES:
+            module = PAGE_MODULES[page_name]
+            try:
+                page = AdminMenu if module is None else getattr(importlib.import_module(module), page_name)
+            except (ImportError, AttributeError) as e:
+                print(f"Error loading {page_name}: {e}")
+                return None
+            frame = page(parent=self.container, controller=self)
+            self.frames[page_name] = frame
+            frame.grid(row=0, column=0, sticky="nsew")
+        return frame
 
     def show_frame(self, page_name):
-        if page_name in self.frames:
-            frame = self.frames[page_name]
+        frame = self.get_frame(page_name)
+        if frame is not None:
             frame.tkraise()
             if hasattr(frame, 'refresh'):
                 frame.refresh()
@@ -82,9 +130,103 @@ class POSApp(tk.Tk):
 
     def logout(self, current_frame=None):
         self.current_user = None
-        self.cart = {}
+        self.cart.clear()
         self.show_login()
 
+    def on_stock_short(self, pid, available):
+        prod = self.catalog.get(pid)
+        name = prod['name'] if prod else f"Product #{pid}"
+        messagebox.showwarning("Stock Limit", f"Cannot add more {name}: {max(available, 0)} free, "
+                                              f"the rest is held by other carts.")
+
+    def sweep_reservations(self):
+        # Hands back holds from carts that went quiet past their TTL (e.g. a till that crashed)
+        if not self.worker.is_pending("reservations.sweep"):
+            try:
+                self.worker.submit(self.db.release_expired_reservations, key="reservations.sweep",
+                                   on_error=lambda e: print(f"Reservation sweep failed: {e}"))
+            except WorkerBusyError:
+                pass
+        self.after(RESERVATION_SWEEP_MS, self.sweep_reservations)
+
+    def poll_changes(self):
+        # Asks the change log what other tills touched; usually nothing, one indexed read.
+        if not self.worker.is_pending("changes.poll"):
+            try:
+                self.worker.submit(self.changes.poll, key="changes.poll", on_done=self.on_changes,
+                                   on_error=lambda e: print(f"Change feed poll failed: {e}"))
+            except WorkerBusyError:
+                pass
+        self.after(CHANGE_POLL_MS, self.poll_changes)
+
+    def on_changes(self, changes):
+        # Fetches just the changed rows (not keyed: each batch of ids must arrive)
+        for entity, ids in changes.items():
+            try:
+                self.worker.submit(self.changes.fetch, entity, ids, on_done=lambda result: self.on_rows_changed(*result),
+                                   on_error=lambda e: print(f"Loading changed rows failed: {e}"))
+            except WorkerBusyError:
+                self.on_rows_changed(entity, None, None, None)
+
+    def on_rows_changed(self, entity, ids, records, version):
+        # ids None (or records None, the fetch failed) tells pages to reload in full
+        if records is None:
+            ids = None
+        if entity == "product":
+            if ids is None:
+                self.catalog.invalidate()
+            elif not self.catalog.apply_changes(ids, records, version):
+                ids = records = None
+        for frame in list(self.frames.values()):
+            if hasattr(frame, "on_data_changed"):
+                frame.on_data_changed(entity, ids, records)
+
+    def prune_changes(self):
+        try:
+            self.worker.submit(self.db.prune_change_log, key="changes.prune",
+                               on_error=lambda e: print(f"Change log prune failed: {e}"))
+        except WorkerBusyError:
+            pass
+        self.after(CHANGE_PRUNE_MS, self.prune_changes)
+
+    def replay_journal(self):
+        # Pushes sales taken while the server was down; a no-op while the journal is empty.
+        if len(self.db.journal) and not self.worker.is_pending("journal.replay"):
+            try:
+                self.worker.submit(replay_pending, self.db, self.db.journal, key="journal.replay",
+                                   on_done=self.on_journal_replayed,
+                                   on_error=lambda e: print(f"Journal replay failed: {e}"))
+            except WorkerBusyError:
+                pass
+        self.after(JOURNAL_REPLAY_MS, self.replay_journal)
+
+    def on_journal_replayed(self, summary):
+        if summary["replayed"]:
+            print(f"Replayed {summary['replayed']} offline sale(s); {summary['remaining']} still queued.")
+            self.catalog.invalidate()
+        for journal_id, pid, short in summary["shortfalls"]:
+            print(f"Stock conflict: offline sale {journal_id} sold {short} more of product {pid} than was in stock.")
+        if summary["dead_letters"]:
+            path = self.db.journal.dead_letter_path
+            for journal_id in summary["dead_letters"]:
+                print(f"Offline sale {journal_id} was rejected by the server; moved to {path}.")
+            messagebox.showwarning("Offline Sales", f"{len(summary['dead_letters'])} offline sale(s) could not be "
+                                                    f"booked and were moved to {path} for review.")
+
+    def on_close(self):
+        self.worker.shutdown()
+        self.reservations.release()
+        # POS_METRICS_FILE=metrics.json keeps this session's query timings (see instrumentation.py).
+        path = os.environ.get("POS_METRICS_FILE")
+        if path:
+            try:
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(self.db.metrics.to_json(indent=2))
+            except OSError as e:
+                print(f"Could not write metrics: {e}")
+        self.db.close()
+        self.destroy()
+
 class AdminMenu(tk.Frame):
     def __init__(self, parent, controller):
         super().__init__(parent)
@@ -93,7 +235,9 @@ class AdminMenu(tk.Frame):
         center_frame = tk.Frame(self, bg="white", padx=40, pady=40, relief="raised", bd=1)
         center_frame.place(relx=0.5, rely=0.5, anchor="center")
         tk.Label(center_frame, text="Admin Dashboard", font=("Helvetica", 22, "bold"), 
-                 bg="white", fg="#333").pack(pady=(0, 30))
+                 bg="white", fg="#333").pack(pady=(0, 10))
+        self.lbl_today = tk.Label(center_frame, text="", font=("Helvetica", 11), bg="white", fg="#666")
+        self.lbl_today.pack(pady=(0, 20))
         btn_style = {"font": ("Helvetica", 12), "width": 25, "pady": 10}
         tk.Button(center_frame, text="Enter Store (POS Mode)", bg="#4CAF50", fg="white", **btn_style,
                   command=lambda: controller.show_frame("StorePage")).pack(pady=10)
@@ -107,7 +251,20 @@ class AdminMenu(tk.Frame):
                   command=lambda: controller.logout(self)).pack(pady=(30, 0))
         
     def refresh(self):
-        pass
+        # Today's figures come from the daily rollups, so this stays cheap however long the history
+        try:
+            self.controller.worker.submit(self.controller.db.get_daily_summary, key="admin.today",
+                                          on_done=self.show_today, on_error=lambda e: self.lbl_today.config(text=""))
+        except WorkerBusyError:
+            self.after(BUSY_RETRY_MS, self.refresh)
+
+    def show_today(self, summary):
+        if not summary:
+            self.lbl_today.config(text="")
+            return
+        best = summary['top_products'][0]['name'] if summary['top_products'] else "-"
+        self.lbl_today.config(text=f"Today: {summary['orders']} orders, {summary['units']} items, "
+                                   f"${float(summary['revenue']):.2f}  |  Best seller: {best}")
 
 if __name__ == "__main__":
     app = POSApp()
@@ -0,0 +1,319 @@
+import datetime
+
+from backends import dialect_of
+
+# Versioned, idempotent schema migrations for soft605_pos.
+# Each migration runs once and is recorded in schema_migrations. Every step is
+# written to be safe to re-run (IF NOT EXISTS / existence checks), because MySQL
+# DDL commits implicitly and a migration can be interrupted half way.
+#
+# Append new migrations to MIGRATIONS; never edit one that has shipped.
+
+
+def _index_exists(cursor, table, index):
+    return dialect_of(cursor).index_exists(cursor, table, index)
+
+
+def _add_indexes(cursor, indexes):
+    for table, name, columns, _ in indexes:
+        if not _index_exists(cursor, table, name):
+            cursor.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+
+
+def _base_schema(cursor):
+    # The schema db_setup.py used to drop and recreate; a no-op on existing databases.
+    # Written once for both backends: the dialect fills in the engine-specific bits.
+    d = dialect_of(cursor)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS users (
+            id {d.autoincrement_pk},
+            username VARCHAR(50){d.nocase} UNIQUE NOT NULL,
+            password VARCHAR(50) NOT NULL,
+            role {d.enum(('admin', 'staff'))} NOT NULL
+        )
+    """)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS products (
+            id {d.autoincrement_pk},
+            name VARCHAR(100){d.nocase} NOT NULL,
+            price DECIMAL(10, 2) NOT NULL,
+            image_path VARCHAR(255),
+            stock_level INT NOT NULL
+        )
+    """)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS customers (
+            id {d.autoincrement_pk},
+            name VARCHAR(100){d.nocase} NOT NULL,
+            phone VARCHAR(20),
+            email VARCHAR(100){d.nocase},
+            customer_type VARCHAR(50) DEFAULT 'Standard',
+            loyalty_points INT DEFAULT 0
+        )
+    """)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS orders (
+            id {d.autoincrement_pk},
+            customer_id INT,
+            user_id INT,
+            total_amount DECIMAL(10, 2),
+            order_date TIMESTAMP DEFAULT {d.now_default},
+            FOREIGN KEY (customer_id) REFERENCES customers(id) ON DELETE SET NULL,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL
+        )
+    """)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS order_items (
+            id {d.autoincrement_pk},
+            order_id INT,
+            product_id INT,
+            quantity INT,
+            price_at_time DECIMAL(10, 2),
+            FOREIGN KEY (order_id) REFERENCES orders(id) ON DELETE CASCADE,
+            FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE SET NULL
+        )
+    """)
+
+
+def _catalog_version(cursor):
+    # Bumped by every write to products so clients can cheaply tell when their catalog is stale
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id INT PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute(f"{dialect_of(cursor).insert_ignore} INTO catalog_version (id, version) VALUES (1, 0)")
+
+
+# (table, index name, columns, queries in database.py it serves)
+HOT_QUERY_INDEXES = [
+    ("orders", "idx_orders_date_id", "order_date, id",
+     ["Database.get_orders_page: keyset WHERE/ORDER BY (order_date, id) DESC",
+      "Database.get_all_orders: ORDER BY order_date DESC"]),
+    ("orders", "idx_orders_total", "total_amount",
+     ["Database.get_orders_page: min/max amount filter"]),
+    ("customers", "idx_customers_name", "name",
+     ["Database.search_customers: name prefix + ORDER BY name",
+      "Database.get_orders_page: customer name prefix filter"]),
+    ("customers", "idx_customers_phone", "phone",
+     ["Database.search_customers: phone prefix"]),
+    ("customers", "idx_customers_email", "email",
+     ["Database.search_customers: email prefix",
+      "Database.upsert_customers: match id-less import rows by email"]),
+]
+
+
+IMPORT_INDEXES = [
+    ("products", "idx_products_name", "name",
+     ["Database.upsert_products: match id-less import rows by name"]),
+]
+
+
+# Created unique by _sales_journal; listed here for report().
+JOURNAL_INDEXES = [
+    ("orders", "idx_orders_journal_id", "journal_id",
+     ["Database.replay_sales: skip offline sales that were already replayed"]),
+]
+
+
+def _sales_journal(cursor):
+    # Sales taken offline (sales_journal.py) are replayed with their journal id, so a
+    # replay interrupted after its commit can never book the same sale twice.
+    d = dialect_of(cursor)
+    if not d.column_exists(cursor, "orders", "journal_id"):
+        cursor.execute("ALTER TABLE orders ADD COLUMN journal_id VARCHAR(40) NULL")
+    if not _index_exists(cursor, "orders", "idx_orders_journal_id"):
+        cursor.execute("CREATE UNIQUE INDEX idx_orders_journal_id ON orders (journal_id)")
+    # Replayed sales that sold more than was left in stock, for the stock take.
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS stock_conflicts (
+            id {d.autoincrement_pk},
+            order_id INT,
+            product_id INT,
+            quantity INT NOT NULL,
+            shortfall INT NOT NULL,
+            recorded_at TIMESTAMP DEFAULT {d.now_default},
+            FOREIGN KEY (order_id) REFERENCES orders(id) ON DELETE CASCADE
+        )
+    """)
+
+
+def _receipt_snapshots(cursor):
+    # Receipts are rendered from the order row alone: what was charged, how, and the
+    # product names as they were at the till (so deleting a product keeps its history).
+    d = dialect_of(cursor)
+    for table, column, ddl in (("order_items", "product_name", "VARCHAR(100)"),
+                               ("orders", "subtotal", "DECIMAL(10, 2)"),
+                               ("orders", "discount_amount", "DECIMAL(10, 2) DEFAULT 0"),
+                               ("orders", "payment_method", "VARCHAR(20)")):
+        if not d.column_exists(cursor, table, column):
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+    cursor.execute("UPDATE order_items SET product_name = "
+                   "(SELECT name FROM products WHERE products.id = order_items.product_id) "
+                   "WHERE product_name IS NULL")
+
+
+def _sales_rollups(cursor):
+    # Per-day totals kept up to date by every sale (Database._add_to_rollups), so reports
+    # read a handful of rows instead of scanning orders. Unknown staff/products roll up under 0.
+    # Existing history is filled in with `python db_setup.py --backfill-rollups`.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sales_daily (
+            day DATE PRIMARY KEY,
+            orders INT NOT NULL DEFAULT 0,
+            units INT NOT NULL DEFAULT 0,
+            revenue DECIMAL(12, 2) NOT NULL DEFAULT 0,
+            discounts DECIMAL(12, 2) NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sales_daily_product (
+            day DATE NOT NULL,
+            product_id INT NOT NULL,
+            units INT NOT NULL DEFAULT 0,
+            revenue DECIMAL(12, 2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, product_id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sales_daily_staff (
+            day DATE NOT NULL,
+            user_id INT NOT NULL,
+            orders INT NOT NULL DEFAULT 0,
+            revenue DECIMAL(12, 2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, user_id)
+        )
+    """)
+
+
+def _vouchers(cursor):
+    # Voucher codes used to be hard-coded in the checkout page; pricing.PricingEngine loads
+    # them from here. Percent is 0-100. The one code that existed before is carried over.
+    d = dialect_of(cursor)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS vouchers (
+            code VARCHAR(32){d.nocase} PRIMARY KEY,
+            percent DECIMAL(5, 2) NOT NULL,
+            active BOOLEAN NOT NULL DEFAULT TRUE,
+            expires_on DATE NULL
+        )
+    """)
+    cursor.execute(f"{d.insert_ignore} INTO vouchers (code, percent) VALUES ('ais10', 10.00)")
+
+
+RESERVATION_INDEXES = [
+    ("stock_reservations", "idx_reservations_expires", "expires_at",
+     ["Database.release_expired_reservations: find lapsed holds without a scan"]),
+]
+
+CHANGE_LOG_INDEXES = [
+    ("change_log", "idx_change_log_changed_at", "changed_at",
+     ["Database.prune_change_log: drop old entries without a scan"]),
+]
+
+
+def _stock_reservations(cursor):
+    # Carts hold stock while the cashier rings up and takes payment. products.reserved is
+    # the sum of live holds, so availability is stock_level - reserved on the product row
+    # itself; stock_reservations says whose holds they are and when they lapse.
+    d = dialect_of(cursor)
+    if not d.column_exists(cursor, "products", "reserved"):
+        cursor.execute("ALTER TABLE products ADD COLUMN reserved INT NOT NULL DEFAULT 0")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stock_reservations (
+            token VARCHAR(40) NOT NULL,
+            product_id INT NOT NULL,
+            quantity INT NOT NULL,
+            expires_at TIMESTAMP NOT NULL,
+            PRIMARY KEY (token, product_id),
+            FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+        )
+    """)
+    _add_indexes(cursor, RESERVATION_INDEXES)
+
+
+def _change_log(cursor):
+    # One row per product or customer touched by a write, in commit order. Tills poll it
+    # (change_feed.ChangeFeed) for what changed since the sequence number they last saw;
+    # a NULL entity_id means "too many to list, reload them all" (bulk imports).
+    d = dialect_of(cursor)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq {d.autoincrement_pk},
+            entity VARCHAR(20) NOT NULL,
+            entity_id INT NULL,
+            changed_at TIMESTAMP DEFAULT {d.now_default}
+        )
+    """)
+    _add_indexes(cursor, CHANGE_LOG_INDEXES)
+
+
+MIGRATIONS = [
+    (1, "Base schema", _base_schema, []),
+    (2, "Catalog version counter", _catalog_version, []),
+    (3, "Indexes for hot queries", lambda cursor: _add_indexes(cursor, HOT_QUERY_INDEXES), HOT_QUERY_INDEXES),
+    (4, "Indexes for bulk catalog import", lambda cursor: _add_indexes(cursor, IMPORT_INDEXES), IMPORT_INDEXES),
+    (5, "Offline sales journal replay", _sales_journal, JOURNAL_INDEXES),
+    (6, "Receipt snapshots on orders and order lines", _receipt_snapshots, []),
+    (7, "Daily sales rollups", _sales_rollups, []),
+    (8, "Voucher codes", _vouchers, []),
+    (9, "Stock reservations", _stock_reservations, RESERVATION_INDEXES),
+    (10, "Change log for cross-till updates", _change_log, CHANGE_LOG_INDEXES),
+]
+
+
+def _ensure_migrations_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP NOT NULL
+        )
+    """)
+
+
+def applied_versions(conn):
+    cursor = conn.cursor()
+    _ensure_migrations_table(cursor)
+    cursor.execute("SELECT version FROM schema_migrations")
+    versions = {row[0] for row in cursor.fetchall()}
+    cursor.close()
+    return versions
+
+
+def migrate(conn, target=None, out=print):
+    # Applies every pending migration up to target (default: latest). Returns the versions applied.
+    done = applied_versions(conn)
+    applied = []
+    cursor = conn.cursor()
+    try:
+        for version, description, apply, indexes in MIGRATIONS:
+            if version in done or (target is not None and version > target):
+                continue
+            apply(cursor)
+            cursor.execute("INSERT INTO schema_migrations (version, description, applied_at) VALUES (%s, %s, %s)",
+                           (version, description, datetime.datetime.now()))
+            conn.commit()
+            applied.append(version)
+            out(f"Applied migration {version}: {description}")
+            for table, name, columns, serves in indexes:
+                out(f"  + {name} on {table}({columns}) serves: {'; '.join(serves)}")
+    finally:
+        cursor.close()
+    if not applied:
+        out("Schema is up to date.")
+    return applied
+
+
+def report(conn=None, out=print):
+    # Lists every migration (and its status when a connection is given) and
+    # the queries each index exists for.
+    done = applied_versions(conn) if conn is not None else None
+    for version, description, _, indexes in MIGRATIONS:
+        status = "" if done is None else (" [applied]" if version in done else " [pending]")
+        out(f"{version}: {description}{status}")
+        for table, name, columns, serves in indexes:
+            out(f"    {name} on {table}({columns})")
+            for query in serves:
+                out(f"        - {query}")
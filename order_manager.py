@@ -0,0 +1,172 @@
+import tkinter as tk
+from tkinter import ttk, messagebox
+import datetime
+from db_worker import WorkerBusyError
+
+PAGE_SIZE = 100
+
+def parse_filters(values):
+    # Filter box text -> Database.get_orders_page keyword arguments; raises ValueError
+    values = {k: (v or "").strip() for k, v in values.items()}
+    filters = {}
+    for key in ("date_from", "date_to"):
+        if values.get(key):
+            day = datetime.datetime.strptime(values[key], "%Y-%m-%d")
+            # "To" is inclusive in the UI, exclusive in the query
+            filters[key] = day + datetime.timedelta(days=1) if key == "date_to" else day
+    for key in ("min_amount", "max_amount"):
+        if values.get(key):
+            filters[key] = round(float(values[key]), 2)
+    for key in ("customer_name", "staff_name"):
+        if values.get(key):
+            filters[key] = values[key]
+    return filters
+
+class OrderManager(tk.Frame):
+    def __init__(self, parent, controller):
+        super().__init__(parent)
+        self.controller = controller
+        self.db = controller.db
+        self.configure(bg="#f0f0f0")
+        self.filters = {}
+        self.next_cursor = None
+        self.loading = False
+
+        header = tk.Frame(self, bg="#607D8B", height=60)
+        header.pack(fill="x")
+
+        tk.Button(header, text="← Back to Dashboard", command=lambda: controller.show_frame("AdminMenu"),
+                  bg="#455A64", fg="white", relief="flat", font=("Helvetica", 10)).pack(side="left", padx=10, pady=10)
+
+        tk.Label(header, text="Order History", font=("Helvetica", 18, "bold"),
+                 bg="#607D8B", fg="white").pack(side="left", padx=20)
+
+        # Filters (applied server-side)
+        toolbar = tk.Frame(self, bg="#f0f0f0", pady=10)
+        toolbar.pack(fill="x", padx=20)
+
+        self.filter_entries = {}
+        for key, label, width in (("date_from", "From (YYYY-MM-DD)", 12), ("date_to", "To", 12),
+                                  ("customer_name", "Customer", 14), ("staff_name", "Staff", 10),
+                                  ("min_amount", "Min $", 8), ("max_amount", "Max $", 8)):
+            tk.Label(toolbar, text=label + ":", bg="#f0f0f0").pack(side="left", padx=(5, 2))
+            entry = tk.Entry(toolbar, width=width)
+            entry.pack(side="left", padx=(0, 5))
+            entry.bind("<Return>", lambda e: self.apply_filters())
+            self.filter_entries[key] = entry
+
+        tk.Button(toolbar, text="Apply", command=self.apply_filters,
+                  bg="#2196F3", fg="white").pack(side="left", padx=5)
+        tk.Button(toolbar, text="Clear", command=self.clear_filters,
+                  bg="white", fg="#333").pack(side="left", padx=5)
+
+        table_frame = tk.Frame(self)
+        table_frame.pack(fill="both", expand=True, padx=20)
+
+        cols = ("ID", "Date", "Customer", "Staff", "Total")
+        self.tree = ttk.Treeview(table_frame, columns=cols, show="headings")
+        self.vsb = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.on_tree_scroll)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.vsb.pack(side="right", fill="y")
+        self.tree.bind("<Double-1>", lambda e: self.show_order_items())
+
+        for col in cols:
+            self.tree.heading(col, text=col)
+            width = 60 if col == "ID" else 160
+            self.tree.column(col, width=width, anchor="center" if col in ("ID", "Total") else "w")
+
+        footer = tk.Frame(self, bg="#f0f0f0")
+        footer.pack(fill="x", padx=20, pady=(5, 20))
+        self.lbl_status = tk.Label(footer, text="", bg="#f0f0f0", fg="#666")
+        self.lbl_status.pack(side="left")
+        self.more_btn = tk.Button(footer, text="Load More", command=self.load_next_page,
+                                  bg="white", fg="#333", state="disabled")
+        self.more_btn.pack(side="right")
+
+    def refresh(self):
+        self.reload()
+
+    def parse_filters(self):
+        return parse_filters({k: e.get() for k, e in self.filter_entries.items()})
+
+    def apply_filters(self):
+        try:
+            self.filters = self.parse_filters()
+        except ValueError:
+            messagebox.showerror("Error", "Invalid filter. Dates are YYYY-MM-DD, amounts are numbers.")
+            return
+        self.reload()
+
+    def clear_filters(self):
+        for entry in self.filter_entries.values():
+            entry.delete(0, tk.END)
+        self.filters = {}
+        self.reload()
+
+    def reload(self):
+        for row in self.tree.get_children():
+            self.tree.delete(row)
+        self.next_cursor = None
+        self.fetch_page(None)
+
+    def load_next_page(self):
+        if self.next_cursor and not self.loading:
+            self.fetch_page(self.next_cursor)
+
+    def fetch_page(self, after):
+        self.loading = True
+        self.more_btn.config(state="disabled")
+        self.lbl_status.config(text="Loading orders...")
+        try:
+            self.controller.worker.submit(self.db.get_orders_page, PAGE_SIZE, after, key="orders.page",
+                                          on_done=self.on_page_loaded, on_error=self.on_page_error, **self.filters)
+        except WorkerBusyError as e:
+            self.on_page_error(e)
+
+    def on_page_loaded(self, result):
+        rows, self.next_cursor = result
+        self.loading = False
+        for o in rows:
+            order_date = o['order_date'].strftime("%Y-%m-%d %H:%M") if hasattr(o['order_date'], 'strftime') else o['order_date']
+            self.tree.insert("", "end", iid=str(o['id']),
+                             values=(o['id'], order_date, o['customer'] or "Walk-in", o['staff'] or "-", f"${float(o['total_amount']):.2f}"))
+        shown = len(self.tree.get_children())
+        more = " (more available)" if self.next_cursor else ""
+        self.lbl_status.config(text=f"Showing {shown} orders{more}")
+        self.more_btn.config(state="normal" if self.next_cursor else "disabled")
+
+    def on_page_error(self, error):
+        self.loading = False
+        self.lbl_status.config(text=f"Could not load orders: {error}")
+        self.more_btn.config(state="normal" if self.next_cursor else "disabled")
+
+    def on_tree_scroll(self, first, last):
+        self.vsb.set(first, last)
+        # Fetch the next page when the user scrolls near the bottom
+        if float(last) > 0.95:
+            self.load_next_page()
+
+    def show_order_items(self):
+        selected = self.tree.selection()
+        if not selected: return
+        oid = int(selected[0])
+        try:
+            self.controller.worker.submit(self.db.get_order_items, oid, key="orders.items",
+                                          on_done=lambda items: self.open_items_popup(oid, items))
+        except WorkerBusyError as e:
+            messagebox.showwarning("Till Busy", f"Could not load order items: {e}")
+
+    def open_items_popup(self, oid, items):
+        popup = tk.Toplevel(self)
+        popup.title(f"Order #{oid}")
+        popup.geometry("450x300")
+        popup.configure(bg="white")
+        cols = ("Item", "Qty", "Price")
+        tree = ttk.Treeview(popup, columns=cols, show="headings")
+        for col in cols:
+            tree.heading(col, text=col)
+            tree.column(col, width=250 if col == "Item" else 80)
+        tree.pack(fill="both", expand=True, padx=10, pady=10)
+        for item in items:
+            tree.insert("", "end", values=(item['name'], item['quantity'], f"${float(item['price_at_time']):.2f}"))
@@ -0,0 +1,180 @@
+import functools
+from decimal import Decimal, ROUND_HALF_UP
+
+# Cart pricing in exact decimal money. A quote is the subtotal at shelf prices
+# minus each rule's discount, applied in order to what is left:
+#
+#   quantity breaks (per line) -> customer tier -> voucher
+#
+# which is how the till has always stacked VIP and voucher discounts. Quotes are
+# memoized by (catalog generation, cart, tier, voucher), so repricing on every click
+# in the checkout page is in-memory work; vouchers come from the vouchers table.
+
+CENT = Decimal("0.01")
+HUNDRED = Decimal(100)
+
+# customer_type -> rate off the whole cart
+TIER_DISCOUNTS = {"VIP": Decimal("0.05")}
+# (minimum units of one product, rate off that line); the largest break reached applies
+QUANTITY_BREAKS = ()
+
+
+def money(value):
+    # str() first so a float price like 0.1 does not bring its binary expansion along
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def percent_label(rate):
+    return f"{(rate * HUNDRED).normalize():f}%"
+
+
+class Voucher:
+    __slots__ = ("code", "rate")
+
+    def __init__(self, code, rate):
+        self.code = code
+        self.rate = Decimal(rate)
+
+    @classmethod
+    def from_record(cls, rec):
+        return cls(rec['code'], Decimal(str(rec['percent'])) / HUNDRED)
+
+    def __repr__(self):
+        return f"Voucher({self.code!r}, {self.rate})"
+
+
+class QuantityBreaks:
+    kind = "breaks"
+
+    def __init__(self, breaks=QUANTITY_BREAKS):
+        self.breaks = sorted(((int(qty), Decimal(str(rate))) for qty, rate in breaks), reverse=True)
+
+    def rate_for(self, qty):
+        for min_qty, rate in self.breaks:
+            if qty >= min_qty:
+                return rate
+        return None
+
+    def discount(self, lines, total, customer_type, voucher):
+        amount = Decimal(0)
+        for _, qty, _, line_total in lines:
+            rate = self.rate_for(qty)
+            if rate:
+                amount += money(line_total * rate)
+        return ("Multi-buy", amount) if amount else None
+
+
+class TierDiscount:
+    kind = "tier"
+
+    def __init__(self, rates=None):
+        self.rates = {k: Decimal(str(v)) for k, v in (TIER_DISCOUNTS if rates is None else rates).items()}
+
+    def discount(self, lines, total, customer_type, voucher):
+        rate = self.rates.get(customer_type)
+        if not rate:
+            return None
+        return (f"{customer_type} Discount ({percent_label(rate)})", money(total * rate))
+
+
+class VoucherDiscount:
+    kind = "voucher"
+
+    def discount(self, lines, total, customer_type, voucher):
+        if voucher is None:
+            return None
+        return (f"Voucher {voucher.code} ({percent_label(voucher.rate)})", money(total * voucher.rate))
+
+
+class Quote:
+    # lines: [(product_id, qty, unit_price, line_total)], discounts: [(kind, label, amount)]
+    __slots__ = ("lines", "subtotal", "discounts", "total", "customer_type", "voucher")
+
+    def __init__(self, lines, subtotal, discounts, total, customer_type, voucher):
+        self.lines = lines
+        self.subtotal = subtotal
+        self.discounts = discounts
+        self.total = total
+        self.customer_type = customer_type
+        self.voucher = voucher
+
+    def discount(self, kind):
+        return sum((amount for k, _, amount in self.discounts if k == kind), Decimal(0)).quantize(CENT)
+
+    @property
+    def prices(self):
+        return {pid: unit for pid, _, unit, _ in self.lines}
+
+    def as_dict(self):
+        return {
+            "lines": [{"product_id": pid, "quantity": qty, "price": unit, "line_total": line_total}
+                      for pid, qty, unit, line_total in self.lines],
+            "subtotal": self.subtotal,
+            "discounts": [{"kind": k, "label": label, "amount": amount} for k, label, amount in self.discounts],
+            "total": self.total,
+            "customer_type": self.customer_type,
+            "voucher": self.voucher.code if self.voucher else None,
+        }
+
+
+class PricingEngine:
+    # `catalog` is a catalog.ProductCatalog (get(pid) -> row with a price, plus a generation
+    # that moves whenever the snapshot is reloaded or patched) or, for reports and tests, a plain {pid: price} dict,
+    # which is assumed not to change under the engine.
+    def __init__(self, catalog, tiers=None, breaks=QUANTITY_BREAKS, cache_size=512):
+        self.catalog = catalog
+        self.vouchers = {}
+        self.rules = [QuantityBreaks(breaks), TierDiscount(tiers), VoucherDiscount()]
+        self._quote = functools.lru_cache(maxsize=cache_size)(self._compute)
+
+    def load_vouchers(self, db):
+        # Runs on the DB worker; keeps the previous codes if the server is unreachable.
+        rows = db.get_vouchers()
+        if rows is None:
+            return False
+        self.set_vouchers(rows)
+        return True
+
+    def set_vouchers(self, rows):
+        self.vouchers = {rec['code'].lower(): Voucher.from_record(rec) for rec in rows}
+        self._quote.cache_clear()
+
+    def voucher(self, code):
+        return self.vouchers.get((code or "").strip().lower())
+
+    def price(self, cart, customer_type=None, voucher_code=None):
+        items = tuple(sorted((int(pid), int(qty)) for pid, qty in cart.items() if qty > 0))
+        code = (voucher_code or "").strip().lower() or None
+        return self._quote(getattr(self.catalog, "generation", None), items, customer_type or "Standard", code)
+
+    def price_many(self, orders):
+        # orders: iterable of (cart, customer_type, voucher_code); identical carts are priced once.
+        return [self.price(cart, customer_type, code) for cart, customer_type, code in orders]
+
+    def cache_info(self):
+        return self._quote.cache_info()
+
+    def _unit_price(self, pid):
+        prod = self.catalog.get(pid)
+        if prod is None:
+            return None
+        return money(prod if isinstance(prod, (int, float, Decimal, str)) else prod['price'])
+
+    def _compute(self, generation, items, customer_type, code):
+        lines = []
+        for pid, qty in items:
+            unit = self._unit_price(pid)
+            if unit is not None:
+                lines.append((pid, qty, unit, unit * qty))
+        subtotal = sum((line[3] for line in lines), Decimal(0)).quantize(CENT)
+        voucher = self.vouchers.get(code) if code else None
+        total = subtotal
+        discounts = []
+        for rule in self.rules:
+            found = rule.discount(lines, total, customer_type, voucher)
+            if found:
+                label, amount = found
+                amount = min(amount, total)
+                discounts.append((rule.kind, label, amount))
+                total -= amount
+        return Quote(tuple(lines), subtotal, tuple(discounts), total, customer_type, voucher)
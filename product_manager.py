@@ -1,6 +1,9 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import os
+from tree_sync import TreeviewSync
+from db_worker import WorkerBusyError, BUSY_RETRY_MS
+import catalog_io
 
 class ProductManager(tk.Frame):
     def __init__(self, parent, controller):
@@ -32,6 +35,12 @@ class ProductManager(tk.Frame):
         
         tk.Button(toolbar, text="↻ Refresh List", command=self.load_data,
                   bg="white", fg="#333").pack(side="right", padx=5)
+        tk.Button(toolbar, text="Export...", command=self.export_products,
+                  bg="white", fg="#333").pack(side="right", padx=5)
+        tk.Button(toolbar, text="Import...", command=self.import_products,
+                  bg="white", fg="#333").pack(side="right", padx=5)
+        self.lbl_transfer = tk.Label(toolbar, text="", bg="#f0f0f0", fg="#666")
+        self.lbl_transfer.pack(side="right", padx=10)
 
         table_frame = tk.Frame(self)
         table_frame.pack(fill="both", expand=True, padx=20, pady=(0, 20))
@@ -48,20 +57,80 @@ class ProductManager(tk.Frame):
             self.tree.heading(col, text=col)
             width = 300 if col == "Image Path" else 100
             self.tree.column(col, width=width)
-
-        self.load_data()
+        self.table = TreeviewSync(self.tree)
+        # Rows are loaded by refresh() when the page is first shown
 
     def refresh(self):
         self.load_data()
 
+    def import_products(self):
+        path = filedialog.askopenfilename(filetypes=[("CSV or JSONL", "*.csv *.jsonl"), ("All files", "*.*")])
+        if path:
+            self.run_transfer(catalog_io.import_file, path, "Imported")
+
+    def export_products(self):
+        path = filedialog.asksaveasfilename(defaultextension=".csv", initialfile="products.csv",
+                                            filetypes=[("CSV", "*.csv"), ("JSONL", "*.jsonl")])
+        if path:
+            self.run_transfer(catalog_io.export_file, path, "Exported")
+
+    def run_transfer(self, fn, path, verb):
+        # Runs on the worker; the progress callback only stores the count, the Tk side polls it.
+        self.transfer_rows = 0
+        def progress(report):
+            self.transfer_rows = report.written
+        try:
+            self.controller.worker.submit(fn, self.db, "products", path, progress=progress, key="products.transfer",
+                                          on_done=lambda r: self.on_transfer_done(r, verb),
+                                          on_error=self.on_transfer_error)
+        except WorkerBusyError as e:
+            self.on_transfer_error(e)
+            return
+        self.poll_transfer()
+
+    def poll_transfer(self):
+        if not self.controller.worker.is_pending("products.transfer"):
+            return
+        self.lbl_transfer.config(text=f"{self.transfer_rows:,} rows...")
+        self.after(200, self.poll_transfer)
+
+    def on_transfer_done(self, report, verb):
+        self.lbl_transfer.config(text=f"{verb} {report.written:,} rows ({report.rows_per_sec:,.0f}/s)")
+        if verb == "Imported":
+            self.controller.catalog.invalidate()
+            self.load_data()
+        if report.rejected:
+            lines = "\n".join(f"line {n}: {err}" for n, err in report.rejected[:10])
+            more = f"\n... and {len(report.rejected) - 10} more" if len(report.rejected) > 10 else ""
+            messagebox.showwarning("Product Import/Export", f"{report.summary()}\n\nRejected rows:\n{lines}{more}")
+
+    def on_transfer_error(self, error):
+        self.lbl_transfer.config(text="")
+        messagebox.showerror("Product Import/Export", f"Transfer failed: {error}")
+
     def load_data(self):
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-        products = self.db.get_all_products()
-        for p in products:
-            stock = int(p['stock_level'])
-            tag = 'low_stock' if stock < 5 else ''
-            self.tree.insert("", "end", values=(p['id'], p['name'], p['price'], p['stock_level'], p['image_path']), tags=(tag,))
+        try:
+            self.controller.worker.submit(self.db.get_all_products, key="products.load", on_done=self.populate,
+                                          on_error=lambda e: messagebox.showerror("Error", f"Could not load products: {e}"))
+        except WorkerBusyError:
+            self.after(BUSY_RETRY_MS, self.load_data)
+
+    def populate(self, products):
+        self.table.sync(self.product_row(p['id'], p['name'], p['price'], p['stock_level'], p['image_path']) for p in products)
+
+    def on_data_changed(self, entity, ids, records):
+        # Edits and sales from any till (POSApp.poll_changes): patch just those rows
+        if entity != "product":
+            return
+        if ids is None:
+            self.load_data()
+        else:
+            self.table.patch(ids, (self.product_row(p['id'], p['name'], p['price'], p['stock_level'], p['image_path'])
+                                   for p in records))
+
+    def product_row(self, pid, name, price, stock, image_path):
+        tag = 'low_stock' if int(stock) < 5 else ''
+        return str(pid), (pid, name, f"{float(price):.2f}", int(stock), image_path or ""), (tag,)
 
     def open_add_popup(self):
         self.popup_form("Add Product")
@@ -121,10 +190,17 @@ class ProductManager(tk.Frame):
                 img_path = self.lbl_image_path.cget("text")
                 if img_path == "No file selected": img_path = ""
                 if not name: raise ValueError("Name required")
-                if data: self.db.update_product(data[0], name, price, img_path, stock)
-                else: self.db.add_product(name, price, img_path, stock)
+                if data: pid = data[0] if self.db.update_product(data[0], name, price, img_path, stock) else None
+                else: pid = self.db.add_product(name, price, img_path, stock)
+                if not pid:
+                    messagebox.showerror("Error", "Could not save product.")
+                    return
                 popup.destroy()
-                self.load_data()
+                self.controller.catalog.invalidate()
+                # Patch just this row instead of reloading the table
+                self.table.upsert(*self.product_row(pid, name, price, stock, img_path))
+                self.tree.selection_set(str(pid))
+                self.tree.see(str(pid))
                 messagebox.showinfo("Success", "Product Saved")
             except ValueError:
                 messagebox.showerror("Error", "Invalid Input. Check numbers and fields.")
@@ -137,5 +213,6 @@ class ProductManager(tk.Frame):
         pid = item['values'][0]
         name = item['values'][1]
         if messagebox.askyesno("Confirm", f"Delete '{name}'?"):
-            self.db.delete_product(pid)
-            self.load_data()
\ No newline at end of file
+            if self.db.delete_product(pid):
+                self.controller.catalog.invalidate()
+                self.table.remove(pid)
\ No newline at end of file
@@ -0,0 +1,113 @@
+import uuid
+
+from db_worker import WorkerBusyError
+
+
+class CartReservations:
+    # Mirrors a CartModel into stock holds on the server (Database.reserve_stock): every
+    # changed line is one short background call, so the till never waits on it and no
+    # lock is held while the cashier takes payment. Adding goes the other way round
+    # (add()): the hold is taken first and the cart only grows once the server agrees.
+    # The server's answer wins: a line the shelf cannot cover is cut back to what is held
+    # and on_short(pid, available) is called. While the server is unreachable the cart
+    # is left alone; checkout still refuses to oversell.
+    #
+    # The DB worker runs calls in parallel, so each product has at most one reserve_stock
+    # call in flight; quantities asked for meanwhile are coalesced into the next call.
+    # That keeps the server's hold, and the cart, in the order the cashier clicked.
+    def __init__(self, cart, db, worker, on_short=None):
+        self.cart = cart
+        self.db = db
+        self.worker = worker
+        self.on_short = on_short
+        self.token = uuid.uuid4().hex
+        self._target = {}    # pid -> hold to ask for next (latest click or cart change)
+        self._busy = set()   # pids with a reserve_stock call in flight
+        self._waiting = {}   # pid -> on_done callbacks of add() calls not answered yet
+        self._held = {}      # pid -> quantity this class put in the cart, so that change needs no call
+        cart.subscribe(self.on_cart_changed)
+
+    def wanted(self, pid):
+        # What the line will be once pending calls are answered
+        return self._target.get(pid, self.cart.get(pid, 0))
+
+    def add(self, pid, units=1, on_done=None):
+        # Holds `units` more of a product, then puts them in the cart. on_done(ok, available)
+        # runs once the server has answered; available is None if it could not be asked,
+        # in which case the units are added anyway and checkout re-checks the stock.
+        qty = self.wanted(pid) + units
+        if on_done:
+            self._waiting.setdefault(pid, []).append(on_done)
+        self._request(pid, qty)
+
+    def on_cart_changed(self, pid, qty):
+        if pid is None:
+            # Emptied: paid for (checkout consumed the holds) or abandoned. Next cart, new token.
+            self._target, self._waiting, self._held = {}, {}, {}
+            old, self.token = self.token, uuid.uuid4().hex
+            self._submit(self.db.release_reservations, old)
+            return
+        if self._held.pop(pid, None) == qty:
+            return
+        # Changed by hand: clicks still waiting on the server are overtaken by this quantity
+        self._waiting.pop(pid, None)
+        self._request(pid, qty)
+
+    def _request(self, pid, qty):
+        self._target[pid] = qty
+        if pid not in self._busy:
+            self._send(pid)
+
+    def _send(self, pid):
+        token, qty = self.token, self._target[pid]
+        self._busy.add(pid)
+
+        def failed(error):
+            print(f"Stock reservation failed: {error}")
+            self._answered(token, pid, qty, None)
+
+        try:
+            self.worker.submit(self.db.reserve_stock, token, pid, qty,
+                               on_done=lambda result: self._answered(token, pid, qty, result), on_error=failed)
+        except WorkerBusyError:
+            self._answered(token, pid, qty, None)
+
+    def _answered(self, token, pid, qty, result):
+        self._busy.discard(pid)
+        if token != self.token:
+            # The cart was emptied while this was in flight; hand back what it may have held
+            if result and result['held']:
+                self._submit(self.db.release_reservations, token)
+            if pid in self._target:
+                self._send(pid)
+            return
+        if self._target.get(pid) != qty:
+            # Asked for something else meanwhile; only the latest quantity's answer counts
+            self._send(pid)
+            return
+        del self._target[pid]
+
+        ok = result is None or result['ok']
+        line = self.cart.get(pid, 0)
+        keep = qty if ok else result['held']
+        waiting = self._waiting.pop(pid, [])
+        # Grown by add(), or refused: the line becomes what the server actually holds
+        if (ok and qty > line) or (not ok and line != keep):
+            self._held[pid] = keep
+            self.cart[pid] = keep
+            if not ok and not waiting and self.on_short:
+                self.on_short(pid, result['available'])
+        for on_done in waiting:
+            on_done(ok, None if result is None else result['available'])
+
+    def release(self):
+        # Synchronous, for shutdown: hands this cart's holds back before the till closes.
+        if self.cart:
+            self.db.release_reservations(self.token)
+
+    def _submit(self, fn, *args, **kwargs):
+        try:
+            self.worker.submit(fn, *args, on_error=lambda e: print(f"Stock reservation failed: {e}"), **kwargs)
+        except WorkerBusyError:
+            # Holds lapse on their own (TTL) and checkout re-checks stock, so this is safe to drop.
+            pass
@@ -0,0 +1,165 @@
+import datetime
+import json
+import os
+import threading
+import uuid
+
+REPLAY_BATCH = 50
+# A sale the server rejects this many replays running is moved to the dead-letter file.
+REPLAY_ATTEMPTS = 5
+
+# Durable, append-only log of sales taken while the database server was
+# unreachable. Every sale is one JSON line, fsynced before the till shows the
+# receipt; replayed sales are marked with "ack" lines rather than rewritten in
+# place, so a crash at any point leaves either the sale or its ack on disk.
+# Once nothing is pending the file is compacted back to empty. Sales the server
+# keeps rejecting end up in a dead-letter file next to it, for the operator.
+
+
+class SalesJournal:
+    def __init__(self, path="sales_journal.jsonl"):
+        self.path = path
+        self._lock = threading.Lock()
+        # journal_ids of unreplayed sales, read from the file once and then kept up to date
+        # by append/acknowledge, so len() is cheap enough for the UI thread's replay timer
+        self._pending_ids = None
+        self.dead_letter_path = os.path.splitext(path)[0] + ".dead.jsonl"
+        self._failures = {}   # journal_id -> rejected replays so far (this session)
+
+    def append(self, customer_id, user_id, items, prices, total, names=None, payment_method=None):
+        # items: {product_id: qty}, prices: {product_id: unit price charged}, names: {product_id:
+        # name shown}. Returns the entry as written.
+        entry = {
+            "type": "sale",
+            "journal_id": f"J{datetime.datetime.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}",
+            "ts": datetime.datetime.now().isoformat(sep=" ", timespec="seconds"),
+            "customer_id": customer_id,
+            "user_id": user_id,
+            "items": {str(int(pid)): int(qty) for pid, qty in items.items()},
+            "prices": {str(int(pid)): round(float(prices[pid]), 2) for pid in items},
+            "total": round(float(total), 2),
+            "names": {str(int(pid)): names[pid] for pid in items if names and pid in names},
+            "payment_method": payment_method,
+        }
+        self._write([entry])
+        with self._lock:
+            if self._pending_ids is not None:
+                self._pending_ids.add(entry["journal_id"])
+        return entry
+
+    def _write(self, records, path=None):
+        with self._lock:
+            with open(path or self.path, "a", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return []
+        records = []
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # Only the last line can be torn (crash mid-write); that sale never completed.
+                    continue
+        return records
+
+    def pending(self):
+        # Unreplayed sales, oldest first (file order is sale order).
+        with self._lock:
+            records = self._read()
+            acked = {r["journal_id"] for r in records if r.get("type") == "ack"}
+            pending = [r for r in records if r.get("type") == "sale" and r["journal_id"] not in acked]
+            self._pending_ids = {r["journal_id"] for r in pending}
+        return pending
+
+    def get(self, journal_id):
+        for record in self.pending():
+            if record["journal_id"] == journal_id:
+                return record
+        return None
+
+    def __len__(self):
+        if self._pending_ids is None:
+            self.pending()
+        return len(self._pending_ids)
+
+    def acknowledge(self, journal_ids):
+        if not journal_ids:
+            return
+        self._write([{"type": "ack", "journal_id": jid} for jid in journal_ids])
+        with self._lock:
+            if self._pending_ids is not None:
+                self._pending_ids.difference_update(journal_ids)
+            for jid in journal_ids:
+                self._failures.pop(jid, None)
+        if not len(self):
+            self.compact()
+
+    def record_failure(self, journal_id):
+        # Counts a replay the server rejected; returns the count so far.
+        with self._lock:
+            self._failures[journal_id] = self._failures.get(journal_id, 0) + 1
+            return self._failures[journal_id]
+
+    def dead_letter(self, entry, attempts):
+        # Takes a sale out of the queue: written (fsynced) to the dead-letter file first,
+        # then acked here, so a crash in between leaves it in both rather than neither.
+        moved = datetime.datetime.now().isoformat(sep=" ", timespec="seconds")
+        self._write([dict(entry, type="dead", attempts=attempts, moved=moved)], self.dead_letter_path)
+        self.acknowledge([entry["journal_id"]])
+
+    def compact(self):
+        # Rewrites the file with just the pending sales (atomic rename).
+        with self._lock:
+            records = self._read()
+            acked = {r["journal_id"] for r in records if r.get("type") == "ack"}
+            keep = [r for r in records if r.get("type") == "sale" and r["journal_id"] not in acked]
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for record in keep:
+                    f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+
+
+def replay_pending(db, journal, batch_size=REPLAY_BATCH, max_attempts=REPLAY_ATTEMPTS):
+    # Pushes queued sales to the server, one transaction per batch, oldest first. Safe to
+    # call repeatedly. While the server is down or busy the rest stays queued for the next
+    # call. A batch the server rejects is retried one sale at a time to find the bad one;
+    # that sale holds the queue (stock is consumed in sale order) until it has been
+    # rejected max_attempts times, then it goes to the dead-letter file and replay goes on.
+    summary = {"replayed": 0, "duplicates": 0, "shortfalls": [], "dead_letters": [], "remaining": 0}
+    pending = journal.pending()
+    for start in range(0, len(pending), batch_size):
+        if not _replay_batch(db, journal, pending[start:start + batch_size], max_attempts, summary):
+            break
+    summary["remaining"] = len(journal)
+    return summary
+
+
+def _replay_batch(db, journal, batch, max_attempts, summary):
+    # True if replay can go on past this batch.
+    result = db.replay_sales(batch)
+    if result:
+        journal.acknowledge(list(result["applied"]) + result["duplicates"])
+        summary["replayed"] += len(result["applied"])
+        summary["duplicates"] += len(result["duplicates"])
+        summary["shortfalls"] += result["shortfalls"]
+        return True
+    if result is None:
+        return False
+    if len(batch) > 1:
+        return all(_replay_batch(db, journal, [entry], max_attempts, summary) for entry in batch)
+    entry = batch[0]
+    attempts = journal.record_failure(entry["journal_id"])
+    if attempts < max_attempts:
+        return False
+    journal.dead_letter(entry, attempts)
+    summary["dead_letters"].append(entry["journal_id"])
+    return True
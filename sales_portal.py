@@ -1,14 +1,64 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from PIL import Image, ImageTk
-import os
+from thumbnail_cache import ThumbnailCache
+from db_worker import WorkerBusyError, BUSY_RETRY_MS
+
+GRID_COLUMNS = 4
+ROW_HEIGHT = 320
+CARD_PAD = 15
+OVERSCAN_ROWS = 1
+SEARCH_DEBOUNCE_MS = 150
+
+def visible_range(top, height, count, columns=GRID_COLUMNS, row_height=ROW_HEIGHT, overscan=OVERSCAN_ROWS):
+    # Indexes of the products whose cards fall in (or overscan rows around) the viewport
+    first_row = max(0, int(top // row_height) - overscan)
+    last_row = int((top + height) // row_height) + overscan
+    return range(min(count, first_row * columns), min(count, (last_row + 1) * columns))
+
+class ProductCard(tk.Frame):
+    # One store card; show() repaints it for another product so the grid can recycle it.
+    def __init__(self, parent, on_add):
+        super().__init__(parent, bg="#d9d9d9", padx=1, pady=1)
+        self.product = None
+        self.window = None
+        self.on_add = on_add
+        card = tk.Frame(self, bg="white", padx=10, pady=10)
+        card.pack(fill="both", expand=True)
+        self.img_label = tk.Label(card, bg="white")
+        self.img_label.pack(pady=(0, 10), anchor="center")
+        self.name_label = tk.Label(card, font=("Helvetica", 11, "bold"), bg="white", wraplength=180, justify="center")
+        self.name_label.pack(anchor="center", fill="x")
+        self.price_label = tk.Label(card, font=("Helvetica", 11, "bold"), fg="#2E7D32", bg="white")
+        self.price_label.pack(anchor="center", pady=2)
+        self.stock_label = tk.Label(card, font=("Helvetica", 9), bg="white")
+        self.stock_label.pack(anchor="center", pady=(0, 10))
+        self.add_btn = tk.Button(card, command=lambda: self.on_add(self.product),
+                                 font=("Helvetica", 10, "bold"), relief="flat", pady=5)
+        self.add_btn.pack(fill="x", padx=5)
+
+    def show(self, product, image):
+        self.product = product
+        self.img_label.config(image=image)
+        self.img_label.image = image
+        self.name_label.config(text=product['name'])
+        self.price_label.config(text=f"${product['price']}")
+
+        stock = product['stock_level']
+        in_stock = stock > 0
+        self.stock_label.config(text=f"{stock} in stock" if in_stock else "Out of Stock",
+                                fg="#757575" if in_stock else "#D32F2F")
+        self.add_btn.config(text="Add to Cart" if in_stock else "Unavailable",
+                            state="normal" if in_stock else "disabled",
+                            bg="#2196F3" if in_stock else "#E0E0E0",
+                            fg="white" if in_stock else "#9E9E9E",
+                            cursor="hand2" if in_stock else "arrow")
 
 class StorePage(tk.Frame):
     def __init__(self, parent, controller):
         super().__init__(parent)
         self.controller = controller
         self.configure(bg="#f0f0f0")
-        self.image_cache = {} 
+        self.thumbnails = ThumbnailCache(size=(160, 130))
         
         # Navbar
         navbar = tk.Frame(self, bg="#2196F3", height=60, pady=10)
@@ -49,29 +99,44 @@ class StorePage(tk.Frame):
         search_entry = tk.Entry(search_container, textvariable=self.search_var, width=40, font=("Helvetica", 12), bd=2, relief="groove")
         search_entry.pack(side="left", padx=10, ipady=3)
         search_entry.bind("<Return>", lambda e: self.refresh(self.search_var.get())) 
+        self.search_var.trace_add("write", lambda *args: self.schedule_search())
+        self.search_after_id = None
         tk.Button(search_container, text="Search", command=lambda: self.refresh(self.search_var.get()),
                   bg="#2196F3", fg="white", font=("Helvetica", 10, "bold"), width=10).pack(side="left", padx=2)
         tk.Button(search_container, text="Clear", command=lambda: self.clear_search(),
                   bg="#E0E0E0", fg="black", font=("Helvetica", 10), width=8).pack(side="left", padx=2)
 
-        # Grid
+        # Grid (virtualized: only rows near the viewport get a card, cards are recycled)
         grid_container = tk.Frame(self, bg="#f0f0f0")
         grid_container.pack(fill="both", expand=True, padx=20, pady=20)
         self.canvas = tk.Canvas(grid_container, bg="#f0f0f0", highlightthickness=0)
         self.scrollbar = ttk.Scrollbar(grid_container, orient="vertical", command=self.canvas.yview)
-        self.scroll_frame = tk.Frame(self.canvas, bg="#f0f0f0")
-        self.scroll_frame.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
-        self.canvas_window = self.canvas.create_window((0, 0), window=self.scroll_frame, anchor="nw")
-        
-        def on_canvas_configure(event):
-            self.canvas.itemconfig(self.canvas_window, width=event.width)
-        self.canvas.bind("<Configure>", on_canvas_configure)
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+        self.canvas.configure(yscrollcommand=self.on_grid_scroll)
+        self.canvas.bind("<Configure>", lambda e: self.layout_grid())
         self.canvas.pack(side="left", fill="both", expand=True)
         self.scrollbar.pack(side="right", fill="y")
+        self.grid_message = self.canvas.create_text(0, 50, text="", anchor="n", font=("Helvetica", 14), fill="#666")
+
+        self.search_query = ""
+        self.products = []
+        self.visible_cards = {}
+        self.spare_cards = []
+        self.render_pending = False
 
         self.toast_label = tk.Label(self, text="", bg="#333", fg="white", font=("Helvetica", 10), padx=20, pady=10, relief="flat")
 
+    def schedule_search(self):
+        # Search-as-you-type: filter the in-memory index once typing pauses.
+        if self.search_after_id:
+            self.after_cancel(self.search_after_id)
+        self.search_after_id = self.after(SEARCH_DEBOUNCE_MS, self.run_search)
+
+    def run_search(self):
+        self.search_after_id = None
+        if self.search_var.get() != self.search_query:
+            self.search_query = self.search_var.get()
+            self.show_search_results()
+
     def clear_search(self):
         self.search_var.set("")
         self.refresh()
@@ -87,87 +152,135 @@ class StorePage(tk.Frame):
         else:
             self.back_btn.pack_forget()
 
-        for widget in self.scroll_frame.winfo_children():
-            widget.destroy()
-        self.image_cache = {}
+        if self.search_after_id:
+            self.after_cancel(self.search_after_id)
+            self.search_after_id = None
+        self.search_query = search_query
+        catalog = self.controller.catalog
+        if catalog.loaded:
+            self.show_search_results()
+        else:
+            self.show_products([], "Loading products...")
+        self.probe_catalog(self.show_search_results)
 
+    def probe_catalog(self, on_changed):
+        # Probe for catalog changes in the background; a newer probe supersedes this one.
+        catalog = self.controller.catalog
         try:
-            all_products = self.controller.db.get_all_products()
-        except Exception as e:
-            tk.Label(self.scroll_frame, text=f"Database Error: {e}", fg="red", bg="#f0f0f0").pack(pady=20)
-            return
+            self.controller.worker.submit(catalog.refresh_if_stale, key="store.catalog",
+                                          on_done=lambda changed: changed and on_changed(),
+                                          on_error=lambda e: self.show_products([], f"Database Error: {e}", "red"))
+        except WorkerBusyError:
+            if not catalog.loaded:
+                self.show_products([], "Till is busy, retrying...")
+            self.after(BUSY_RETRY_MS, lambda: self.probe_catalog(on_changed))
 
-        if search_query:
-            products = [p for p in all_products if search_query.lower() in p['name'].lower()]
+    def show_search_results(self):
+        catalog = self.controller.catalog
+        if self.search_query.strip():
+            products = catalog.search(self.search_query)
         else:
-            products = all_products
+            products = catalog.snapshot()
+
+        self.show_products(products, "No products found.")
 
-        if not products:
-            tk.Label(self.scroll_frame, text="No products found.", font=("Helvetica", 14), bg="#f0f0f0", fg="#666").pack(pady=50)
+    def on_data_changed(self, entity, ids, records):
+        # Sales and edits from other tills (POSApp.poll_changes); the catalog is already patched
+        catalog = self.controller.catalog
+        if entity != "product" or not catalog.loaded:
             return
+        if ids is None:
+            self.probe_catalog(self.update_results)
+        else:
+            self.update_results({int(pid) for pid in ids})
 
-        columns = 4
-        for i in range(columns):
-            self.scroll_frame.columnconfigure(i, weight=1)
+    def update_results(self, ids=None):
+        # Like show_search_results but keeps the scroll position; if the same products are
+        # listed, only the visible cards for `ids` are repainted.
+        catalog = self.controller.catalog
+        if self.search_query.strip():
+            products = catalog.search(self.search_query)
+        else:
+            products = catalog.snapshot()
+        same = ids is not None and [p['id'] for p in products] == [p['id'] for p in self.products]
+        self.products = products
+        if not same:
+            self.canvas.itemconfigure(self.grid_message, text="" if products else "No products found.", fill="#666")
+            self.layout_grid()
+            return
+        for index, card in self.visible_cards.items():
+            if card.product['id'] in ids:
+                card.show(products[index], self.thumbnails.get(products[index].get('image_path', '')))
 
-        for index, prod in enumerate(products):
-            row = index // columns
-            col = index % columns
-            self.create_product_card(prod, row, col)
+    def show_products(self, products, empty_text="", empty_color="#666"):
+        self.products = products
+        self.canvas.itemconfigure(self.grid_message, text="" if products else empty_text, fill=empty_color)
+        self.canvas.yview_moveto(0)
+        self.layout_grid()
 
-    def create_product_card(self, product, r, c):
-        card_border = tk.Frame(self.scroll_frame, bg="#d9d9d9", padx=1, pady=1)
-        card_border.grid(row=r, column=c, padx=15, pady=15, sticky="ew")
-        card = tk.Frame(card_border, bg="white", padx=10, pady=10)
-        card.pack(fill="both", expand=True)
+    def layout_grid(self):
+        width = max(self.canvas.winfo_width(), 1)
+        rows = -(-len(self.products) // GRID_COLUMNS)
+        self.canvas.configure(scrollregion=(0, 0, width, max(rows * ROW_HEIGHT, self.canvas.winfo_height())))
+        self.canvas.coords(self.grid_message, width / 2, 50)
+        for card in self.visible_cards.values():
+            self.canvas.itemconfigure(card.window, state="hidden")
+            self.spare_cards.append(card)
+        self.visible_cards = {}
+        self.render_visible()
 
-        img_path = product.get('image_path', '')
-        tk_img = None
-        try:
-            if img_path:
-                if not os.path.isabs(img_path):
-                    img_path = os.path.join(os.getcwd(), img_path)
-                if os.path.exists(img_path):
-                    pil_img = Image.open(img_path)
-                    pil_img = pil_img.resize((160, 130), Image.Resampling.LANCZOS)
-                    tk_img = ImageTk.PhotoImage(pil_img)
-            if tk_img is None:
-                pil_img = Image.new('RGB', (160, 130), color="#F5F5F5")
-                tk_img = ImageTk.PhotoImage(pil_img)
-            self.image_cache[product['id']] = tk_img
-            tk.Label(card, image=tk_img, bg="white").pack(pady=(0, 10), anchor="center")
-        except Exception as e:
-            tk.Label(card, text="[No Image]", bg="#eee", height=6, width=20).pack(pady=(0, 10))
-
-        tk.Label(card, text=product['name'], font=("Helvetica", 11, "bold"), bg="white", wraplength=180, justify="center").pack(anchor="center", fill="x")
-        tk.Label(card, text=f"${product['price']}", font=("Helvetica", 11, "bold"), fg="#2E7D32", bg="white").pack(anchor="center", pady=2)
+    def on_grid_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if not self.render_pending:
+            self.render_pending = True
+            self.after_idle(self.render_visible)
 
-        stock = product['stock_level']
-        stock_text = f"{stock} in stock" if stock > 0 else "Out of Stock"
-        stock_color = "#757575" if stock > 0 else "#D32F2F"
-        tk.Label(card, text=stock_text, font=("Helvetica", 9), fg=stock_color, bg="white").pack(anchor="center", pady=(0, 10))
+    def render_visible(self):
+        self.render_pending = False
+        if not self.products:
+            return
+        top = self.canvas.canvasy(0)
+        height = max(self.canvas.winfo_height(), ROW_HEIGHT)
+        wanted = visible_range(top, height, len(self.products))
 
-        state = "normal" if stock > 0 else "disabled"
-        btn_text = "Add to Cart" if stock > 0 else "Unavailable"
-        
-        add_btn = tk.Button(card, text=btn_text, state=state,
-                            command=lambda: self.add_to_cart(product),
-                            bg="#2196F3" if stock > 0 else "#E0E0E0", 
-                            fg="white" if stock > 0 else "#9E9E9E", 
-                            font=("Helvetica", 10, "bold"), relief="flat", 
-                            cursor="hand2" if stock > 0 else "arrow", pady=5)
-        add_btn.pack(fill="x", padx=5)
+        for index in [i for i in self.visible_cards if i not in wanted]:
+            card = self.visible_cards.pop(index)
+            self.canvas.itemconfigure(card.window, state="hidden")
+            self.spare_cards.append(card)
+
+        cell_width = max(self.canvas.winfo_width(), 1) / GRID_COLUMNS
+        for index in wanted:
+            if index in self.visible_cards:
+                continue
+            card = self.spare_cards.pop() if self.spare_cards else self.create_product_card()
+            card.show(self.products[index], self.thumbnails.get(self.products[index].get('image_path', '')))
+            row, col = divmod(index, GRID_COLUMNS)
+            self.canvas.coords(card.window, col * cell_width + CARD_PAD, row * ROW_HEIGHT + CARD_PAD)
+            self.canvas.itemconfigure(card.window, state="normal",
+                                      width=max(cell_width - 2 * CARD_PAD, 1), height=ROW_HEIGHT - 2 * CARD_PAD)
+            self.visible_cards[index] = card
+
+    def create_product_card(self):
+        card = ProductCard(self.canvas, on_add=self.add_to_cart)
+        card.window = self.canvas.create_window(0, 0, window=card, anchor="nw", state="hidden")
+        return card
 
     def add_to_cart(self, product):
-        pid = product['id']
-        current_stock = product['stock_level']
-        in_cart = self.controller.cart.get(pid, 0)
-        if in_cart + 1 <= current_stock:
-            self.controller.cart[pid] = in_cart + 1
-            self.update_cart_count()
+        # The cached stock level is only a first check: the unit goes in the cart (and the
+        # toast shows) once the server has held it against other tills' carts.
+        reservations = self.controller.reservations
+        if reservations.wanted(product['id']) + 1 > product['stock_level']:
+            messagebox.showwarning("Stock Limit", "Cannot add more than available stock.")
+            return
+        reservations.add(product['id'], 1, on_done=lambda ok, available: self.on_added(product, ok, available))
+
+    def on_added(self, product, ok, available):
+        self.update_cart_count()
+        if ok:
             self.show_toast(f"Added 1 {product['name']}")
         else:
-            messagebox.showwarning("Stock Limit", "Cannot add more than available stock.")
+            messagebox.showwarning("Stock Limit", f"Cannot add more {product['name']}: {max(available, 0)} free, "
+                                                  f"the rest is held by other carts.")
 
     def show_toast(self, message):
         self.toast_label.config(text=message, bg="#388E3C")
@@ -0,0 +1,148 @@
+import bisect
+import heapq
+import re
+
+_TOKEN_RE = re.compile(r"\w+")
+# Shorter queries only match word prefixes; a 1-2 char substring hits most of a big catalog.
+MIN_SUBSTRING_LEN = 3
+
+
+def normalize(text):
+    return " ".join(str(text).lower().split())
+
+
+class ProductSearchIndex:
+    # In-memory search over product text (name by default; pass more fields,
+    # e.g. ("name", "sku", "category"), once the catalog carries them).
+    #
+    # Two structures back it:
+    #   * a sorted token list + postings, for order-free word-prefix matches
+    #     ("spea jbl" -> "JBL Speaker") via bisect;
+    #   * one newline-joined blob of every document, for plain substring
+    #     matches ("book" -> "MacBook Pro") using str.find at C speed.
+    def __init__(self, fields=("name",)):
+        self.fields = tuple(fields)
+        self._text = {}
+        self._postings = {}
+        self._tokens = []
+        self._blob = None
+        self._blob_ids = []
+        self._blob_offsets = []
+        self._order = {}
+
+    def __len__(self):
+        return len(self._text)
+
+    def rebuild(self, rows):
+        self._text = {}
+        self._postings = {}
+        for row in rows:
+            self._index(row)
+        self._tokens = sorted(self._postings)
+        # Tie-break order within a rank tier: shorter names first, then alphabetical.
+        ranked = sorted(self._text, key=lambda pid: (len(self._text[pid]), self._text[pid], pid))
+        self._order = {pid: i for i, pid in enumerate(ranked)}
+        self._build_blob()
+
+    def add(self, row):
+        if row.id in self._text:
+            self.remove(row.id)
+        for token in self._index(row):
+            bisect.insort(self._tokens, token)
+        # Incremental additions sort after existing products until the next rebuild().
+        self._order.setdefault(row.id, len(self._order))
+        self._blob = None
+
+    def remove(self, pid):
+        text = self._text.pop(pid, None)
+        if text is None:
+            return
+        for token in set(_TOKEN_RE.findall(text)):
+            ids = self._postings[token]
+            ids.discard(pid)
+            if not ids:
+                del self._postings[token]
+                del self._tokens[bisect.bisect_left(self._tokens, token)]
+        self._blob = None
+
+    def _index(self, row):
+        # Returns tokens seen for the first time so add() can keep _tokens sorted.
+        text = normalize(" ".join(str(row.get(f) or "") for f in self.fields))
+        self._text[row.id] = text
+        new_tokens = []
+        for token in set(_TOKEN_RE.findall(text)):
+            ids = self._postings.get(token)
+            if ids is None:
+                ids = self._postings[token] = set()
+                new_tokens.append(token)
+            ids.add(row.id)
+        return new_tokens
+
+    def search(self, query, limit=None):
+        q = normalize(query)
+        if not q:
+            return []
+
+        prefix_ids = None
+        for token in _TOKEN_RE.findall(q):
+            ids = self._prefix_ids(token)
+            prefix_ids = ids if prefix_ids is None else prefix_ids & ids
+            if not prefix_ids:
+                break
+        prefix_ids = prefix_ids or set()
+        if self._blob is None:
+            self._build_blob()
+        candidates = prefix_ids
+        if len(q) >= MIN_SUBSTRING_LEN:
+            candidates = candidates | self._substring_ids(q)
+
+        key = lambda pid: self._rank_key(pid, q, prefix_ids)
+        if limit is not None and len(candidates) > limit:
+            return heapq.nsmallest(limit, candidates, key=key)
+        return sorted(candidates, key=key)
+
+    def _prefix_ids(self, prefix):
+        ids = set()
+        tokens = self._tokens
+        i = bisect.bisect_left(tokens, prefix)
+        while i < len(tokens) and tokens[i].startswith(prefix):
+            ids |= self._postings[tokens[i]]
+            i += 1
+        return ids
+
+    def _substring_ids(self, q):
+        blob, offsets, blob_ids = self._blob, self._blob_offsets, self._blob_ids
+        ids = set()
+        pos = blob.find(q)
+        while pos >= 0:
+            k = bisect.bisect_right(offsets, pos) - 1
+            ids.add(blob_ids[k])
+            # Skip the rest of this document; one hit per product is enough.
+            pos = blob.find(q, offsets[k + 1]) if k + 1 < len(offsets) else -1
+        return ids
+
+    def _build_blob(self):
+        ids, offsets, parts = [], [], []
+        pos = 0
+        for pid, text in self._text.items():
+            ids.append(pid)
+            offsets.append(pos)
+            parts.append(text)
+            pos += len(text) + 1
+        self._blob = "\n".join(parts)
+        self._blob_ids = ids
+        self._blob_offsets = offsets
+
+    def _rank_key(self, pid, q, prefix_ids):
+        text = self._text[pid]
+        if text == q:
+            tier = 0
+        elif text.startswith(q):
+            tier = 1
+        elif (" " + q) in text:
+            tier = 2
+        elif pid in prefix_ids:
+            tier = 3
+        else:
+            tier = 4
+        return (tier, self._order[pid])
@@ -1,10 +1,48 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
+from db_worker import WorkerBusyError, BUSY_RETRY_MS
+
+class CartRow:
+    # Widgets for one cart line; update() only touches the quantity and subtotal labels.
+    def __init__(self, page, table, row, pid, prod, qty):
+        self.price = float(prod['price'])
+        qty_frame = tk.Frame(table)
+        self.lbl_qty = tk.Label(qty_frame, text=str(qty), width=4)
+        self.lbl_subtotal = tk.Label(table, text="", font=("bold"))
+        self.widgets = [
+            tk.Label(table, text=prod['name'], font=("Helvetica", 11)),
+            tk.Label(table, text=f"${self.price:.2f}"),
+            qty_frame,
+            self.lbl_subtotal,
+            tk.Button(table, text="Remove", fg="white", bg="#ff4444", font=("Helvetica", 9), command=lambda: page.update_qty(pid, -999)),
+        ]
+        for col, widget in enumerate(self.widgets):
+            widget.grid(row=row, column=col, pady=10)
+        tk.Button(qty_frame, text="-", width=2, command=lambda: page.update_qty(pid, -1)).pack(side="left")
+        self.lbl_qty.pack(side="left", padx=5)
+        self.btn_plus = tk.Button(qty_frame, text="+", width=2, command=lambda: page.update_qty(pid, 1))
+        self.btn_plus.pack(side="left")
+        self.update(qty)
+
+    def update(self, qty):
+        self.lbl_qty.config(text=str(qty))
+        self.lbl_subtotal.config(text=f"${self.price * qty:.2f}")
+
+    def set_addable(self, addable):
+        self.btn_plus.config(state="normal" if addable else "disabled")
+
+    def destroy(self):
+        for widget in self.widgets:
+            widget.destroy()
 
 class CartPage(tk.Frame):
     def __init__(self, parent, controller):
         super().__init__(parent)
         self.controller = controller
+        self.rows = {}
+        self.next_row = 1
+        self.table = None
+        self.lbl_total = None
         tk.Label(self, text="Shopping Cart", font=("Helvetica", 18, "bold")).pack(pady=20)
         self.list_frame = tk.Frame(self)
         self.list_frame.pack(fill="both", expand=True, padx=50)
@@ -12,49 +50,116 @@ class CartPage(tk.Frame):
         btn_frame.pack(pady=20)
         tk.Button(btn_frame, text="← Back to Store", command=lambda: controller.show_frame("StorePage"), font=("Helvetica", 10)).pack(side="left", padx=10)
         tk.Button(btn_frame, text="Proceed to Checkout →", command=lambda: controller.show_frame("CheckoutPage"), bg="#4CAF50", fg="white", font=("Helvetica", 11, "bold")).pack(side="left", padx=10)
+        # Quantity changes patch single rows; see on_cart_changed
+        controller.cart.subscribe(self.on_cart_changed)
+        self.bind("<Destroy>", self.on_destroy)
+
+    def on_destroy(self, event):
+        if event.widget is self:
+            self.controller.cart.unsubscribe(self.on_cart_changed)
 
     def refresh(self):
+        catalog = self.controller.catalog
+        if catalog.loaded:
+            self.render()
+        else:
+            self.show_message("Loading cart...")
+        self.probe_catalog()
+
+    def probe_catalog(self):
+        catalog = self.controller.catalog
+        try:
+            self.controller.worker.submit(catalog.refresh_if_stale, key="cart.catalog",
+                                          on_done=lambda changed: changed and self.render(),
+                                          on_error=lambda e: self.show_message(f"Database Error: {e}", "red"))
+        except WorkerBusyError:
+            if not catalog.loaded:
+                self.show_message("Till is busy, retrying...")
+            self.after(BUSY_RETRY_MS, self.probe_catalog)
+
+    def show_message(self, text, color="#666"):
         for widget in self.list_frame.winfo_children():
             widget.destroy()
+        self.rows = {}
+        self.table = self.lbl_total = None
+        tk.Label(self.list_frame, text=text, font=("Helvetica", 14), fg=color).pack(pady=50)
+
+    def render(self):
+        # Full rebuild: only on page entry or when the catalog itself changed
         if not self.controller.cart:
-            tk.Label(self.list_frame, text="Your cart is empty.", font=("Helvetica", 14), fg="#666").pack(pady=50)
+            self.show_message("Your cart is empty.")
             return
-        products = self.controller.db.get_all_products()
-        total_val = 0.0
+        for widget in self.list_frame.winfo_children():
+            widget.destroy()
+        self.rows = {}
+        self.table = tk.Frame(self.list_frame)
+        self.table.pack(fill="x")
         headers = ["Product", "Price", "Quantity", "Subtotal", "Action"]
         for i in range(5):
-            self.list_frame.columnconfigure(i, weight=1)
+            self.table.columnconfigure(i, weight=1)
         for i, h in enumerate(headers):
-            tk.Label(self.list_frame, text=h, font=("Helvetica", 10, "bold"), bg="#ddd", padx=10, pady=5).grid(row=0, column=i, sticky="ew")
-        row_idx = 1
+            tk.Label(self.table, text=h, font=("Helvetica", 10, "bold"), bg="#ddd", padx=10, pady=5).grid(row=0, column=i, sticky="ew")
+        self.next_row = 1
         for pid, qty in self.controller.cart.items():
-            prod = next((p for p in products if p['id'] == int(pid)), None)
-            if prod:
-                price = float(prod['price'])
-                subtotal = price * qty
-                total_val += subtotal
-                tk.Label(self.list_frame, text=prod['name'], font=("Helvetica", 11)).grid(row=row_idx, column=0, pady=10)
-                tk.Label(self.list_frame, text=f"${price:.2f}").grid(row=row_idx, column=1, pady=10)
-                qty_frame = tk.Frame(self.list_frame)
-                qty_frame.grid(row=row_idx, column=2, pady=10)
-                tk.Button(qty_frame, text="-", width=2, command=lambda p=pid: self.update_qty(p, -1)).pack(side="left")
-                tk.Label(qty_frame, text=str(qty), width=4).pack(side="left", padx=5)
-                tk.Button(qty_frame, text="+", width=2, command=lambda p=pid, s=prod['stock_level']: self.update_qty(p, 1, s)).pack(side="left")
-                tk.Label(self.list_frame, text=f"${subtotal:.2f}", font=("bold")).grid(row=row_idx, column=3, pady=10)
-                tk.Button(self.list_frame, text="Remove", fg="white", bg="#ff4444", font=("Helvetica", 9), command=lambda p=pid: self.update_qty(p, -999)).grid(row=row_idx, column=4, pady=10)
-                row_idx += 1
-        tk.Label(self.list_frame, text="", bg="#333").grid(row=row_idx, column=0, columnspan=5, sticky="ew", pady=(20,0)) 
-        row_idx += 1
-        tk.Label(self.list_frame, text=f"Grand Total: ${total_val:.2f}", font=("Helvetica", 16, "bold"), fg="#2196F3").grid(row=row_idx, column=3, columnspan=2, pady=20)
-
-    def update_qty(self, pid, change, max_stock=1000):
-        current_qty = self.controller.cart.get(pid, 0)
-        new_qty = current_qty + change
-        if change == -999 or new_qty <= 0:
-            del self.controller.cart[pid]
-        elif new_qty > max_stock:
-            messagebox.showwarning("Stock Limit", "Maximum stock reached.")
+            self.add_row(pid, qty)
+        tk.Label(self.list_frame, text="", bg="#333").pack(fill="x", pady=(20, 0))
+        self.lbl_total = tk.Label(self.list_frame, text="", font=("Helvetica", 16, "bold"), fg="#2196F3")
+        self.lbl_total.pack(anchor="e", pady=20)
+        self.update_total()
+
+    def add_row(self, pid, qty):
+        prod = self.controller.catalog.get(pid)
+        if prod:
+            self.rows[pid] = CartRow(self, self.table, self.next_row, pid, prod, qty)
+            self.next_row += 1
+
+    def update_total(self):
+        cart = self.controller.cart
+        total_val = sum(row.price * cart[pid] for pid, row in self.rows.items() if pid in cart)
+        self.lbl_total.config(text=f"Grand Total: ${total_val:.2f}")
+
+    def on_cart_changed(self, pid, qty):
+        if pid is None or self.table is None:
+            # Cleared, or the first line going into an empty cart
+            self.render()
             return
+        row = self.rows.get(pid)
+        if qty == 0:
+            if row:
+                row.destroy()
+                del self.rows[pid]
+            if not self.controller.cart:
+                self.show_message("Your cart is empty.")
+                return
+        elif row:
+            row.update(qty)
+            # Fewer in this cart frees units; the server still has the last word on "+"
+            row.set_addable(True)
         else:
-            self.controller.cart[pid] = new_qty
-        self.refresh()
\ No newline at end of file
+            self.add_row(pid, qty)
+        self.update_total()
+
+    def update_qty(self, pid, change):
+        cart = self.controller.cart
+        reservations = self.controller.reservations
+        new_qty = cart.get(pid, 0) + change
+        if change == -999 or new_qty <= 0:
+            cart.pop(pid, None)
+        elif change > 0:
+            # Stock as of the latest catalog patch is a first check; the line only grows once
+            # the server holds the extra units (see CartReservations.add)
+            prod = self.controller.catalog.get(pid)
+            if prod is None or reservations.wanted(pid) + change > prod['stock_level']:
+                messagebox.showwarning("Stock Limit", "Maximum stock reached.")
+            else:
+                reservations.add(pid, change, on_done=lambda ok, available: self.on_added(pid, ok, available))
+        else:
+            cart[pid] = new_qty
+
+    def on_added(self, pid, ok, available):
+        row = self.rows.get(pid)
+        if row and available is not None:
+            row.set_addable(ok and available > 0)
+        if not ok:
+            messagebox.showwarning("Stock Limit", f"Cannot add more: {max(available, 0)} free, "
+                                                  f"the rest is held by other carts.")
@@ -0,0 +1,97 @@
+import time
+
+STARTED = time.perf_counter()
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# Cold-start benchmark for the till: time-to-login-screen and time-to-first-sale.
+# Every run is a fresh interpreter on a throwaway SQLite database, so imports,
+# schema creation, the first catalog load and page construction are all counted.
+# Needs a display (use xvfb-run on a headless box).
+#
+#   python startup_bench.py --runs 10 --json startup.json
+#
+# The first sale is scripted through the real pages: sign in as staff, add the
+# first product from the store, pay by EFTPOS for the first customer offered.
+
+STAFF_LOGIN = ("zimone", "zimone123")
+
+
+def pump(app, done, timeout=30.0, what="condition"):
+    # Runs the Tk event loop until done() is true.
+    deadline = time.perf_counter() + timeout
+    while not done():
+        if time.perf_counter() > deadline:
+            raise TimeoutError(f"timed out waiting for {what}")
+        app.update()
+        time.sleep(0.001)
+
+
+def run_once():
+    import main
+    app = main.POSApp()
+    login = app.frames["LoginPage"]
+    pump(app, login.winfo_ismapped, what="login screen")
+    login_screen = time.perf_counter() - STARTED
+
+    login.username_entry.insert(0, STAFF_LOGIN[0])
+    login.password_entry.insert(0, STAFF_LOGIN[1])
+    login.attempt_login()
+    pump(app, lambda: "StorePage" in app.frames and app.catalog.loaded, what="store page")
+    app.frames["StorePage"].add_to_cart(app.catalog.snapshot()[0])
+    pump(app, lambda: app.cart, what="stock hold")
+    app.show_frame("CheckoutPage")
+    checkout = app.frames["CheckoutPage"]
+    pump(app, lambda: checkout.selected_customer is not None, what="customer list")
+    checkout.process_payment()
+    pump(app, lambda: app.last_receipt is not None, what="receipt")
+    first_sale = time.perf_counter() - STARTED
+
+    app.on_close()
+    return {"login_screen_ms": login_screen * 1000, "first_sale_ms": first_sale * 1000}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure till time-to-login-screen and time-to-first-sale.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--once", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.once:
+        print(json.dumps(run_once()))
+        return 0
+
+    import bench
+    samples = {"login_screen_ms": [], "first_sale_ms": []}
+    for i in range(args.runs):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, POS_DB_BACKEND="sqlite", POS_SQLITE_PATH=os.path.join(tmp, "pos.db"))
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), "--once"], env=env,
+                                 capture_output=True, text=True)
+        if out.returncode != 0:
+            print(out.stderr.strip())
+            return 1
+        run = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"  run {i + 1}: login screen {run['login_screen_ms']:8.1f}ms  first sale {run['first_sale_ms']:8.1f}ms")
+        for name, ms in run.items():
+            samples[name].append(ms)
+
+    results = {name: {"runs": len(ms), "p50_ms": bench.percentile(ms, 50), "p95_ms": bench.percentile(ms, 95),
+                      "min_ms": min(ms)} for name, ms in samples.items()}
+    for name, r in results.items():
+        print(f"{name:<16} p50 {r['p50_ms']:8.1f}ms  p95 {r['p95_ms']:8.1f}ms  min {r['min_ms']:8.1f}ms")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"git": bench.git_revision(), "results": results}, f, indent=2)
+        print(f"Wrote {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
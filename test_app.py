@@ -1,6 +1,36 @@
 #gotta add some test cases mate (it has to be 5)
+import random
+import time
 import unittest
 from database import Database
+from connection_pool import ConnectionPool, PoolError
+from catalog import ProductCatalog
+from change_feed import ChangeFeed
+from cart_model import CartModel
+from reservations import CartReservations
+from pricing import PricingEngine
+from decimal import Decimal
+from db_worker import DatabaseWorker
+from tree_sync import TreeviewSync
+from thumbnail_cache import ThumbnailCache
+from sales_portal import visible_range
+from order_manager import parse_filters
+from PIL import Image
+from unittest import mock
+import catalog_io
+import bench
+import backends
+import db_setup
+import migrations
+from sales_journal import SalesJournal, replay_pending
+import instrumentation
+import threading
+import mysql.connector
+import datetime
+import json
+import os
+import sqlite3
+import tempfile
 
 # ==============================================================================
 # BIJULI TECH POS - AUTOMATED TEST SUITE
@@ -31,7 +61,7 @@ class TestBijuliSystem(unittest.TestCase):
         self.assertIsNotNone(user, "Staff login failed")
         self.assertEqual(user['role'], 'staff', "User role is not Staff")
 
-==============================
+#==============================
     def test_calculation_precision(self):
         """[Aayush] Ensure currency math is accurate to 2 decimal places."""
         price = 19.99
@@ -57,3 +87,926 @@ class TestBijuliSystem(unittest.TestCase):
         
         calculated = subtotal * discount_rate
         self.assertEqual(calculated, expected_discount, "Student 10% logic failed")
+
+
+class FakeConnection:
+    """Stands in for a mysql.connector connection inside the pool."""
+    def __init__(self, n):
+        self.n = n
+        self.in_transaction = False
+        self.unread_result = False
+        self.stale = False
+        self.rollback_fails = False
+        self.rollbacks = 0
+        self.closed = False
+
+    def ping(self, reconnect=False):
+        if self.stale:
+            raise mysql.connector.errors.OperationalError("MySQL server has gone away")
+
+    def rollback(self):
+        self.rollbacks += 1
+        if self.rollback_fails:
+            raise mysql.connector.errors.OperationalError("Lost connection")
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.made = []
+        self.pool = ConnectionPool({}, size=2, timeout=0.05, connect=self.connect)
+
+    def connect(self):
+        self.made.append(FakeConnection(len(self.made)))
+        return self.made[-1]
+
+    def test_leases_are_reused(self):
+        """Verify a returned connection is handed out again instead of dialing a new one."""
+        conn = self.pool.acquire()
+        conn.close()
+        self.assertFalse(conn.is_connected())
+        again = self.pool.acquire()
+        self.assertIs(again.n, 0)
+        self.assertEqual((len(self.made), self.pool.stats()['acquired']), (1, 2))
+
+    def test_size_limit_and_timeout(self):
+        """Verify the pool never opens more than its size and times out waiting for a lease."""
+        held = [self.pool.acquire(), self.pool.acquire()]
+        with self.assertRaises(PoolError):
+            self.pool.acquire()
+        stats = self.pool.stats()
+        self.assertEqual((stats['open'], stats['in_use'], stats['timeouts']), (2, 2, 1))
+        held[0].close()
+        self.assertIs(self.pool.acquire().n, 0)
+
+    def test_stale_connection_is_replaced(self):
+        """Verify a connection that fails its health check is closed and redialed."""
+        self.pool.health_check_after = 0
+        self.pool.acquire().close()
+        self.made[0].stale = True
+        conn = self.pool.acquire()
+        self.assertEqual(conn.n, 1)
+        self.assertTrue(self.made[0].closed)
+        self.assertEqual((self.pool.stats()['reconnects'], self.pool.stats()['open']), (1, 1))
+
+    def test_release_rolls_back_or_discards(self):
+        """Verify open transactions are rolled back on release, and broken connections dropped."""
+        conn = self.pool.acquire()
+        self.made[0].in_transaction = True
+        conn.close()
+        self.assertEqual((self.made[0].rollbacks, self.pool.stats()['idle']), (1, 1))
+        conn = self.pool.acquire()
+        self.made[0].in_transaction = self.made[0].rollback_fails = True
+        conn.close()
+        stats = self.pool.stats()
+        self.assertTrue(self.made[0].closed)
+        self.assertEqual((stats['open'], stats['idle'], stats['discarded']), (0, 0, 1))
+
+
+class StubCatalogDB:
+    """Stands in for Database so catalog logic can be tested without MySQL."""
+    def __init__(self, products):
+        self.products = products
+        self.version = 1
+        self.full_loads = 0
+
+    def get_catalog_version(self):
+        return self.version
+
+    def get_all_products(self):
+        self.full_loads += 1
+        return list(self.products)
+
+
+class TestProductCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.db = StubCatalogDB([
+            {'id': 1, 'name': 'JBL Speaker', 'price': 120.00, 'image_path': '', 'stock_level': 25},
+            {'id': 2, 'name': 'MacBook Pro', 'price': 2100.00, 'image_path': '', 'stock_level': 8},
+        ])
+        self.catalog = ProductCatalog(self.db, max_age=0)
+
+    def test_lookup_by_id_and_name(self):
+        """Verify products are found by id (int or str) and by case-insensitive name."""
+        self.catalog.refresh_if_stale()
+        self.assertEqual(self.catalog.get(2)['price'], 2100.00)
+        self.assertEqual(self.catalog.get("1").name, 'JBL Speaker')
+        self.assertIsNone(self.catalog.get(99))
+        self.assertEqual([p.id for p in self.catalog.find_by_name("macbook pro")], [2])
+
+    def test_search_ranks_and_matches_substrings(self):
+        """Verify search finds word prefixes in any order and mid-word substrings."""
+        self.catalog.refresh_if_stale()
+        self.assertEqual([p.id for p in self.catalog.search("spea jbl")], [1])
+        self.assertEqual([p.id for p in self.catalog.search("book")], [2])
+        self.assertEqual(self.catalog.search("zz"), [])
+
+    def test_reload_only_on_version_change(self):
+        """Verify the full table is only re-read when the catalog version moves."""
+        self.catalog.products()
+        self.catalog.products()
+        self.assertEqual(self.db.full_loads, 1)
+        self.db.version += 1
+        self.catalog.products()
+        self.assertEqual(self.db.full_loads, 2)
+
+    def test_apply_changes_patches_rows(self):
+        """Verify change-feed rows are patched in (renamed, added, deleted) without a reload."""
+        self.catalog.products()
+        self.assertTrue(self.catalog.apply_changes([1, 2, 3], [
+            {'id': 1, 'name': 'JBL Flip', 'price': 99.00, 'image_path': '', 'stock_level': 24},
+            {'id': 3, 'name': 'Pixel Buds', 'price': 150.00, 'image_path': '', 'stock_level': 4},
+        ], version=2))
+        self.assertEqual([p.id for p in self.catalog.snapshot()], [1, 3])
+        self.assertEqual([p.id for p in self.catalog.search("flip")], [1])
+        self.assertEqual(self.catalog.search("speaker"), [])
+        self.assertEqual(self.catalog.find_by_name("pixel buds")[0].stock_level, 4)
+        self.assertEqual((self.catalog.version, self.db.full_loads), (2, 1))
+
+
+class StubChangeLogDB:
+    """Serves change_log rows as committed so far, in sequence order."""
+    def __init__(self):
+        self.rows = []
+
+    def get_change_seq(self):
+        return max((r[0] for r in self.rows), default=0)
+
+    def get_changes(self, after, limit=500):
+        return sorted(r for r in self.rows if r[0] > after)[:limit]
+
+
+class TestChangeFeed(unittest.TestCase):
+
+    def test_late_commits_behind_a_gap_are_not_lost(self):
+        """Verify a sequence number committed out of order is still delivered exactly once."""
+        db = StubChangeLogDB()
+        feed = ChangeFeed(db, gap_wait=60)
+        self.assertEqual(feed.poll(), {})
+        db.rows += [(1, "product", 5), (3, "customer", 2)]
+        self.assertEqual(feed.poll(), {"product": {5}, "customer": {2}})
+        self.assertEqual(feed.seq, 1)
+        db.rows.append((2, "product", 7))
+        self.assertEqual(feed.poll(), {"product": {7}})
+        self.assertEqual((feed.seq, feed.poll()), (3, {}))
+        db.rows += [(4, "product", None), (5, "product", 8)]
+        self.assertEqual(feed.poll(), {"product": None})
+
+
+class TestThumbnailCache(unittest.TestCase):
+    """PhotoImage needs a display, so it is swapped for a plain tuple here."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ThumbnailCache(cache_dir=os.path.join(self.tmp.name, "thumbs"), size=(16, 16), max_items=2)
+        self.paths = {}
+        for name, color in (("a", "red"), ("b", "green"), ("c", "blue")):
+            self.paths[name] = os.path.join(self.tmp.name, f"{name}.png")
+            Image.new("RGB", (64, 64), color).save(self.paths[name])
+        patcher = mock.patch("thumbnail_cache.ImageTk.PhotoImage", lambda img: ("photo", img.size))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_memory_evicts_least_recently_used(self):
+        """Verify the in-memory LRU keeps recent thumbnails and falls back to the disk cache."""
+        for name in ("a", "b", "a", "c"):
+            self.cache.get(self.paths[name])
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 3))
+        self.assertEqual([key[0] for key in self.cache._memory], [self.paths["a"], self.paths["c"]])
+        self.cache.get(self.paths["b"])
+        self.assertEqual((self.cache.disk_hits, self.cache.misses), (1, 3))
+
+    def test_changed_file_gets_a_new_thumbnail(self):
+        """Verify the disk cache is keyed on the file's mtime and byte size."""
+        path = self.paths["a"]
+        self.cache.get(path)
+        self.cache.clear_memory()
+        self.cache.get(path)
+        self.assertEqual((self.cache.disk_hits, self.cache.misses), (1, 1))
+
+        mtime = os.stat(path).st_mtime_ns
+        Image.new("RGB", (128, 128), "red").save(path)
+        os.utime(path, ns=(mtime, mtime))
+        self.cache.get(path)
+        self.assertEqual(self.cache.misses, 2)
+        os.utime(path, ns=(mtime + 10**9, mtime + 10**9))
+        self.cache.get(path)
+        self.assertEqual(self.cache.misses, 3)
+        self.assertIsNone(self.cache.key(os.path.join(self.tmp.name, "missing.png")))
+
+
+class TestStoreGrid(unittest.TestCase):
+
+    def test_visible_range_covers_viewport_plus_overscan(self):
+        """Verify only the rows on screen, plus one row either side, get cards."""
+        self.assertEqual(visible_range(0, 640, 100, columns=4, row_height=320, overscan=1), range(0, 16))
+        self.assertEqual(visible_range(1000, 640, 100, columns=4, row_height=320, overscan=1), range(8, 28))
+        self.assertEqual(visible_range(1000, 640, 10, columns=4, row_height=320, overscan=1), range(8, 10))
+        self.assertEqual(len(visible_range(5000, 640, 10, columns=4, row_height=320, overscan=1)), 0)
+        self.assertEqual(visible_range(0, 640, 0), range(0, 0))
+
+
+class ManualTkRoot:
+    """Minimal stand-in for Tk's after() loop so the worker can be pumped by hand."""
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, ms, fn):
+        self.scheduled.append(fn)
+        return len(self.scheduled)
+
+    def after_cancel(self, after_id):
+        pass
+
+    def pump(self):
+        pending, self.scheduled = self.scheduled, []
+        for fn in pending:
+            fn()
+
+    def pump_until(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+            self.pump()
+
+
+class TestDatabaseWorker(unittest.TestCase):
+
+    def setUp(self):
+        self.root = ManualTkRoot()
+        self.worker = DatabaseWorker(self.root, max_workers=1, max_pending=4)
+
+    def tearDown(self):
+        self.worker.shutdown()
+
+    def test_results_delivered_on_pump(self):
+        """Verify results only reach callbacks when the Tk loop pumps the worker."""
+        results = []
+        future = self.worker.submit(lambda a, b: a + b, 2, 3, on_done=results.append)
+        future.result(timeout=5)
+        self.assertEqual(results, [])
+        self.root.pump_until(lambda: results)
+        self.assertEqual(results, [5])
+
+    def test_superseded_request_is_dropped(self):
+        """Verify a newer request with the same key replaces the older one."""
+        results = []
+        first = self.worker.submit(lambda: "old", key="search", on_done=results.append)
+        first.result(timeout=5)
+        self.worker.submit(lambda: "new", key="search", on_done=results.append)
+        self.root.pump_until(lambda: results)
+        self.root.pump()
+        self.assertEqual(results, ["new"])
+
+
+class RecordingTree:
+    """Minimal Treeview stand-in that records every Tk-side call."""
+    def __init__(self):
+        self.order = []
+        self.calls = []
+
+    def insert(self, parent, index, iid, values, tags):
+        self.calls.append(("insert", iid))
+        self.order.append(iid)
+
+    def item(self, iid, values, tags):
+        self.calls.append(("item", iid))
+
+    def delete(self, *iids):
+        self.calls.append(("delete",) + iids)
+        self.order = [i for i in self.order if i not in iids]
+
+    def move(self, iid, parent, index):
+        self.order.remove(iid)
+        self.order.insert(index, iid)
+
+    def get_children(self):
+        return tuple(self.order)
+
+
+class TestTreeviewSync(unittest.TestCase):
+
+    def test_only_changed_rows_touch_the_tree(self):
+        """Verify a re-sync inserts, updates and deletes only what changed."""
+        tree = RecordingTree()
+        table = TreeviewSync(tree)
+        table.sync([(1, ("A", 10), ()), (2, ("B", 5), ()), (3, ("C", 1), ("low_stock",))])
+        tree.calls = []
+        counts = table.sync([(1, ("A", 10), ()), (3, ("C", 9), ()), (4, ("D", 2), ())])
+        self.assertEqual(counts, (1, 1, 1))
+        self.assertEqual(tree.calls, [("item", "3"), ("insert", "4"), ("delete", "2")])
+        self.assertEqual(tree.order, ["1", "3", "4"])
+
+    def test_patch_upserts_and_removes_by_id(self):
+        """Verify a partial update touches only the named rows."""
+        tree = RecordingTree()
+        table = TreeviewSync(tree)
+        table.sync([(1, ("A", 10), ()), (2, ("B", 5), ())])
+        tree.calls = []
+        table.patch([1, 2, 5], [(1, ("A", 9), ()), (5, ("E", 3), ())])
+        self.assertEqual(tree.calls, [("item", "1"), ("insert", "5"), ("delete", "2")])
+
+
+class TestCartModel(unittest.TestCase):
+
+    def setUp(self):
+        self.cart = CartModel()
+        self.events = []
+        self.cart.subscribe(lambda pid, qty: self.events.append((pid, qty)))
+
+    def test_changes_are_reported_per_line(self):
+        """Verify each quantity change names just the line it touched."""
+        self.cart[1] = 1
+        self.cart[1] = self.cart.get(1, 0) + 1
+        self.cart[2] = 3
+        self.cart[2] = 3
+        self.cart[1] = 0
+        self.cart.pop(2)
+        self.assertEqual(self.events, [(1, 1), (1, 2), (2, 3), (1, 0), (2, 0)])
+        self.assertEqual(len(self.cart), 0)
+
+    def test_clear_is_one_event(self):
+        """Verify clearing a full cart notifies once and an empty clear not at all."""
+        for pid in range(40):
+            self.cart[pid] = 2
+        self.events.clear()
+        self.assertEqual((self.cart.units, dict(self.cart)[7]), (80, 2))
+        self.cart.clear()
+        self.cart.clear()
+        self.assertEqual(self.events, [(None, 0)])
+        self.assertFalse(self.cart)
+
+
+class TestPricingEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = PricingEngine({1: "19.99", 2: 0.1, 3: Decimal("1200.00")}, breaks=[(10, "0.10")])
+        self.engine.set_vouchers([{"code": "ais10", "percent": Decimal("10.00")}])
+
+    def test_discounts_stack_in_exact_decimals(self):
+        """Verify VIP then voucher are taken off what is left, to the cent."""
+        quote = self.engine.price({1: 3, 2: 3}, "VIP", "AIS10")
+        self.assertEqual(quote.subtotal, Decimal("60.27"))
+        self.assertEqual(quote.discount("tier"), Decimal("3.01"))
+        self.assertEqual(quote.discount("voucher"), Decimal("5.73"))
+        self.assertEqual(quote.total, Decimal("51.53"))
+        self.assertEqual(self.engine.price({1: 3}, "Standard", "nope").total, Decimal("59.97"))
+
+    def test_quantity_breaks_apply_per_line(self):
+        """Verify a break only discounts the line that reached it."""
+        quote = self.engine.price({2: 10, 3: 1})
+        self.assertEqual(quote.discount("breaks"), Decimal("0.10"))
+        self.assertEqual(quote.total, Decimal("1200.90"))
+
+    def test_repricing_is_memoized(self):
+        """Verify identical carts in any order are priced once, singly or in a batch."""
+        first = self.engine.price({1: 2, 3: 1}, "VIP")
+        self.assertIs(self.engine.price({3: 1, 1: 2}, "VIP"), first)
+        quotes = self.engine.price_many([({1: 2, 3: 1}, "VIP", None)] * 50 + [({1: 1}, None, None)])
+        self.assertEqual(len(quotes), 51)
+        self.assertEqual(self.engine.cache_info().misses, 2)
+        self.engine.set_vouchers([])
+        self.assertIsNone(self.engine.voucher("ais10"))
+
+    def test_patched_price_is_not_served_from_cache(self):
+        """Verify a change-feed price patch without a catalog version still reprices the cart."""
+        catalog = ProductCatalog(StubCatalogDB([{'id': 1, 'name': 'Cable', 'price': 10.00, 'stock_level': 5}]))
+        catalog.refresh_if_stale()
+        engine = PricingEngine(catalog)
+        self.assertEqual(engine.price({1: 2}).total, Decimal("20.00"))
+        catalog.apply_changes([1], [{'id': 1, 'name': 'Cable', 'price': 12.50, 'stock_level': 5}], None)
+        self.assertEqual(engine.price({1: 2}).total, Decimal("25.00"))
+
+
+class StubUpsertDB:
+    """Records upsert chunks; fails any chunk containing a product named 'FAIL'."""
+    def __init__(self):
+        self.chunks = []
+
+    def upsert_products(self, rows):
+        self.chunks.append(list(rows))
+        return False if any(r['name'] == "FAIL" for r in rows) else len(rows)
+
+
+class TestCatalogImport(unittest.TestCase):
+
+    def write(self, text, suffix):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_csv_rows_validated_and_chunked(self):
+        """Verify bad rows are rejected by line number and good rows are upserted in chunks."""
+        path = self.write("name,price,stock_level\nA,1.5,3\n,2,1\nB,-1,1\nC,2,x\nD,4,0\nE,5,1\n", ".csv")
+        db = StubUpsertDB()
+        report = catalog_io.import_file(db, "products", path, chunk_size=2)
+        self.assertEqual(report.read, 6)
+        self.assertEqual(report.written, 3)
+        self.assertEqual([n for n, _ in report.rejected], [3, 4, 5])
+        self.assertEqual([[r['name'] for r in c] for c in db.chunks], [["A", "D"], ["E"]])
+
+    def test_failed_chunk_is_reported(self):
+        """Verify a chunk the database rolls back counts as rejected, not written."""
+        path = self.write('{"name": "A", "price": 1}\n{"name": "FAIL", "price": 2}\n{"name": "B", "price": 3}\n', ".jsonl")
+        report = catalog_io.import_file(StubUpsertDB(), "products", path, chunk_size=2)
+        self.assertEqual(report.written, 1)
+        self.assertEqual([n for n, _ in report.rejected], [1, 2])
+
+
+class TestBenchHelpers(unittest.TestCase):
+
+    def test_percentile_nearest_rank(self):
+        """Verify p50/p95/p99 use nearest-rank on unsorted samples."""
+        samples = list(range(100, 0, -1))
+        self.assertEqual(bench.percentile(samples, 50), 50)
+        self.assertEqual(bench.percentile(samples, 95), 95)
+        self.assertEqual(bench.percentile(samples, 99), 99)
+        self.assertEqual(bench.percentile([7], 99), 7)
+
+    def test_reseed_empties_every_migrated_table(self):
+        """Verify a reseed clears rollups, change log and holds, but keeps migration bookkeeping."""
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(backend=backends.SQLiteBackend(os.path.join(tmp, "pos.db")))
+            conn = db.get_connection()
+            migrations.migrate(conn, out=lambda *a: None)
+            cursor = conn.cursor()
+            tables = bench.reseed_tables(cursor)
+            cursor.close()
+            conn.close()
+            db.close()
+        for table in ("products", "orders", "sales_daily", "change_log", "stock_reservations", "stock_conflicts"):
+            self.assertIn(table, tables)
+        for table in bench.KEEP_ON_RESEED:
+            self.assertNotIn(table, tables)
+
+    def test_synthetic_data_is_deterministic(self):
+        """Verify the same seed always generates the same rows."""
+        first = list(bench.customer_rows(50, random.Random(1)))
+        self.assertEqual(first, list(bench.customer_rows(50, random.Random(1))))
+        self.assertEqual(len({row[3] for row in first}), 50)
+
+
+class TestMigrations(unittest.TestCase):
+    """Runs the migration chain against a throwaway embedded database."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = Database(backend=backends.SQLiteBackend(os.path.join(self.tmp.name, "pos.db")))
+        self.conn = self.db.get_connection()
+
+    def tearDown(self):
+        self.conn.close()
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_migrate_twice_is_a_no_op(self):
+        """Verify a second migrate() applies nothing and leaves the recorded versions alone."""
+        latest = [m[0] for m in migrations.MIGRATIONS]
+        self.assertEqual(migrations.migrate(self.conn, out=lambda *a: None), latest)
+        self.assertEqual(migrations.migrate(self.conn, out=lambda *a: None), [])
+        self.assertEqual(migrations.applied_versions(self.conn), set(latest))
+
+    def test_baseline_database_is_upgraded_in_place(self):
+        """Verify a pre-migration database keeps its rows and gains the new columns and tables."""
+        cursor = self.conn.cursor()
+        migrations._base_schema(cursor)
+        db_setup.seed_data(cursor)
+        cursor.execute("INSERT INTO orders (customer_id, user_id, total_amount) VALUES (2, 3, 240.00)")
+        cursor.execute("INSERT INTO order_items (order_id, product_id, quantity, price_at_time) VALUES (1, 4, 2, 120.00)")
+        self.conn.commit()
+
+        self.assertEqual(migrations.migrate(self.conn, out=lambda *a: None), [m[0] for m in migrations.MIGRATIONS])
+        cursor.execute("SELECT COUNT(*), SUM(stock_level), SUM(reserved) FROM products")
+        self.assertEqual(cursor.fetchone(), (10, 167, 0))
+        cursor.execute("SELECT name, loyalty_points FROM customers ORDER BY id")
+        self.assertEqual(cursor.fetchall(), [("John Doe", 10), ("Jane Smith", 150)])
+        cursor.execute("SELECT o.total_amount, o.journal_id, i.quantity FROM orders o JOIN order_items i ON i.order_id = o.id")
+        self.assertEqual([(float(t), j, q) for t, j, q in cursor.fetchall()], [(240.0, None, 2)])
+        cursor.execute("SELECT version FROM catalog_version")
+        self.assertEqual(cursor.fetchall(), [(0,)])
+        cursor.close()
+
+
+class TestSQLiteBackend(unittest.TestCase):
+    """Runs the real Database methods against a throwaway embedded database."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = Database(backend=backends.SQLiteBackend(os.path.join(self.tmp.name, "pos.db")))
+        db_setup.create_tables(self.db.get_connection)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_login_and_catalog(self):
+        """Verify the seeded schema works end to end on SQLite."""
+        self.assertEqual(self.db.login("zimone", "zimone123")['role'], 'staff')
+        self.assertIsNone(self.db.login("zimone", "wrong"))
+        self.assertEqual(len(self.db.get_all_products()), 10)
+        self.assertEqual([c['name'] for c in self.db.search_customers("ja")], ["Jane Smith"])
+
+    def test_transaction_updates_stock_and_rolls_back(self):
+        """Verify a sale decrements stock and a bad cart leaves nothing behind."""
+        order_id = self.db.process_transaction(1, 1, {1: 2, 3: 1}, 2550.0)
+        self.assertTrue(order_id)
+        self.assertEqual(self.db.get_order_total(order_id), 2550.0)
+        self.assertEqual(len(self.db.get_order_items(order_id)), 2)
+        stock = {p['id']: p['stock_level'] for p in self.db.get_all_products()}
+        self.assertEqual((stock[1], stock[3]), (8, 19))
+
+        self.assertFalse(self.db.process_transaction(1, 1, {1: 1, 999: 1}, 10.0))
+        self.assertEqual(len(self.db.get_all_orders()), 1)
+        self.assertEqual({p['id']: p['stock_level'] for p in self.db.get_all_products()}[1], 8)
+
+    def test_checkout_returns_receipt_that_survives_deletion(self):
+        """Verify checkout hands back the full receipt and reprints keep deleted product names."""
+        receipt = self.db.checkout(2, 3, {4: 2}, 228.0, payment_method="Card")
+        self.assertEqual([(l['name'], l['quantity']) for l in receipt['lines']], [("JBL Speaker", 2)])
+        self.assertEqual((receipt['subtotal'], receipt['discount'], receipt['total']), (240.0, 12.0, 228.0))
+        self.assertEqual(receipt['payment_method'], "Card")
+        self.db.delete_product(4)
+        reprint = self.db.get_receipt(receipt['order_id'])
+        self.assertEqual(reprint['lines'][0]['name'], "JBL Speaker")
+        self.assertEqual((reprint['discount'], reprint['payment_method']), (12.0, "Card"))
+
+    def test_sales_update_rollups_and_backfill_matches(self):
+        """Verify each sale updates the daily rollups and a backfill rebuilds the same figures."""
+        self.db.checkout(1, 3, {4: 2, 9: 1}, 325.0)
+        self.db.checkout(None, 3, {4: 1}, 120.0)
+        summary = self.db.get_daily_summary()
+        self.assertEqual((summary['orders'], summary['units'], float(summary['revenue'])), (2, 4, 445.0))
+        self.assertEqual([(p['product_id'], p['units']) for p in summary['top_products']], [(4, 3), (9, 1)])
+        self.assertEqual([(s['staff'], s['orders']) for s in summary['staff']], [("zimone", 2)])
+        self.assertEqual(self.db.rebuild_rollups(), 1)
+        rebuilt = self.db.get_daily_summary()
+        self.assertEqual((rebuilt['orders'], rebuilt['units'], rebuilt['revenue']),
+                         (summary['orders'], summary['units'], summary['revenue']))
+        self.assertEqual(rebuilt['top_products'], summary['top_products'])
+
+    def test_sale_patches_stock_through_the_feed_without_a_catalog_reload(self):
+        """Verify a sale leaves catalog_version alone, reaches other tills as a row patch, and survives a rollup failure."""
+        feed = ChangeFeed(self.db)
+        feed.poll()
+        version = self.db.get_catalog_version()
+        with mock.patch.object(self.db, "_add_to_rollups", side_effect=RuntimeError("rollup row busy")):
+            self.assertTrue(self.db.checkout(1, 3, {4: 2}, 240.0))
+        self.assertEqual(self.db.get_catalog_version(), version)
+        self.assertEqual(feed.poll(), {"product": {4}, "customer": {1}})
+        self.assertEqual({p['id']: p['stock_level'] for p in self.db.get_all_products()}[4], 23)
+        self.assertEqual(self.db.get_daily_summary()['orders'], 0)
+        self.db.rebuild_rollups()
+        self.assertEqual(self.db.get_daily_summary()['orders'], 1)
+
+    def test_vouchers_come_from_table(self):
+        """Verify the old hard-coded voucher is seeded and loaded by the pricing engine."""
+        engine = PricingEngine({1: "100.00"})
+        self.assertTrue(engine.load_vouchers(self.db))
+        self.assertEqual(engine.voucher("AIS10").rate, Decimal("0.1"))
+        self.assertEqual(engine.price({1: 1}, None, "ais10").total, Decimal("90.00"))
+
+    def test_locked_checkout_is_retried(self):
+        """Verify a sale that hits a held write lock retries and books once the lock is released."""
+        self.db.close()
+        path = os.path.join(self.tmp.name, "pos.db")
+        self.db = Database(backend=backends.SQLiteBackend(path, busy_timeout=0.05), lock_retries=8, lock_backoff=0.05)
+        other = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        threading.Timer(0.2, other.rollback).start()
+        receipt = self.db.checkout(1, 3, {3: 1, 1: 1}, 1350.0)
+        other.close()
+        self.assertTrue(receipt)
+        self.assertEqual([line['product_id'] for line in receipt['lines']], [3, 1])
+        stats = self.db.lock_retry_stats()["checkout"]
+        self.assertGreaterEqual(stats["busy"], 1)
+        self.assertEqual((stats["recovered"], stats["gave_up"]), (1, 0))
+
+    def test_incomplete_dialect_cannot_be_built(self):
+        """Verify a dialect missing an override fails when created, not mid-query."""
+        class HalfDialect(backends.Dialect):
+            def enum(self, values):
+                return "TEXT"
+        with self.assertRaises(TypeError):
+            HalfDialect()
+        self.assertEqual(backends.SQLiteDialect().enum(("a",)), "TEXT")
+
+    def test_lock_errors_are_classified(self):
+        """Verify only deadlocks, lock wait timeouts and busy databases count as retryable."""
+        self.assertEqual(backends.lock_conflict(mysql.connector.errors.DatabaseError(errno=1213)), "deadlock")
+        self.assertEqual(backends.lock_conflict(mysql.connector.errors.DatabaseError(errno=1205)), "lock_wait_timeout")
+        self.assertIsNone(backends.lock_conflict(mysql.connector.errors.IntegrityError(errno=1062)))
+        self.assertEqual(backends.lock_conflict(sqlite3.OperationalError("database is locked")), "busy")
+        self.assertIsNone(backends.lock_conflict(ValueError("Unknown product id(s): [999]")))
+
+    def stock_of(self, pid):
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT stock_level, reserved FROM products WHERE id = %s", (pid,))
+        row = cursor.fetchone()
+        cursor.close()
+        conn.close()
+        return tuple(row)
+
+    def test_reservations_prevent_oversell(self):
+        """Verify holds only grow into free stock and checkout consumes them without overselling."""
+        self.assertEqual(self.db.reserve_stock("till-a", 5, 3), {'ok': True, 'held': 3, 'available': 1})
+        self.assertEqual(self.db.reserve_stock("till-b", 5, 2), {'ok': False, 'held': 0, 'available': 1})
+        self.assertTrue(self.db.reserve_stock("till-b", 5, 1)['ok'])
+        self.assertEqual(self.stock_of(5), (4, 4))
+
+        self.assertFalse(self.db.checkout(1, 3, {5: 1}, 300.0))
+        self.assertTrue(self.db.checkout(1, 3, {5: 3}, 900.0, reservation="till-a"))
+        self.assertEqual(self.stock_of(5), (1, 1))
+        self.assertTrue(self.db.checkout(2, 3, {5: 1}, 300.0, reservation="till-b"))
+        self.assertEqual(self.stock_of(5), (0, 0))
+
+    def test_two_tills_race_for_the_last_unit(self):
+        """Verify only the till whose hold lands first gets the last unit into its cart."""
+        root = ManualTkRoot()
+        worker = DatabaseWorker(root, max_workers=1)
+        self.addCleanup(worker.shutdown)
+        self.db.reserve_stock("till-c", 10, 2)
+        tills = [CartReservations(CartModel(), self.db, worker) for _ in range(2)]
+        answers = []
+        for till in tills:
+            self.assertEqual(till.wanted(10), 0)
+            till.add(10, 1, on_done=lambda ok, available: answers.append((ok, available)))
+        self.assertEqual((tills[0].wanted(10), dict(tills[0].cart)), (1, {}))
+        root.pump_until(lambda: len(answers) == 2)
+        root.pump()
+        self.assertEqual(answers, [(True, 0), (False, 0)])
+        self.assertEqual([dict(t.cart) for t in tills], [{10: 1}, {}])
+        self.assertEqual(self.stock_of(10), (3, 3))
+
+    def test_quick_clicks_keep_their_order_on_parallel_workers(self):
+        """Verify rapid adds and edits on a two-thread worker end with the last quantity held."""
+        root = ManualTkRoot()
+        worker = DatabaseWorker(root, max_workers=2)
+        self.addCleanup(worker.shutdown)
+        till = CartReservations(CartModel(), self.db, worker)
+        answers = []
+        for _ in range(3):
+            till.add(10, 1, on_done=lambda ok, available: answers.append(ok))
+        self.assertEqual(till.wanted(10), 3)
+        root.pump_until(lambda: len(answers) == 3)
+        self.assertEqual((answers, dict(till.cart), self.stock_of(10)), ([True] * 3, {10: 3}, (3, 3)))
+        till.add(10, 1, on_done=lambda ok, available: answers.append((ok, available)))
+        root.pump_until(lambda: len(answers) == 4)
+        self.assertEqual((answers[3], dict(till.cart)), ((False, 0), {10: 3}))
+        till.cart[10] = 1
+        till.cart[10] = 2
+        root.pump_until(lambda: not till._busy)
+        root.pump()
+        self.assertEqual((dict(till.cart), self.stock_of(10)), ({10: 2}, (3, 2)))
+
+    def test_lapsed_and_dropped_holds_are_released(self):
+        """Verify expired holds are swept and holds on lines removed before payment go back."""
+        self.db.reserve_stock("idle", 2, 2, ttl=datetime.timedelta(seconds=-1))
+        self.db.reserve_stock("busy", 3, 5)
+        self.db.reserve_stock("busy", 4, 2)
+        self.assertEqual(self.db.release_expired_reservations(), {2: 2})
+        self.assertEqual(self.stock_of(2), (5, 0))
+        self.assertTrue(self.db.checkout(1, 3, {3: 4}, 600.0, reservation="busy"))
+        self.assertEqual((self.stock_of(3), self.stock_of(4)), ((16, 0), (25, 0)))
+        self.assertEqual(self.db.release_reservations("busy"), {})
+
+    def test_writes_feed_the_change_log(self):
+        """Verify other tills see only the products and customers a write touched."""
+        feed = ChangeFeed(self.db)
+        self.assertEqual(feed.poll(), {})
+        p = {r['id']: r for r in self.db.get_all_products()}[2]
+        self.db.update_product(2, p['name'], 19.99, p['image_path'], p['stock_level'])
+        self.assertTrue(self.db.checkout(1, 3, {3: 1}, 200.0))
+        self.db.reserve_stock("till-a", 4, 1)
+        self.assertEqual(feed.poll(), {"product": {2, 3}, "customer": {1}})
+        self.assertEqual(feed.poll(), {})
+        self.assertEqual([float(r['price']) for r in self.db.get_products_by_ids([2, 999])], [19.99])
+        self.db.delete_customer(1)
+        self.assertEqual(feed.poll(), {"customer": {1}})
+        self.assertEqual(self.db.get_customers_by_ids([1]), [])
+
+    def test_upsert_matches_existing_rows(self):
+        """Verify id-less import rows update by name/email and new ones insert."""
+        self.db.upsert_products([{"name": "raspberry pi 5", "price": 90, "image_path": "", "stock_level": 7},
+                                 {"name": "New Thing", "price": 5, "image_path": "", "stock_level": 1}])
+        products = {p['name']: p for p in self.db.get_all_products()}
+        self.assertEqual(len(products), 11)
+        self.assertEqual(products['raspberry pi 5']['stock_level'], 7)
+        self.db.upsert_customers([{"name": "Jane S", "phone": "", "email": "JANE@test.com",
+                                   "customer_type": "VIP", "loyalty_points": 1}])
+        self.assertEqual(len(self.db.get_all_customers()), 2)
+
+
+class TestOrderHistory(unittest.TestCase):
+    """Keyset paging and filters of Database.get_orders_page on the embedded database."""
+
+    T = datetime.datetime(2024, 3, 1, 12, 0)
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = Database(backend=backends.SQLiteBackend(os.path.join(self.tmp.name, "pos.db")))
+        db_setup.create_tables(self.db.get_connection)
+        # (customer_id, user_id, total, order_date): five orders share one timestamp
+        orders = [(1, 3, 50.0, self.T)] * 3 + [(2, 1, 500.0, self.T)] * 2 + [
+            (None, 3, 20.0, self.T - datetime.timedelta(days=1)),
+            (2, 2, 900.0, self.T - datetime.timedelta(days=2))]
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.executemany("INSERT INTO orders (customer_id, user_id, total_amount, order_date) VALUES (%s, %s, %s, %s)",
+                           orders)
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def ids(self, **filters):
+        rows, _ = self.db.get_orders_page(limit=100, **filters)
+        return [r['id'] for r in rows]
+
+    def test_pages_across_equal_dates_without_gaps(self):
+        """Verify paging two at a time through tied order_dates returns every order exactly once."""
+        seen, after = [], None
+        while True:
+            rows, after = self.db.get_orders_page(limit=2, after=after)
+            seen += [r['id'] for r in rows]
+            if after is None:
+                break
+        self.assertEqual(seen, [5, 4, 3, 2, 1, 6, 7])
+
+    def test_date_from_filter(self):
+        """Verify date_from keeps orders on or after it."""
+        self.assertEqual(self.ids(date_from=self.T - datetime.timedelta(days=1)), [5, 4, 3, 2, 1, 6])
+
+    def test_date_to_filter(self):
+        """Verify date_to is exclusive."""
+        self.assertEqual(self.ids(date_to=self.T), [6, 7])
+
+    def test_customer_id_filter(self):
+        """Verify customer_id matches exactly."""
+        self.assertEqual(self.ids(customer_id=2), [5, 4, 7])
+
+    def test_customer_name_filter(self):
+        """Verify customer_name is a prefix match."""
+        self.assertEqual(self.ids(customer_name="Jane"), [5, 4, 7])
+
+    def test_user_id_filter(self):
+        """Verify user_id matches exactly."""
+        self.assertEqual(self.ids(user_id=3), [3, 2, 1, 6])
+
+    def test_staff_name_filter(self):
+        """Verify staff_name is a prefix match on the username."""
+        self.assertEqual(self.ids(staff_name="aay"), [7])
+
+    def test_min_amount_filter(self):
+        """Verify min_amount is inclusive."""
+        self.assertEqual(self.ids(min_amount=500), [5, 4, 7])
+
+    def test_max_amount_filter(self):
+        """Verify max_amount is inclusive."""
+        self.assertEqual(self.ids(max_amount=50), [3, 2, 1, 6])
+
+    def test_filter_boxes_parse_to_query_arguments(self):
+        """Verify the UI's inclusive "To" date becomes an exclusive bound and blanks are dropped."""
+        self.assertEqual(parse_filters({"date_from": "2024-03-01", "date_to": "2024-03-01", "min_amount": "9.999",
+                                        "max_amount": " ", "customer_name": " Jane ", "staff_name": ""}),
+                         {"date_from": self.T.replace(hour=0), "date_to": datetime.datetime(2024, 3, 2),
+                          "min_amount": 10.0, "customer_name": "Jane"})
+        with self.assertRaises(ValueError):
+            parse_filters({"date_from": "01/03/2024"})
+
+
+class TestSalesJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.journal = SalesJournal(os.path.join(self.tmp.name, "journal.jsonl"))
+        self.db = Database(backend=backends.SQLiteBackend(os.path.join(self.tmp.name, "pos.db")), journal=self.journal)
+        db_setup.create_tables(self.db.get_connection)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_offline_sale_is_journaled(self):
+        """Verify a sale made with no connection lands in the journal instead of failing."""
+        self.db.get_connection = lambda: None
+        jid = self.db.process_transaction(1, 1, {1: 1}, 1200.0, prices={1: 1200.0})
+        self.assertTrue(str(jid).startswith("J"))
+        self.assertEqual(self.journal.get(jid)['items'], {"1": 1})
+        self.assertFalse(self.db.process_transaction(1, 1, {2: 1}, 10.0))
+
+    def test_replay_clamps_stock_and_is_idempotent(self):
+        """Verify replay books sales in order, clamps stock at zero and never double-books."""
+        self.journal.append(1, 1, {10: 2}, {10: 500.0}, 1000.0)
+        self.journal.append(2, 1, {10: 2, 1: 1}, {10: 500.0, 1: 1200.0}, 2200.0)
+        self.journal.append(None, 1, {999: 1}, {999: 5.0}, 5.0)
+        summary = replay_pending(self.db, self.journal, batch_size=2)
+        self.assertEqual((summary["replayed"], summary["remaining"]), (3, 0))
+        shortfalls = [(pid, short) for _, pid, short in summary["shortfalls"]]
+        self.assertEqual(shortfalls, [(10, 1), (999, 1)])
+        stock = {p['id']: p['stock_level'] for p in self.db.get_all_products()}
+        self.assertEqual((stock[10], stock[1]), (0, 9))
+        self.assertEqual(len(self.db.get_all_orders()), 3)
+
+        entry = {"journal_id": "J-dup", "ts": "2026-01-01 10:00:00", "customer_id": 1, "user_id": 1,
+                 "items": {"2": 1}, "prices": {"2": 2500.0}, "total": 2500.0}
+        self.assertEqual(len(self.db.replay_sales([entry])["applied"]), 1)
+        self.assertEqual(self.db.replay_sales([entry])["duplicates"], ["J-dup"])
+        self.assertEqual(len(self.db.get_all_orders()), 4)
+
+    def test_pending_count_does_not_reread_the_file(self):
+        """Verify len() of the journal is kept by append/acknowledge instead of re-reading the file."""
+        first = self.journal.append(1, 1, {10: 1}, {10: 500.0}, 500.0)
+        self.journal.append(1, 1, {1: 1}, {1: 1200.0}, 1200.0)
+        self.assertEqual(len(self.journal), 2)
+        with mock.patch.object(self.journal, "_read", side_effect=AssertionError("file re-read")):
+            self.journal.append(2, 1, {2: 1}, {2: 2500.0}, 2500.0)
+            self.journal.acknowledge([first["journal_id"]])
+            self.assertEqual(len(self.journal), 2)
+        self.assertEqual(len(SalesJournal(self.journal.path)), 2)
+
+    def test_rejected_sale_is_dead_lettered_after_max_attempts(self):
+        """Verify a sale the server keeps rejecting stops blocking the queue once it is dead-lettered."""
+        first = self.journal.append(1, 1, {10: 1}, {10: 500.0}, 500.0)
+        bad = dict(first, journal_id="J-bad", ts="not a date")
+        self.journal._write([bad])
+        self.journal.append(2, 1, {1: 1}, {1: 1200.0}, 1200.0)
+
+        self.db.get_connection = lambda: None
+        summary = replay_pending(self.db, self.journal, max_attempts=2)
+        self.assertEqual((summary["replayed"], summary["remaining"]), (0, 3))
+        del self.db.get_connection
+
+        summary = replay_pending(self.db, self.journal, max_attempts=2)
+        self.assertEqual((summary["replayed"], summary["dead_letters"], summary["remaining"]), (1, [], 2))
+        summary = replay_pending(self.db, self.journal, max_attempts=2)
+        self.assertEqual((summary["replayed"], summary["dead_letters"], summary["remaining"]), (1, ["J-bad"], 0))
+        with open(self.journal.dead_letter_path, encoding="utf-8") as f:
+            self.assertEqual([json.loads(line)["journal_id"] for line in f], ["J-bad"])
+        self.assertEqual(len(self.db.get_all_orders()), 2)
+
+    def test_replay_leaves_other_carts_holds_alone(self):
+        """Verify replayed sales only take unreserved stock, so availability never goes negative."""
+        self.assertTrue(self.db.reserve_stock("till-b", 10, 2)['ok'])
+        self.journal.append(1, 1, {10: 3}, {10: 550.0}, 1650.0)
+        summary = replay_pending(self.db, self.journal)
+        self.assertEqual([(pid, short) for _, pid, short in summary["shortfalls"]], [(10, 2)])
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT stock_level, reserved FROM products WHERE id = 10")
+        self.assertEqual(cursor.fetchone(), (2, 2))
+        cursor.close()
+        conn.close()
+        self.assertTrue(self.db.checkout(1, 3, {10: 2}, 1100.0, reservation="till-b"))
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = Database(backend=backends.SQLiteBackend(os.path.join(self.tmp.name, "pos.db")))
+        db_setup.create_tables(self.db.get_connection)
+        self.metrics = instrumentation.metrics
+        self.saved_threshold = self.metrics.slow_query_ms
+        self.metrics.reset()
+
+    def tearDown(self):
+        self.metrics.slow_query_ms = self.saved_threshold
+        self.metrics.reset()
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_statement_names_collapse_list_sizes(self):
+        """Verify carts of different sizes share one statement histogram."""
+        three = instrumentation.statement_name("SELECT id FROM products WHERE id IN (%s, %s, %s)")
+        one = instrumentation.statement_name("SELECT id FROM products\n  WHERE id IN (%s)")
+        self.assertEqual(three, one)
+        rows = instrumentation.statement_name("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s), (%s, %s)")
+        self.assertEqual(rows, "INSERT INTO t (a, b) VALUES (?)...")
+
+    def test_database_calls_are_timed_and_logged(self):
+        """Verify methods, statements and pool waits are recorded and slow statements logged."""
+        self.metrics.slow_query_ms = 0
+        self.assertEqual(len(self.db.get_all_products()), 10)
+        snap = self.metrics.snapshot()
+        self.assertEqual(snap["method"]["get_all_products"]["rows"], 10)
+        self.assertGreaterEqual(snap["connect"]["pool"]["count"], 1)
+        self.assertTrue(any(s.startswith("SELECT") for s in snap["execute"]))
+        self.assertTrue(any(e["method"] == "get_all_products" for e in snap["slow_queries"]))
+
+        text = self.metrics.to_prometheus()
+        self.assertIn('pos_db_method_duration_ms_count{name="get_all_products"} 1', text)
+        self.assertIn('le="+Inf"', text)
@@ -0,0 +1,106 @@
+import hashlib
+import os
+from collections import OrderedDict
+
+from PIL import Image, ImageTk
+
+
+class ThumbnailCache:
+    # Two levels: an LRU of ready PhotoImages in memory, backed by pre-resized
+    # PNGs on disk keyed by (path, file mtime and byte size, thumbnail size).
+    # Originals are decoded once per file version, not once per redraw.
+    def __init__(self, cache_dir=None, size=(160, 130), max_items=512, placeholder_color="#F5F5F5"):
+        self.cache_dir = cache_dir or os.path.join(os.getcwd(), ".thumbnails")
+        self.size = tuple(size)
+        self.max_items = max_items
+        self.placeholder_color = placeholder_color
+        self._memory = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, img_path, size=None):
+        size = tuple(size or self.size)
+        key = self.key(img_path, size)
+        if key is None:
+            return self.placeholder(size)
+        photo = self._memory.get(key)
+        if photo is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return photo
+
+        pil_img = self._load_from_disk(key)
+        if pil_img is None:
+            try:
+                pil_img = self._render(key)
+            except (OSError, ValueError) as e:
+                print(f"Thumbnail render failed for {key[0]}: {e}")
+                return self.placeholder(size)
+        photo = ImageTk.PhotoImage(pil_img)
+        self._remember(key, photo)
+        return photo
+
+    def key(self, img_path, size=None):
+        # None when there is no readable file; a replaced file gets a new key even if
+        # the copy kept its mtime, since the byte size is part of it.
+        if not img_path:
+            return None
+        if not os.path.isabs(img_path):
+            img_path = os.path.join(os.getcwd(), img_path)
+        try:
+            st = os.stat(img_path)
+        except OSError:
+            return None
+        return (img_path, (st.st_mtime_ns, st.st_size), tuple(size or self.size))
+
+    def placeholder(self, size=None):
+        size = tuple(size or self.size)
+        key = (None, 0, size)
+        photo = self._memory.get(key)
+        if photo is None:
+            photo = ImageTk.PhotoImage(Image.new('RGB', size, color=self.placeholder_color))
+            self._remember(key, photo)
+        return photo
+
+    def clear_memory(self):
+        self._memory.clear()
+
+    def _remember(self, key, photo):
+        self._memory[key] = photo
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def _disk_path(self, key):
+        path, stamp, (w, h) = key
+        digest = hashlib.sha1(f"{path}|{stamp}|{w}x{h}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.png")
+
+    def _load_from_disk(self, key):
+        disk_path = self._disk_path(key)
+        if not os.path.exists(disk_path):
+            return None
+        try:
+            with Image.open(disk_path) as img:
+                img.load()
+                self.disk_hits += 1
+                return img.copy()
+        except OSError:
+            return None
+
+    def _render(self, key):
+        path, _, size = key
+        self.misses += 1
+        with Image.open(path) as img:
+            img.draft("RGB", size)
+            thumb = img.resize(size, Image.Resampling.LANCZOS)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            disk_path = self._disk_path(key)
+            tmp_path = f"{disk_path}.{os.getpid()}.tmp"
+            thumb.save(tmp_path, format="PNG")
+            os.replace(tmp_path, disk_path)
+        except OSError as e:
+            print(f"Thumbnail cache write failed: {e}")
+        return thumb
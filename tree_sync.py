@@ -0,0 +1,67 @@
+class TreeviewSync:
+    # Keeps a ttk.Treeview in step with a dataset by row id. A Python-side mirror
+    # of what is on screen means unchanged rows cost no Tk calls at all, and
+    # rows are never torn down, so selection and scroll position survive.
+    def __init__(self, tree):
+        self.tree = tree
+        self.rows = {}
+
+    def sync(self, rows):
+        # rows: iterable of (iid, values, tags) in display order.
+        # Returns (inserted, updated, deleted) counts.
+        inserted = updated = 0
+        order = []
+        for iid, values, tags in rows:
+            iid = str(iid)
+            order.append(iid)
+            state = (tuple(values), tuple(t for t in tags if t))
+            current = self.rows.get(iid)
+            if current is None:
+                self.tree.insert("", "end", iid=iid, values=state[0], tags=state[1])
+                inserted += 1
+            elif current != state:
+                self.tree.item(iid, values=state[0], tags=state[1])
+                updated += 1
+            self.rows[iid] = state
+
+        keep = set(order)
+        stale = [iid for iid in self.rows if iid not in keep]
+        if stale:
+            self.tree.delete(*stale)
+            for iid in stale:
+                del self.rows[iid]
+
+        if list(self.tree.get_children()) != order:
+            for index, iid in enumerate(order):
+                self.tree.move(iid, "", index)
+        return inserted, updated, len(stale)
+
+    def upsert(self, iid, values, tags=(), index="end"):
+        iid = str(iid)
+        state = (tuple(values), tuple(t for t in tags if t))
+        if iid in self.rows:
+            if self.rows[iid] != state:
+                self.tree.item(iid, values=state[0], tags=state[1])
+        else:
+            self.tree.insert("", index, iid=iid, values=state[0], tags=state[1])
+        self.rows[iid] = state
+
+    def patch(self, ids, rows):
+        # Partial update by id: rows for the ids that still exist, the others are removed.
+        found = set()
+        for iid, values, tags in rows:
+            self.upsert(iid, values, tags)
+            found.add(str(iid))
+        for iid in ids:
+            if str(iid) not in found:
+                self.remove(iid)
+
+    def remove(self, iid):
+        iid = str(iid)
+        if self.rows.pop(iid, None) is not None:
+            self.tree.delete(iid)
+
+    def clear(self):
+        if self.rows:
+            self.tree.delete(*self.rows)
+        self.rows = {}